@@ -1,11 +1,24 @@
+import hmac
+import json
 import logging
 import os
+import queue
+import re
+import signal
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import Updater, CommandHandler, CallbackQueryHandler, MessageHandler, Filters, CallbackContext
 from dotenv import load_dotenv
 import database as db
+import dry_run
+import keyword_rules
+import sinks
+import stats
+from notifier import build_notification, claims, match_state
 
 load_dotenv()
 
@@ -18,6 +31,26 @@ logger = logging.getLogger(__name__)
 
 TOKEN = os.getenv('BOT_TOKEN')
 SUPER_ADMIN_ID = int(os.getenv('SUPER_ADMIN_ID', 0))
+BULK_RESOLVE_WORKERS = int(os.getenv('BULK_RESOLVE_WORKERS', 8))
+
+# Guruh xabarlarini qayta ishlovchi ishchilar (admin UI dan alohida)
+GROUP_WORKERS = int(os.getenv('GROUP_WORKERS', 4))
+GROUP_QUEUE_SIZE = int(os.getenv('GROUP_QUEUE_SIZE', 1000))
+GROUP_QUEUE_TIMEOUT = float(os.getenv('GROUP_QUEUE_TIMEOUT', 0))
+
+# Webhook rejimi (ixtiyoriy, standart - polling)
+WEBHOOK_ENABLED = os.getenv('WEBHOOK_ENABLED', 'false').lower() == 'true'
+WEBHOOK_LISTEN = os.getenv('WEBHOOK_LISTEN', '127.0.0.1')
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', 8080))
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/telegram')
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET', '')
+WEBHOOK_URL = os.getenv('WEBHOOK_URL', '')
+# Bitta yangilanish uchun maksimal so'rov hajmi (bayt)
+WEBHOOK_MAX_BODY = int(os.getenv('WEBHOOK_MAX_BODY', 1024 * 1024))
+
+# Dry-run uchun xabarlar arxivi (JSONL); bir vaqtda faqat bitta dry-run ishlaydi
+DRY_RUN_ARCHIVE = os.getenv('DRY_RUN_ARCHIVE', '')
+dry_run_lock = threading.Lock()
 
 def super_admin_keyboard():
     return InlineKeyboardMarkup([
@@ -25,23 +58,162 @@ def super_admin_keyboard():
         [InlineKeyboardButton("📋 Adminlar ro'yxati", callback_data='list_admins')],
         [InlineKeyboardButton("🗑 Admin o'chirish", callback_data='remove_admin')],
         [InlineKeyboardButton("🚪 Admin xonasiga o'tish", callback_data='enter_admin_room')],
+        [InlineKeyboardButton("📥 Guruhlarni import qilish", callback_data='bulk_import')],
         [InlineKeyboardButton("🔧 Userbot sozlamalari", callback_data='userbot_settings')],
-        [InlineKeyboardButton("🤖 Userbotni tekshirish", callback_data='check_userbot')]
+        [InlineKeyboardButton("🤖 Userbotni tekshirish", callback_data='check_userbot')],
+        [InlineKeyboardButton("📊 Umumiy statistika", callback_data='global_stats')],
+        [InlineKeyboardButton("🧪 Kalit so'zlarni sinash (dry-run)", callback_data='dry_run')]
     ])
 
 def admin_keyboard():
     return InlineKeyboardMarkup([
         [InlineKeyboardButton("➕ Kalit so'z", callback_data='add_keyword'), InlineKeyboardButton("📋 Ko'rish", callback_data='view_keywords')],
-        [InlineKeyboardButton("🗑 So'z o'chirish", callback_data='delete_keyword')],
+        [InlineKeyboardButton("🗑 So'z o'chirish", callback_data='delete_keyword'), InlineKeyboardButton("🎯 Guruhlarga bog'lash", callback_data='scope_keywords')],
         [InlineKeyboardButton("➕ Shaxsiy guruh", callback_data='add_private_group')],
         [InlineKeyboardButton("👁 Ko'rish", callback_data='view_private_group'), InlineKeyboardButton("🗑 O'chirish", callback_data='delete_private_group')],
         [InlineKeyboardButton("➕ Izlovchi guruh", callback_data='add_search_group')],
-        [InlineKeyboardButton("📋 Ko'rish", callback_data='view_search_groups'), InlineKeyboardButton("🗑 O'chirish", callback_data='delete_search_group')]
+        [InlineKeyboardButton("📋 Ko'rish", callback_data='view_search_groups'), InlineKeyboardButton("🗑 O'chirish", callback_data='delete_search_group')],
+        [InlineKeyboardButton("📊 Statistika", callback_data='admin_stats'), InlineKeyboardButton("🔌 Integratsiyalar", callback_data='sinks')]
     ])
 
 def back_button():
     return InlineKeyboardMarkup([[InlineKeyboardButton("⬅️ Ortga", callback_data='back_to_main')]])
 
+def stats_screen(admin_id=None, hourly=False):
+    """Rollup'lardan statistika oynasi (admin_id=None - barcha adminlar bo'yicha, hourly - oxirgi 24 soat)"""
+    # Shu jarayonda yig'ilgan hisoblagichlar ham ko'rinsin
+    stats.recorder.flush()
+    callback = 'global_stats' if admin_id is None else 'admin_stats'
+    if hourly:
+        trend = stats.hourly_trend(admin_id)
+        text = f"🕐 Soatlik mosliklar (oxirgi 24 soat, jami {sum(n for _, n in trend)}):\n\n"
+        text += stats.render_trend(trend, label=stats.hour_label)
+        keyboard = [
+            [InlineKeyboardButton("🔄 Yangilash", callback_data=f'{callback}_hourly')],
+            [InlineKeyboardButton("📈 Kunlik", callback_data=callback)],
+            [InlineKeyboardButton("⬅️ Ortga", callback_data='back_to_main')]
+        ]
+        return text, InlineKeyboardMarkup(keyboard)
+    report = stats.summary(admin_id)
+    group_names = {str(g['group_id']): g['group_name'] for g in db.get_all_search_group_ids() if g['group_id'] is not None}
+
+    text = f"📊 Statistika (oxirgi {report['days']} kun):\n\n"
+    if admin_id is None:
+        text += f"📨 Tekshirilgan xabarlar: bugun {report['scanned_today']}, jami {report['scanned']}\n"
+    text += f"🔍 Mosliklar: bugun {report['matches_today']}, jami {report['matches']}\n"
+    text += f"✅ Yetkazildi: {report['delivered']}  ❌ Xato: {report['failed']}\n"
+    if report['top_keywords']:
+        text += "\n🔑 Top kalit so'zlar:\n" + "\n".join(f"{i}. {kw} - {n}" for i, (kw, n) in enumerate(report['top_keywords'], 1)) + "\n"
+    if report['top_groups']:
+        text += "\n📢 Top guruhlar:\n" + "\n".join(
+            f"{i}. {group_names.get(gid, gid)} - {n}" for i, (gid, n) in enumerate(report['top_groups'], 1)
+        ) + "\n"
+    if admin_id is None and report['top_admins']:
+        admin_names = dict(db.get_all_admins())
+        text += "\n👥 Top adminlar:\n" + "\n".join(
+            f"{i}. {admin_names.get(aid, f'User_{aid}')} - {n}" for i, (aid, n) in enumerate(report['top_admins'], 1)
+        ) + "\n"
+    text += "\n📈 Kunlik mosliklar:\n" + stats.render_trend(report['trend'])
+    keyboard = [
+        [InlineKeyboardButton("🔄 Yangilash", callback_data=callback), InlineKeyboardButton("🕐 Soatlik", callback_data=f'{callback}_hourly')],
+        [InlineKeyboardButton("⬅️ Ortga", callback_data='back_to_main')]
+    ]
+    return text, InlineKeyboardMarkup(keyboard)
+
+SINK_LABELS = {'webhook': "🌐 Webhook", 'jsonl': "📄 JSONL fayl", 'sqlite': "🗄 SQLite fayl"}
+SINK_PROMPTS = {
+    'webhook': "📝 Webhook URL yuboring (masalan: http://127.0.0.1:9000/matches):",
+    'jsonl': "📝 JSONL fayl nomini yuboring (masalan: matches.jsonl):",
+    'sqlite': "📝 SQLite fayl nomini yuboring (masalan: matches.db):"
+}
+
+def sinks_screen(admin_id):
+    """Adminning qo'shimcha yetkazish manzillari oynasi: (text, reply_markup)"""
+    items = db.get_sinks(admin_id)
+    text = "🔌 Integratsiyalar\n\nMosliklar shaxsiy guruhdan tashqari quyidagi manzillarga ham yuboriladi:\n\n"
+    if items:
+        text += "\n".join(f"{i}. {SINK_LABELS[kind]}: {target}" for i, (_, kind, target) in enumerate(items, 1))
+    else:
+        text += "ℹ️ Hozircha yo'q."
+    keyboard = [[InlineKeyboardButton(f"🗑 {SINK_LABELS[kind]}: {target}", callback_data=f'delsink_{sid}')] for sid, kind, target in items]
+    if len(items) < sinks.MAX_SINKS:
+        keyboard.append([InlineKeyboardButton(f"➕ {label}", callback_data=f'addsink_{kind}') for kind, label in SINK_LABELS.items()])
+    keyboard.append([InlineKeyboardButton("⬅️ Ortga", callback_data='back_to_main')])
+    return text, InlineKeyboardMarkup(keyboard)
+
+def keyword_scope_screen(admin_id, keyword_id):
+    """Kalit so'z qaysi izlovchi guruhlarda izlanishini tanlash oynasi: (text, reply_markup)"""
+    keyword = dict(db.get_keywords(admin_id)).get(keyword_id)
+    if keyword is None:
+        return "❌ Kalit so'z topilmadi.", back_button()
+    scope = db.get_keyword_scope(keyword_id)
+    keyboard = [
+        [InlineKeyboardButton(f"{'✅' if rowid in scope else '⬜'} {gname}", callback_data=f'kwsg_{keyword_id}_{rowid}')]
+        for rowid, gname in db.get_search_groups(admin_id)
+    ]
+    keyboard.append([InlineKeyboardButton("🌐 Barcha guruhlar", callback_data=f'kwall_{keyword_id}')])
+    keyboard.append([InlineKeyboardButton("⬅️ Ortga", callback_data='scope_keywords')])
+    where = f"{len(scope)} ta tanlangan guruhda" if scope else "barcha izlovchi guruhlarda"
+    text = f"🎯 Kalit so'z: {keyword}\n\n🔍 Izlanadi: {where}\n\n💡 Guruh tanlanmasa, kalit so'z barcha guruhlarda izlanadi."
+    return text, InlineKeyboardMarkup(keyboard)
+
+def parse_group_refs(text):
+    """Matndan guruh ID va linklarini ajratib olish: [(token, group_id, group_link)]"""
+    refs = []
+    for token in re.split(r'[\s,;]+', text):
+        if not token:
+            continue
+        if token.startswith('t.me/'):
+            refs.append((token, None, f"https://{token}"))
+        elif token.startswith(('http', '@')):
+            refs.append((token, None, token))
+        else:
+            try:
+                refs.append((token, int(token), None))
+            except ValueError:
+                refs.append((token, None, None))
+    return refs
+
+def resolve_group_titles(bot, group_ids):
+    """Guruh nomlarini cheklangan ishchilar bilan parallel aniqlash"""
+    def fetch(gid):
+        try:
+            chat = bot.get_chat(gid)
+            return chat.title or f"Guruh {gid}"
+        except Exception:
+            return f"Guruh {gid}"
+
+    if not group_ids:
+        return {}
+    with ThreadPoolExecutor(max_workers=max(1, min(BULK_RESOLVE_WORKERS, len(group_ids)))) as pool:
+        return dict(zip(group_ids, pool.map(fetch, group_ids)))
+
+def split_report(lines, limit=4000):
+    """Uzun hisobotni Telegram xabar chegarasiga mos bo'laklarga ajratish"""
+    chunks, current = [], ""
+    for line in lines:
+        if current and len(current) + len(line) + 1 > limit:
+            chunks.append(current)
+            current = ""
+        current += line + "\n"
+    if current:
+        chunks.append(current)
+    return chunks
+
+def run_dry_run(bot, chat_id, items, errors):
+    """Dry-run ni fon oqimida bajarib, natijani super adminga yuborish"""
+    try:
+        result = dry_run.run(DRY_RUN_ARCHIVE, items)
+        chunks = split_report(dry_run.format_report(result, items, errors))
+        for chunk in chunks[:-1]:
+            bot.send_message(chat_id=chat_id, text=chunk)
+        bot.send_message(chat_id=chat_id, text=chunks[-1], reply_markup=back_button())
+    except Exception as e:
+        logger.error(f"Dry-run error: {e}")
+        bot.send_message(chat_id=chat_id, text=f"❌ Dry-run xatosi: {e}", reply_markup=back_button())
+    finally:
+        dry_run_lock.release()
+
 def start(update: Update, context: CallbackContext):
     try:
         user_id = update.effective_user.id
@@ -103,6 +275,20 @@ def button_callback(update: Update, context: CallbackContext):
                 query.edit_message_text("🚪 Adminni tanlang:", reply_markup=InlineKeyboardMarkup(keyboard))
             else:
                 query.edit_message_text("ℹ️ Adminlar yo'q.", reply_markup=back_button())
+        elif data == 'bulk_import' and user_id == SUPER_ADMIN_ID:
+            admins = db.get_all_admins()
+            if admins:
+                keyboard = [[InlineKeyboardButton(f"📥 {u}", callback_data=f'bulkimp_{i}')] for i, u in admins]
+                keyboard.append([InlineKeyboardButton("⬅️ Ortga", callback_data='back_to_main')])
+                query.edit_message_text("📥 Guruhlar qaysi adminga import qilinsin?", reply_markup=InlineKeyboardMarkup(keyboard))
+            else:
+                query.edit_message_text("ℹ️ Adminlar yo'q.", reply_markup=back_button())
+        elif data.startswith('bulkimp_') and user_id == SUPER_ADMIN_ID:
+            admin_id = int(data.split('_')[1])
+            grps = db.get_search_groups(admin_id)
+            context.user_data['bulk_admin'] = admin_id
+            context.user_data['waiting'] = 'bulk_search_groups'
+            query.edit_message_text(f"📥 Izlovchi guruh ID va linklarini yuboring (har biri yangi qatorda yoki vergul bilan):\n\n📊 Hozirda: {len(grps)}/100 ta", reply_markup=back_button())
         elif data.startswith('enter_') and user_id == SUPER_ADMIN_ID:
             admin_id = int(data.split('_')[1])
             context.user_data['viewing_admin'] = admin_id
@@ -126,33 +312,55 @@ def button_callback(update: Update, context: CallbackContext):
             query.edit_message_text("✅ Userbot to'xtatish o'chirildi! Userbot 24/7 ishlaydi.", reply_markup=back_button())
             context.user_data.pop('waiting', None)
         elif data == 'check_userbot' and user_id == SUPER_ADMIN_ID:
-            conn = db.get_db()
-            c = conn.cursor()
-            c.execute("SELECT COUNT(*) as cnt FROM admins")
-            admin_count = c.fetchone()['cnt']
-            c.execute("SELECT COUNT(*) as cnt FROM keywords")
-            keyword_count = c.fetchone()['cnt']
-            c.execute("SELECT COUNT(*) as cnt FROM search_groups")
-            search_group_count = c.fetchone()['cnt']
-            c.execute("SELECT COUNT(*) as cnt FROM private_groups")
-            private_group_count = c.fetchone()['cnt']
+            counts = db.get_counts()
+            admin_count = counts['admins']
+            keyword_count = counts['keywords']
+            search_group_count = counts['search_groups']
+            private_group_count = counts['private_groups']
             last_check = db.get_setting('userbot_last_check', 'Hech qachon')
+            last_recovery = db.get_setting('userbot_last_recovery', 'Hech qachon')
             schedule_enabled = db.get_setting('userbot_schedule_enabled', 'true')
             stop_time = db.get_setting('userbot_stop_time', '00:00')
             start_time = db.get_setting('userbot_start_time', '02:00')
-            conn.close()
-            text = f"🤖 Userbot holati:\n\n📊 Statistika:\n👥 Adminlar: {admin_count} ta\n🔑 Kalit so'zlar: {keyword_count} ta\n🔍 Izlovchi guruhlar: {search_group_count} ta\n📢 Shaxsiy guruhlar: {private_group_count} ta\n\n⚙️ Sozlamalar:\n⏰ Kundalik to'xtatish: {'✅ Yoqilgan' if schedule_enabled == 'true' else '❌ O\'chirilgan'}\n"
+            status = "✅ Yoqilgan" if schedule_enabled == 'true' else "❌ O'chirilgan"
+            cache = db.cache_stats().values()
+            hits = sum(c['hits'] for c in cache)
+            lookups = hits + sum(c['misses'] for c in cache)
+            cache_rate = f"{hits / lookups * 100:.0f}%" if lookups else "-"
+            text = f"🤖 Userbot holati:\n\n📊 Statistika:\n👥 Adminlar: {admin_count} ta\n🔑 Kalit so'zlar: {keyword_count} ta\n🔍 Izlovchi guruhlar: {search_group_count} ta\n📢 Shaxsiy guruhlar: {private_group_count} ta\n\n⚙️ Sozlamalar:\n⏰ Kundalik to'xtatish: {status}\n"
             if schedule_enabled == 'true':
                 text += f"🌙 To'xtatish: {stop_time}\n🌅 Ishga tushirish: {start_time}\n\n"
             else:
                 text += "\n"
-            text += f"🕐 Oxirgi tekshiruv: {last_check}\n\n💡 Userbot ishlab turganini tekshirish uchun izlovchi guruhda kalit so'z yozing."
+            text += f"🕐 Oxirgi tekshiruv: {last_check}\n🔄 Oxirgi qayta ulanish: {last_recovery}\n🗃 Kesh: {cache_rate} ({hits}/{lookups})\n\n💡 Userbot ishlab turganini tekshirish uchun izlovchi guruhda kalit so'z yozing."
             db.set_setting('userbot_last_check', datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
             keyboard = [[InlineKeyboardButton("🔄 Yangilash", callback_data='check_userbot')], [InlineKeyboardButton("⬅️ Ortga", callback_data='back_to_main')]]
             query.edit_message_text(text, reply_markup=InlineKeyboardMarkup(keyboard))
+        elif data in ('global_stats', 'global_stats_hourly') and user_id == SUPER_ADMIN_ID:
+            text, markup = stats_screen(hourly=data.endswith('_hourly'))
+            query.edit_message_text(text, reply_markup=markup)
+        elif data == 'dry_run' and user_id == SUPER_ADMIN_ID:
+            if not DRY_RUN_ARCHIVE or not os.path.isfile(DRY_RUN_ARCHIVE):
+                query.edit_message_text("❌ Arxiv topilmadi. .env faylida DRY_RUN_ARCHIVE ni JSONL faylga ko'rsating.", reply_markup=back_button())
+            else:
+                context.user_data['waiting'] = 'dry_run_keywords'
+                query.edit_message_text(
+                    "🧪 Sinab ko'riladigan kalit so'zlarni yuboring (har bir qatorda bittadan, qoidalar ham mumkin).\n\n"
+                    f"📁 Arxiv: {os.path.basename(DRY_RUN_ARCHIVE)}",
+                    reply_markup=back_button()
+                )
+        elif data in ('admin_stats', 'admin_stats_hourly'):
+            text, markup = stats_screen(context.user_data.get('viewing_admin', user_id), hourly=data.endswith('_hourly'))
+            query.edit_message_text(text, reply_markup=markup)
         elif data == 'add_keyword':
             context.user_data['waiting'] = 'keyword'
-            query.edit_message_text("📝 Kalit so'zni kiriting:", reply_markup=back_button())
+            query.edit_message_text(
+                "📝 Kalit so'zni kiriting:\n\n"
+                "💡 Qoida ham yozish mumkin:\n"
+                "kvartira AND (sotiladi OR ijaraga) NOT garaj\n"
+                "\"uy sotiladi\" - aniq ibora (butun so'zlar)",
+                reply_markup=back_button()
+            )
         elif data == 'view_keywords':
             admin_id = context.user_data.get('viewing_admin', user_id)
             kws = db.get_keywords(admin_id)
@@ -174,6 +382,73 @@ def button_callback(update: Update, context: CallbackContext):
             kid = int(data.split('_')[1])
             db.remove_keyword(kid)
             query.edit_message_text("✅ Kalit so'z o'chirildi!", reply_markup=back_button())
+        elif data == 'scope_keywords':
+            admin_id = context.user_data.get('viewing_admin', user_id)
+            kws = db.get_keywords(admin_id)
+            if kws:
+                keyboard = [[InlineKeyboardButton(f"🎯 {k}", callback_data=f'kwscope_{i}')] for i, k in kws]
+                keyboard.append([InlineKeyboardButton("⬅️ Ortga", callback_data='back_to_main')])
+                query.edit_message_text("🎯 Guruhlarga bog'lash uchun kalit so'zni tanlang:", reply_markup=InlineKeyboardMarkup(keyboard))
+            else:
+                query.edit_message_text("ℹ️ Kalit so'zlar yo'q.", reply_markup=back_button())
+        elif data.startswith('kwscope_'):
+            admin_id = context.user_data.get('viewing_admin', user_id)
+            text, markup = keyword_scope_screen(admin_id, int(data.split('_')[1]))
+            query.edit_message_text(text, reply_markup=markup)
+        elif data.startswith('kwsg_'):
+            admin_id = context.user_data.get('viewing_admin', user_id)
+            _, kid, rowid = data.split('_')
+            kid, rowid = int(kid), int(rowid)
+            keywords = dict(db.get_keywords(admin_id))
+            # Faqat adminning o'z kalit so'zi va o'z izlovchi guruhi bog'lanadi
+            if kid in keywords and rowid in dict(db.get_search_groups(admin_id)):
+                if db.get_keyword_scope(kid) == {rowid}:
+                    # Oxirgi guruh olinsa kalit so'z barcha guruhlarda izlanadi - avval tasdiqlatish
+                    keyboard = [
+                        [InlineKeyboardButton("🌐 Ha, barcha guruhlarda izlansin", callback_data=f'kwsgok_{kid}_{rowid}')],
+                        [InlineKeyboardButton("❌ Bekor qilish", callback_data=f'kwscope_{kid}')]
+                    ]
+                    query.edit_message_text(
+                        f"⚠️ Bu \"{keywords[kid]}\" uchun tanlangan oxirgi guruh.\n\n"
+                        f"Uni olib tashlasangiz, kalit so'z BARCHA izlovchi guruhlarda izlanadi. Davom etasizmi?",
+                        reply_markup=InlineKeyboardMarkup(keyboard)
+                    )
+                    return
+                db.toggle_keyword_scope(kid, rowid)
+            text, markup = keyword_scope_screen(admin_id, kid)
+            query.edit_message_text(text, reply_markup=markup)
+        elif data.startswith('kwsgok_'):
+            admin_id = context.user_data.get('viewing_admin', user_id)
+            _, kid, rowid = data.split('_')
+            kid, rowid = int(kid), int(rowid)
+            if kid in dict(db.get_keywords(admin_id)) and rowid in db.get_keyword_scope(kid):
+                db.toggle_keyword_scope(kid, rowid)
+            text, markup = keyword_scope_screen(admin_id, kid)
+            query.edit_message_text(text, reply_markup=markup)
+        elif data.startswith('kwall_'):
+            admin_id = context.user_data.get('viewing_admin', user_id)
+            kid = int(data.split('_')[1])
+            if kid in dict(db.get_keywords(admin_id)):
+                db.clear_keyword_scope(kid)
+            text, markup = keyword_scope_screen(admin_id, kid)
+            query.edit_message_text(text, reply_markup=markup)
+        elif data == 'sinks':
+            text, markup = sinks_screen(context.user_data.get('viewing_admin', user_id))
+            query.edit_message_text(text, reply_markup=markup)
+        elif data.startswith('addsink_'):
+            kind = data.split('_')[1]
+            if kind in sinks.KINDS:
+                context.user_data['waiting'] = 'sink'
+                context.user_data['sink_kind'] = kind
+                query.edit_message_text(SINK_PROMPTS[kind], reply_markup=back_button())
+        elif data.startswith('delsink_'):
+            admin_id = context.user_data.get('viewing_admin', user_id)
+            sid = int(data.split('_')[1])
+            if sid in [s[0] for s in db.get_sinks(admin_id)]:
+                db.remove_sink(sid)
+                sinks.manager.invalidate()
+            text, markup = sinks_screen(admin_id)
+            query.edit_message_text(text, reply_markup=markup)
         elif data == 'add_private_group':
             context.user_data['waiting'] = 'private_group'
             query.edit_message_text("📝 Shaxsiy guruh ID yoki link yuboring:\n\n💡 ID olish:\n1. Botni guruhga admin qiling\n2. Guruhda /id yuboring\n3. ID yoki linkni bu yerga yuboring", reply_markup=back_button())
@@ -222,8 +497,23 @@ def button_callback(update: Update, context: CallbackContext):
                 query.edit_message_text("🗑 O'chirish uchun izlovchi guruhni tanlang:", reply_markup=InlineKeyboardMarkup(keyboard))
             else:
                 query.edit_message_text("ℹ️ Izlovchi guruhlar yo'q.", reply_markup=back_button())
-        elif data.startswith('delgrp_'):
+        elif data.startswith('delgrp_') or data.startswith('delgrpok_'):
+            admin_id = context.user_data.get('viewing_admin', user_id)
             gid_row = int(data.split('_')[1])
+            exclusive = db.get_exclusive_scope_keywords(admin_id, gid_row)
+            if exclusive and data.startswith('delgrp_'):
+                # Faqat shu guruhga bog'langan kalit so'zlar o'chirishdan keyin barcha guruhlarda izlanadi
+                keyboard = [
+                    [InlineKeyboardButton("🗑 Ha, o'chirish", callback_data=f'delgrpok_{gid_row}')],
+                    [InlineKeyboardButton("⬅️ Ortga", callback_data='delete_search_group')]
+                ]
+                names = "\n".join(f"• {kw}" for _, kw in exclusive)
+                query.edit_message_text(
+                    f"⚠️ Quyidagi kalit so'zlar faqat shu guruhga bog'langan:\n{names}\n\n"
+                    f"Guruh o'chirilsa, ular BARCHA izlovchi guruhlarda izlanadi. Davom etasizmi?",
+                    reply_markup=InlineKeyboardMarkup(keyboard)
+                )
+                return
             db.remove_search_group(gid_row)
             query.edit_message_text("✅ Izlovchi guruh o'chirildi!", reply_markup=back_button())
         elif data == 'back_to_main':
@@ -263,6 +553,54 @@ def handle_text(update: Update, context: CallbackContext):
                 update.message.reply_text("❌ Noto'g'ri ID!", reply_markup=back_button())
             context.user_data.pop('waiting', None)
             return
+        if waiting == 'bulk_search_groups' and user_id == SUPER_ADMIN_ID:
+            admin_id = context.user_data.pop('bulk_admin', None)
+            context.user_data.pop('waiting', None)
+            if admin_id is None:
+                return
+            refs = parse_group_refs(text)
+            titles = resolve_group_titles(context.bot, list({gid for _, gid, _ in refs if gid is not None}))
+            valid = [(token, gid, link) for token, gid, link in refs if gid is not None or link]
+            results = db.add_search_groups_bulk(admin_id, [{
+                'group_id': gid,
+                'group_link': link,
+                'group_name': titles[gid] if gid is not None else "Link orqali guruh"
+            } for _, gid, link in valid])
+            outcomes = iter(results)
+            lines = []
+            added = 0
+            for token, gid, link in refs:
+                if gid is None and not link:
+                    lines.append(f"❌ {token} — Noto'g'ri ID yoki link")
+                    continue
+                ok, message = next(outcomes)
+                if ok:
+                    added += 1
+                    lines.append(f"✅ {token} — {titles[gid] if gid is not None else 'Link orqali guruh'}")
+                else:
+                    lines.append(f"❌ {token} — {message}")
+            lines.append(f"\n📊 Qo'shildi: {added}/{len(refs)} ta")
+            chunks = split_report(lines)
+            for chunk in chunks[:-1]:
+                update.message.reply_text(chunk)
+            update.message.reply_text(chunks[-1], reply_markup=back_button())
+            return
+        if waiting == 'dry_run_keywords' and user_id == SUPER_ADMIN_ID:
+            items, errors = dry_run.parse_candidates(text.splitlines())
+            if not items:
+                lines = [f"❌ {kw} — {error}" for kw, error in errors] or ["❌ Kalit so'zlar topilmadi."]
+                update.message.reply_text("\n".join(lines) + "\n\nQayta yuboring.", reply_markup=back_button())
+                return
+            context.user_data.pop('waiting', None)
+            if not dry_run_lock.acquire(blocking=False):
+                update.message.reply_text("⏳ Boshqa dry-run hali tugamadi, birozdan keyin urinib ko'ring.", reply_markup=back_button())
+                return
+            threading.Thread(
+                target=run_dry_run, args=(context.bot, update.effective_chat.id, items, errors),
+                name='dry-run', daemon=True
+            ).start()
+            update.message.reply_text(f"⏳ Dry-run boshlandi ({len(items)} ta kalit so'z). Natija tayyor bo'lganda yuboriladi.")
+            return
         if not db.is_admin(user_id, SUPER_ADMIN_ID):
             return
         if waiting == 'userbot_time' and user_id == SUPER_ADMIN_ID:
@@ -287,9 +625,35 @@ def handle_text(update: Update, context: CallbackContext):
             context.user_data.pop('waiting', None)
         elif waiting == 'keyword':
             admin_id = context.user_data.get('viewing_admin', user_id)
-            db.add_keyword(admin_id, text)
-            update.message.reply_text(f"✅ Kalit so'z qo'shildi: {text}", reply_markup=back_button())
+            if keyword_rules.is_rule(text):
+                try:
+                    rule = keyword_rules.parse_rule(text)
+                except keyword_rules.RuleError as e:
+                    # waiting saqlanadi - admin qoidani tuzatib qayta yuborishi mumkin
+                    update.message.reply_text(f"❌ Qoidada xato: {e}\n\nQayta yuboring.", reply_markup=back_button())
+                    return
+                db.add_keyword(admin_id, text, rule)
+                update.message.reply_text(f"✅ Qoida qo'shildi: {text}", reply_markup=back_button())
+            else:
+                db.add_keyword(admin_id, text)
+                update.message.reply_text(f"✅ Kalit so'z qo'shildi: {text}", reply_markup=back_button())
+            context.user_data.pop('waiting', None)
+        elif waiting == 'sink':
+            admin_id = context.user_data.get('viewing_admin', user_id)
+            kind = context.user_data.get('sink_kind')
+            if len(db.get_sinks(admin_id)) >= sinks.MAX_SINKS:
+                update.message.reply_text(f"❌ Maksimal {sinks.MAX_SINKS} ta integratsiya qo'shish mumkin", reply_markup=back_button())
+            else:
+                try:
+                    target = sinks.validate_target(kind, text)
+                except ValueError as e:
+                    update.message.reply_text(f"❌ {e}\n\nQayta yuboring.", reply_markup=back_button())
+                    return
+                db.add_sink(admin_id, kind, target)
+                sinks.manager.invalidate()
+                update.message.reply_text(f"✅ {SINK_LABELS[kind]} qo'shildi: {target}", reply_markup=back_button())
             context.user_data.pop('waiting', None)
+            context.user_data.pop('sink_kind', None)
         elif waiting == 'private_group':
             admin_id = context.user_data.get('viewing_admin', user_id)
             if text.startswith("http"):
@@ -335,6 +699,86 @@ def handle_text(update: Update, context: CallbackContext):
     except Exception as e:
         logger.error(f"Handle text error: {e}")
 
+# ==================== GURUH XABARLARI ====================
+
+class GroupMessageWorkers:
+    """
+    Guruh xabarlarini cheklangan navbat va ishchilar pulida qayta ishlash.
+    Dispatcher oqimi faqat navbatga qo'yadi, shuning uchun admin tugmalari
+    guruhlardagi xabarlar oqimi paytida ham tez javob beradi.
+    Navbat to'lsa, xabar GROUP_QUEUE_TIMEOUT soniya kutiladi, keyin tashlab yuboriladi.
+    """
+
+    def __init__(self, workers, maxsize, put_timeout):
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.workers = workers
+        self.put_timeout = put_timeout
+        self.dropped = 0
+        self._threads = []
+
+    def start(self, bot):
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, args=(bot,), name=f'group-worker-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        for _ in self._threads:
+            self.queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self._threads = []
+
+    def submit(self, job):
+        try:
+            if self.put_timeout > 0:
+                self.queue.put(job, timeout=self.put_timeout)
+            else:
+                self.queue.put_nowait(job)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped % 100 == 1:
+                logger.warning(f"⚠️ Guruh xabarlari navbati to'la, tashlab yuborildi: {self.dropped} ta")
+            return False
+
+    def _run(self, bot):
+        while True:
+            job = self.queue.get()
+            try:
+                if job is None:
+                    return
+                process_group_message(bot, **job)
+            except Exception as e:
+                logger.error(f"Group worker error: {e}")
+            finally:
+                self.queue.task_done()
+
+group_workers = GroupMessageWorkers(GROUP_WORKERS, GROUP_QUEUE_SIZE, GROUP_QUEUE_TIMEOUT)
+
+def process_group_message(bot, group_id, message_id, group_name, user_id, username, msg_text):
+    """Guruh xabaridagi kalit so'zlarni tekshirish va shaxsiy guruhlarga yuborish"""
+    # Kuzatilmaydigan guruh xabarlari band qilinmaydi va statistikaga kirmaydi
+    if not db.is_watched_group(group_id) or not claims.claim(group_id, message_id):
+        return
+    matches = db.check_keywords_in_message(group_id, msg_text)
+    # Userbot keyinchalik tahrirni qayta ishlaganda bu kalit so'zlarni qayta yubormasligi uchun
+    matches = match_state.new_matches(group_id, message_id, matches)
+    stats.recorder.record_scan(group_id, matches)
+    for match in matches:
+        sinks.manager.dispatch(match['admin_id'], sinks.make_record(
+            "Bot", match['admin_id'], group_id, group_name, message_id, user_id, username, match['keyword'], msg_text
+        ))
+        if not match['private_group_id']:
+            continue
+        try:
+            text, keyboard = build_notification("Bot", group_name, username, user_id, match['keyword'], msg_text)
+            bot.send_message(chat_id=match['private_group_id'], text=text, reply_markup=keyboard)
+            stats.recorder.record_delivery(match['admin_id'], True)
+        except Exception as e:
+            stats.recorder.record_delivery(match['admin_id'], False)
+            logger.error(f"Send message error: {e}")
+
 def check_group_message(update: Update, context: CallbackContext):
     try:
         if not update.message or not update.message.text:
@@ -342,53 +786,147 @@ def check_group_message(update: Update, context: CallbackContext):
         chat_type = update.message.chat.type
         if chat_type not in ['group', 'supergroup']:
             return
-        msg_text = update.message.text
-        group_id = update.message.chat.id
-        user_id = update.message.from_user.id
-        username = update.message.from_user.username or update.message.from_user.first_name or "Unknown"
-        group_name = update.message.chat.title or "Unknown group"
-        matches = db.check_keywords_in_message(group_id, msg_text)
-        for match in matches:
-            try:
-                keyboard = [[InlineKeyboardButton("👤 Profil", url=f"tg://user?id={user_id}")]]
-                if match['private_group_id']:
-                    context.bot.send_message(
-                        chat_id=match['private_group_id'],
-                        text=(f"🔍 Kalit so'z topildi! (Bot)\n\n📢 Guruh: {group_name}\n👤 Foydalanuvchi: {username}\n🆔 User ID: {user_id}\n🔑 Kalit so'z: {match['keyword']}\n\n💬 Xabar:\n{msg_text}"),
-                        reply_markup=InlineKeyboardMarkup(keyboard)
-                    )
-            except Exception as e:
-                logger.error(f"Send message error: {e}")
+        group_workers.submit({
+            'group_id': update.message.chat.id,
+            'message_id': update.message.message_id,
+            'group_name': update.message.chat.title or "Unknown group",
+            'user_id': update.message.from_user.id,
+            'username': update.message.from_user.username or update.message.from_user.first_name or "Unknown",
+            'msg_text': update.message.text
+        })
     except Exception as e:
         logger.error(f"Check group message error: {e}")
 
 def error_handler(update: Update, context: CallbackContext):
     logger.error(f"Update {update} caused error {context.error}")
 
+# ==================== WEBHOOK ====================
+
+class WebhookRequestHandler(BaseHTTPRequestHandler):
+    """Telegram yangilanishlarini qabul qilib dispatcher navbatiga qo'yish"""
+
+    def do_POST(self):
+        server = self.server
+        if self.path.split('?', 1)[0] != server.path:
+            self.send_response(404)
+            self.end_headers()
+            return
+        token = self.headers.get('X-Telegram-Bot-Api-Secret-Token', '')
+        if not hmac.compare_digest(token, server.secret):
+            self.send_response(403)
+            self.end_headers()
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+        except ValueError:
+            length = -1
+        if length < 0 or length > server.max_body:
+            # Tana o'qilmaydi - ulanish yopiladi
+            self.close_connection = True
+            self.send_response(413 if length > server.max_body else 400)
+            self.end_headers()
+            return
+        try:
+            data = json.loads(self.rfile.read(length))
+            update = Update.de_json(data, server.dispatcher.bot)
+        except Exception as e:
+            logger.error(f"Webhook payload error: {e}")
+            self.send_response(400)
+            self.end_headers()
+            return
+        server.dispatcher.update_queue.put(update)
+        self.send_response(200)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        logger.debug("Webhook: " + format, *args)
+
+class WebhookServer(ThreadingHTTPServer):
+    """Lokal webhook HTTP server"""
+    daemon_threads = True
+
+    def __init__(self, address, dispatcher, path, secret, max_body=WEBHOOK_MAX_BODY):
+        # Secretsiz endpoint har qanday so'rovni yangilanish sifatida qabul qilgan bo'lardi
+        if not secret:
+            raise ValueError("WEBHOOK_SECRET bo'sh - webhook rejimi secretsiz ishga tushirilmaydi")
+        super().__init__(address, WebhookRequestHandler)
+        self.dispatcher = dispatcher
+        self.path = path
+        self.secret = secret
+        self.max_body = max_body
+
+def start_webhook(updater):
+    """Webhook serverni va dispatcherni fon oqimlarida ishga tushirish"""
+    server = WebhookServer((WEBHOOK_LISTEN, WEBHOOK_PORT), updater.dispatcher, WEBHOOK_PATH, WEBHOOK_SECRET, WEBHOOK_MAX_BODY)
+    threading.Thread(target=updater.dispatcher.start, name='dispatcher', daemon=True).start()
+    threading.Thread(target=server.serve_forever, name='webhook', daemon=True).start()
+    if WEBHOOK_URL:
+        updater.bot.set_webhook(url=WEBHOOK_URL, secret_token=WEBHOOK_SECRET, drop_pending_updates=True)
+    return server
+
+def stop_webhook(updater, server):
+    """Webhook server va dispatcherni to'xtatish"""
+    server.shutdown()
+    server.server_close()
+    updater.dispatcher.stop()
+
+# ==================== MAIN ====================
+
+def build_updater(bot=None):
+    """Updater yaratish va handlerlarni ro'yxatdan o'tkazish (bot - tayyor Bot obyekti, ixtiyoriy)"""
+    if bot is None:
+        updater = Updater(TOKEN, use_context=True)
+    else:
+        updater = Updater(bot=bot, use_context=True)
+    dp = updater.dispatcher
+    dp.add_handler(CommandHandler("start", start))
+    dp.add_handler(CommandHandler("id", get_chat_id))
+    dp.add_handler(CallbackQueryHandler(button_callback))
+    dp.add_handler(MessageHandler(Filters.text & Filters.private, handle_text))
+    dp.add_handler(MessageHandler(Filters.text & Filters.group, check_group_message))
+    dp.add_error_handler(error_handler)
+    return updater
+
+def init_settings():
+    """Database va standart sozlamalarni tayyorlash"""
+    db.init_db()
+    logger.info("✅ Database initialized")
+    if not db.get_setting('userbot_stop_time'):
+        db.set_setting('userbot_stop_time', '00:00')
+    if not db.get_setting('userbot_start_time'):
+        db.set_setting('userbot_start_time', '02:00')
+    if not db.get_setting('userbot_schedule_enabled'):
+        db.set_setting('userbot_schedule_enabled', 'true')
+
 def main():
     try:
-        db.init_db()
-        logger.info("✅ Database initialized")
-        if not db.get_setting('userbot_stop_time'):
-            db.set_setting('userbot_stop_time', '00:00')
-        if not db.get_setting('userbot_start_time'):
-            db.set_setting('userbot_start_time', '02:00')
-        if not db.get_setting('userbot_schedule_enabled'):
-            db.set_setting('userbot_schedule_enabled', 'true')
-        updater = Updater(TOKEN, use_context=True)
-        dp = updater.dispatcher
-        dp.add_handler(CommandHandler("start", start))
-        dp.add_handler(CommandHandler("id", get_chat_id))
-        dp.add_handler(CallbackQueryHandler(button_callback))
-        dp.add_handler(MessageHandler(Filters.text & Filters.private, handle_text))
-        dp.add_handler(MessageHandler(Filters.text & Filters.group, check_group_message))
-        dp.add_error_handler(error_handler)
+        init_settings()
+        updater = build_updater()
+        group_workers.start(updater.bot)
+        stats.recorder.start()
+        sinks.manager.start()
         logger.info("🚀 Bot ishga tushmoqda...")
         logger.info(f"📱 Bot Token: {TOKEN[:20]}...")
         logger.info(f"👤 Super Admin ID: {SUPER_ADMIN_ID}")
+        if WEBHOOK_ENABLED:
+            server = start_webhook(updater)
+            logger.info(f"✅ Bot webhook rejimida ishga tushdi: http://{WEBHOOK_LISTEN}:{WEBHOOK_PORT}{WEBHOOK_PATH}")
+            stop = threading.Event()
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                signal.signal(sig, lambda *_: stop.set())
+            stop.wait()
+            stop_webhook(updater, server)
+            group_workers.stop()
+            stats.recorder.stop()
+            sinks.manager.stop()
+            logger.info("⛔ Bot to'xtatildi")
+            return
         updater.start_polling(drop_pending_updates=True)
         logger.info("✅ Bot muvaffaqiyatli ishga tushdi!")
         updater.idle()
+        group_workers.stop()
+        stats.recorder.stop()
+        sinks.manager.stop()
     except KeyboardInterrupt:
         logger.info("⛔ Bot to'xtatildi")
     except Exception as e:
@@ -396,4 +934,6 @@ def main():
         sys.exit(1)
 
 if __name__ == '__main__':
+    # Alohida jarayon: userbot bilan umumiy xabarlar DB orqali band qilinadi
+    claims.shared = True
     main()
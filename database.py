@@ -1,110 +1,141 @@
 # ============================================
-# database.py - SQLite data layer
+# database.py - Data layer (ombor ustidagi umumiy API)
 # ============================================
 
-import sqlite3
+import itertools
+import logging
+import os
 import threading
-from datetime import datetime, timedelta
-
-_DB_PATH = 'data.db'
-_lock = threading.Lock()
-
-def get_db():
-    """Database connection yaratish"""
-    conn = sqlite3.connect(_DB_PATH, check_same_thread=False)
-    conn.row_factory = sqlite3.Row
-    return conn
+import time
+import uuid
+from datetime import timedelta
+import keyword_rules
+import snapshot
+from storage import MAX_SEARCH_GROUPS, create_storage
+
+# Ombor .env orqali tanlanadi: STORAGE_BACKEND=sqlite (standart) yoki memory
+_storage = create_storage(os.getenv('STORAGE_BACKEND', 'sqlite'), os.getenv('DB_PATH', 'data.db'))
+
+logger = logging.getLogger(__name__)
+
+# Kalit so'z indeksi boshqa jarayon yozuvlarini necha soniyada bir tekshiradi
+# (None - faqat shu jarayondagi o'zgarishlar, bot va userbot bitta jarayonda bo'lganda)
+_index_refresh = float(os.getenv('INDEX_REFRESH_SECONDS', 2))
+_index = {'groups': None, 'generation': None, 'checked_at': 0.0, 'version': 0, 'built_version': None, 'source': None}
+_index_versions = itertools.count(1)
+_index_lock = threading.Lock()
+# Jarayondagi birinchi indeks shu fayldagi snapshotdan olinadi (None - ishlatilmaydi)
+_index_snapshot = None
+
+# Adminlar, sozlamalar va shaxsiy guruhlar keshi necha soniya yashaydi
+# (0 - kesh o'chirilgan). Shu jarayondagi yozuvlar keshni darhol yangilaydi,
+# boshqa jarayon yozuvlari ko'pi bilan shuncha kechikib ko'rinadi.
+CACHE_TTL_SECONDS = float(os.getenv('CACHE_TTL_SECONDS', 30))
+
+def configure(storage):
+    """Omborni almashtirish (masalan, testlar va benchmarklar uchun MemoryStorage)"""
+    global _storage
+    _storage = storage
+    _index['groups'] = None
+    _invalidate_index()
+    clear_caches()
+
+def get_storage():
+    """Joriy omborni olish"""
+    return _storage
 
 def init_db():
     """Database jadvalarini yaratish"""
-    with _lock:
-        conn = get_db()
-        c = conn.cursor()
-
-        # Adminlar jadvali
-        c.execute("""
-        CREATE TABLE IF NOT EXISTS admins (
-            user_id INTEGER PRIMARY KEY,
-            username TEXT
-        )
-        """)
-
-        # Kalit so'zlar jadvali
-        c.execute("""
-        CREATE TABLE IF NOT EXISTS keywords (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            admin_id INTEGER NOT NULL,
-            keyword TEXT NOT NULL,
-            FOREIGN KEY(admin_id) REFERENCES admins(user_id)
-        )
-        """)
-
-        # Shaxsiy guruhlar jadvali
-        c.execute("""
-        CREATE TABLE IF NOT EXISTS private_groups (
-            admin_id INTEGER PRIMARY KEY,
-            group_id INTEGER,
-            group_link TEXT,
-            group_name TEXT,
-            FOREIGN KEY(admin_id) REFERENCES admins(user_id)
-        )
-        """)
-
-        # Izlovchi guruhlar jadvali
-        c.execute("""
-        CREATE TABLE IF NOT EXISTS search_groups (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            admin_id INTEGER NOT NULL,
-            group_id INTEGER,
-            group_link TEXT,
-            group_name TEXT,
-            created_at TEXT NOT NULL,
-            FOREIGN KEY(admin_id) REFERENCES admins(user_id)
-        )
-        """)
-
-        # Sozlamalar jadvali
-        c.execute("""
-        CREATE TABLE IF NOT EXISTS settings (
-            key TEXT PRIMARY KEY,
-            value TEXT
-        )
-        """)
-
-        # Rate limit jadvali
-        c.execute("""
-        CREATE TABLE IF NOT EXISTS rate_limits (
-            admin_id INTEGER PRIMARY KEY,
-            last_added_at TEXT
-        )
-        """)
-
-        conn.commit()
-        conn.close()
+    _storage.init()
+
+def _invalidate_index():
+    """Shu jarayondagi o'zgarishdan keyin indeksni eskirgan deb belgilash"""
+    _index['version'] = next(_index_versions)
+
+def get_generation():
+    """Ma'lumotlar generatsiyasini olish"""
+    return _storage.get_generation()
+
+def get_counts():
+    """Jadvallardagi yozuvlar sonini olish"""
+    return _storage.get_counts()
+
+# ==================== KESH ====================
+
+class ReadCache:
+    """Read-through kesh: qiymat TTL davomida saqlanadi, yozuvlar invalidate() orqali tozalaydi"""
+
+    def __init__(self, name):
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self._data = {}
+        self._epoch = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, loader):
+        if CACHE_TTL_SECONDS <= 0:
+            with self._lock:
+                self.misses += 1
+            return loader()
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[1] > now:
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            epoch = self._epoch
+        value = loader()
+        with self._lock:
+            # Yuklash paytida yozuv bo'lgan bo'lsa, eski qiymat keshga tushmaydi
+            if epoch == self._epoch:
+                self._data[key] = (value, now + CACHE_TTL_SECONDS)
+        return value
+
+    def invalidate(self, key=None):
+        """Bitta kalitni yoki (key=None) butun keshni tozalash"""
+        with self._lock:
+            self._epoch += 1
+            if key is None:
+                self._data.clear()
+            else:
+                self._data.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._data)}
+
+_settings_cache = ReadCache('settings')
+_admins_cache = ReadCache('admins')
+_private_groups_cache = ReadCache('private_groups')
+_caches = (_settings_cache, _admins_cache, _private_groups_cache)
+
+def set_cache_ttl(seconds):
+    """Kesh TTL ini sozlash (None - muddatsiz: barcha yozuvlar shu jarayondan o'tganda)"""
+    global CACHE_TTL_SECONDS
+    CACHE_TTL_SECONDS = float('inf') if seconds is None else seconds
+
+def clear_caches():
+    """Barcha keshlarni tozalash"""
+    for cache in _caches:
+        cache.invalidate()
+
+def cache_stats():
+    """Keshlar bo'yicha hit/miss hisoblagichlari"""
+    return {cache.name: cache.stats() for cache in _caches}
 
 # ==================== SOZLAMALAR ====================
 
 def get_setting(key, default=None):
     """Sozlamani olish"""
-    with _lock:
-        conn = get_db()
-        c = conn.cursor()
-        c.execute("SELECT value FROM settings WHERE key = ?", (key,))
-        row = c.fetchone()
-        conn.close()
-        return row['value'] if row else default
+    value = _settings_cache.get(key, lambda: _storage.get_setting(key))
+    return default if value is None else value
 
 def set_setting(key, value):
     """Sozlamani saqlash"""
-    with _lock:
-        conn = get_db()
-        c = conn.cursor()
-        c.execute("""
-        INSERT INTO settings(key, value) VALUES(?, ?)
-        ON CONFLICT(key) DO UPDATE SET value=excluded.value
-        """, (key, value))
-        conn.commit()
-        conn.close()
+    _storage.set_setting(key, value)
+    _settings_cache.invalidate(key)
 
 # ==================== ADMINLAR ====================
 
@@ -112,127 +143,116 @@ def is_admin(user_id, super_admin_id):
     """Foydalanuvchi admin ekanligini tekshirish"""
     if user_id == super_admin_id:
         return True
-    with _lock:
-        conn = get_db()
-        c = conn.cursor()
-        c.execute("SELECT 1 FROM admins WHERE user_id = ?", (user_id,))
-        exists = c.fetchone() is not None
-        conn.close()
-        return exists
+    return _admins_cache.get(user_id, lambda: _storage.is_admin(user_id))
 
 def add_admin(user_id, username):
     """Yangi admin qo'shish"""
-    with _lock:
-        conn = get_db()
-        c = conn.cursor()
-        try:
-            c.execute("INSERT INTO admins(user_id, username) VALUES(?, ?)", (user_id, username))
-            conn.commit()
-            return True
-        except sqlite3.IntegrityError:
-            return False
-        finally:
-            conn.close()
+    result = _storage.add_admin(user_id, username)
+    _admins_cache.invalidate()
+    return result
 
 def remove_admin(user_id):
     """Adminni o'chirish"""
-    with _lock:
-        conn = get_db()
-        c = conn.cursor()
-        c.execute("DELETE FROM admins WHERE user_id = ?", (user_id,))
-        c.execute("DELETE FROM keywords WHERE admin_id = ?", (user_id,))
-        c.execute("DELETE FROM private_groups WHERE admin_id = ?", (user_id,))
-        c.execute("DELETE FROM search_groups WHERE admin_id = ?", (user_id,))
-        c.execute("DELETE FROM rate_limits WHERE admin_id = ?", (user_id,))
-        conn.commit()
-        conn.close()
+    _storage.remove_admin(user_id)
+    _admins_cache.invalidate()
+    _private_groups_cache.invalidate(user_id)
+    _invalidate_index()
 
 def get_all_admins():
     """Barcha adminlarni olish"""
-    with _lock:
-        conn = get_db()
-        c = conn.cursor()
-        c.execute("SELECT user_id, username FROM admins ORDER BY username COLLATE NOCASE")
-        rows = c.fetchall()
-        conn.close()
-        return [(row['user_id'], row['username'] or f"User_{row['user_id']}") for row in rows]
+    admins = _admins_cache.get('all', lambda: [
+        (user_id, username or f"User_{user_id}") for user_id, username in _storage.get_all_admins()
+    ])
+    return list(admins)
 
 # ==================== KALIT SO'ZLAR ====================
 
-def add_keyword(admin_id, keyword):
-    """Kalit so'z qo'shish"""
-    with _lock:
-        conn = get_db()
-        c = conn.cursor()
-        c.execute("INSERT INTO keywords(admin_id, keyword) VALUES(?, ?)", (admin_id, keyword))
-        conn.commit()
-        conn.close()
+def add_keyword(admin_id, keyword, rule=None):
+    """Kalit so'z qo'shish (rule - keyword_rules.parse_rule natijasi yoki None)"""
+    _storage.add_keyword(admin_id, keyword, keyword_rules.dumps(rule) if rule is not None else None)
+    _invalidate_index()
 
 def get_keywords(admin_id):
     """Admin kalit so'zlarini olish"""
-    with _lock:
-        conn = get_db()
-        c = conn.cursor()
-        c.execute("SELECT id, keyword FROM keywords WHERE admin_id = ? ORDER BY id DESC", (admin_id,))
-        rows = c.fetchall()
-        conn.close()
-        return [(row['id'], row['keyword']) for row in rows]
+    return _storage.get_keywords(admin_id)
 
 def remove_keyword(keyword_id):
     """Kalit so'zni o'chirish"""
-    with _lock:
-        conn = get_db()
-        c = conn.cursor()
-        c.execute("DELETE FROM keywords WHERE id = ?", (keyword_id,))
-        conn.commit()
-        conn.close()
+    _storage.remove_keyword(keyword_id)
+    _invalidate_index()
+
+def get_keyword_scope(keyword_id):
+    """Kalit so'z bog'langan izlovchi guruh qatorlari (bo'sh - barcha guruhlar)"""
+    return _storage.get_keyword_scope(keyword_id)
+
+def toggle_keyword_scope(keyword_id, search_group_row_id):
+    """Kalit so'zni izlovchi guruhga bog'lash yoki bog'lanishni olib tashlash"""
+    scope = _storage.get_keyword_scope(keyword_id)
+    scope ^= {search_group_row_id}
+    _storage.set_keyword_scope(keyword_id, scope)
+    _invalidate_index()
+    return scope
+
+def get_exclusive_scope_keywords(admin_id, search_group_row_id):
+    """
+    Faqat shu izlovchi guruhga bog'langan kalit so'zlar: guruh bog'lanishdan olinsa yoki
+    o'chirilsa, ular adminning barcha guruhlarida izlana boshlaydi
+    Returns: [(keyword_id, keyword)]
+    """
+    scopes = {}
+    for keyword_id, row_id in _storage.load_index_data()['keyword_groups']:
+        scopes.setdefault(keyword_id, set()).add(row_id)
+    return [(kid, kw) for kid, kw in _storage.get_keywords(admin_id) if scopes.get(kid) == {search_group_row_id}]
+
+def clear_keyword_scope(keyword_id):
+    """Kalit so'zni yana adminning barcha izlovchi guruhlariga tegishli qilish"""
+    _storage.set_keyword_scope(keyword_id, set())
+    _invalidate_index()
 
 # ==================== SHAXSIY GURUHLAR ====================
 
 def add_private_group(admin_id, group_id=None, group_link=None, group_name=None):
     """Shaxsiy guruh qo'shish"""
-    with _lock:
-        conn = get_db()
-        c = conn.cursor()
-        c.execute("""
-        INSERT INTO private_groups(admin_id, group_id, group_link, group_name)
-        VALUES(?, ?, ?, ?)
-        ON CONFLICT(admin_id) DO UPDATE SET
-            group_id=excluded.group_id,
-            group_link=excluded.group_link,
-            group_name=excluded.group_name
-        """, (admin_id, group_id, group_link, group_name))
-        conn.commit()
-        conn.close()
+    _storage.add_private_group(admin_id, group_id, group_link, group_name)
+    _private_groups_cache.invalidate(admin_id)
+    _invalidate_index()
+
+def _get_private_group(admin_id):
+    return _private_groups_cache.get(admin_id, lambda: _storage.get_private_group(admin_id))
 
 def get_private_group_name(admin_id):
     """Shaxsiy guruh nomini olish"""
-    with _lock:
-        conn = get_db()
-        c = conn.cursor()
-        c.execute("SELECT group_name FROM private_groups WHERE admin_id = ?", (admin_id,))
-        row = c.fetchone()
-        conn.close()
-        return row['group_name'] if row else None
+    group = _get_private_group(admin_id)
+    return group['group_name'] if group else None
 
 def get_private_group_id(admin_id):
     """Shaxsiy guruh ID sini olish"""
-    with _lock:
-        conn = get_db()
-        c = conn.cursor()
-        c.execute("SELECT group_id FROM private_groups WHERE admin_id = ?", (admin_id,))
-        row = c.fetchone()
-        conn.close()
-        return row['group_id'] if row else None
+    group = _get_private_group(admin_id)
+    return group['group_id'] if group else None
 
 def remove_private_group(admin_id):
     """Shaxsiy guruhni o'chirish"""
-    with _lock:
-        conn = get_db()
-        c = conn.cursor()
-        c.execute("DELETE FROM private_groups WHERE admin_id = ?", (admin_id,))
-        conn.commit()
-        conn.close()
+    _storage.remove_private_group(admin_id)
+    _private_groups_cache.invalidate(admin_id)
+    _invalidate_index()
+
+# ==================== SINKLAR ====================
+
+def add_sink(admin_id, kind, target):
+    """Admin uchun qo'shimcha yetkazish manzili (webhook, JSONL, SQLite) qo'shish"""
+    _storage.add_sink(admin_id, kind, target)
+
+def get_sinks(admin_id):
+    """Admin sinklarini olish: [(id, kind, target)]"""
+    return _storage.get_sinks(admin_id)
+
+def get_all_sinks():
+    """Barcha sinklarni olish: [(id, admin_id, kind, target)]"""
+    return _storage.get_all_sinks()
+
+def remove_sink(sink_id):
+    """Sinkni o'chirish"""
+    _storage.remove_sink(sink_id)
 
 # ==================== IZLOVCHI GURUHLAR ====================
 
@@ -240,28 +260,9 @@ def _can_add_search_group(admin_id, super_admin_id):
     """Izlovchi guruh qo'shish mumkinligini tekshirish (rate limit)"""
     if admin_id == super_admin_id:
         return True, None
-    
-    with _lock:
-        conn = get_db()
-        c = conn.cursor()
-        c.execute("SELECT last_added_at FROM rate_limits WHERE admin_id = ?", (admin_id,))
-        row = c.fetchone()
-        now = datetime.utcnow()
-        
-        if row and row['last_added_at']:
-            last = datetime.strptime(row['last_added_at'], "%Y-%m-%d %H:%M:%S")
-            if now - last < timedelta(hours=1):
-                conn.close()
-                return False, "Bir soatda faqat bitta izlovchi guruh qo'shish mumkin"
-        
-        # Rate limit yangilash
-        c.execute("""
-        INSERT INTO rate_limits(admin_id, last_added_at) VALUES(?, ?)
-        ON CONFLICT(admin_id) DO UPDATE SET last_added_at=excluded.last_added_at
-        """, (admin_id, now.strftime("%Y-%m-%d %H:%M:%S")))
-        conn.commit()
-        conn.close()
-        return True, None
+    if not _storage.touch_rate_limit(admin_id, timedelta(hours=1)):
+        return False, "Bir soatda faqat bitta izlovchi guruh qo'shish mumkin"
+    return True, None
 
 def add_search_group(admin_id, super_admin_id, group_id=None, group_link=None, group_name=None):
     """Izlovchi guruh qo'shish"""
@@ -269,62 +270,252 @@ def add_search_group(admin_id, super_admin_id, group_id=None, group_link=None, g
     if not ok:
         return False, msg or "Cheklov tufayli qo'shib bo'lmadi"
 
-    with _lock:
-        conn = get_db()
-        c = conn.cursor()
-        
-        # Guruhlar sonini tekshirish (maksimal 100)
-        c.execute("SELECT COUNT(*) as cnt FROM search_groups WHERE admin_id = ?", (admin_id,))
-        count = c.fetchone()['cnt']
-        
-        if count >= 100:
-            conn.close()
-            return False, "Maksimal 100 ta izlovchi guruh qo'shish mumkin"
-        
-        c.execute("""
-        INSERT INTO search_groups(admin_id, group_id, group_link, group_name, created_at)
-        VALUES(?, ?, ?, ?, ?)
-        """, (admin_id, group_id, group_link, group_name, datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")))
-        conn.commit()
-        conn.close()
-        return True, "Izlovchi guruh qo'shildi"
+    if not _storage.add_search_group(admin_id, group_id, group_link, group_name, MAX_SEARCH_GROUPS):
+        return False, f"Maksimal {MAX_SEARCH_GROUPS} ta izlovchi guruh qo'shish mumkin"
+    _invalidate_index()
+    return True, "Izlovchi guruh qo'shildi"
+
+def add_search_groups_bulk(admin_id, groups):
+    """
+    Bir nechta izlovchi guruhni bitta tranzaksiyada qo'shish (super admin importi)
+    groups: list of dict {'group_id', 'group_link', 'group_name'}
+    Returns: har bir qator uchun (ok, message) ro'yxati
+    """
+    results = _storage.add_search_groups_bulk(admin_id, groups, MAX_SEARCH_GROUPS)
+    _invalidate_index()
+    return results
 
 def get_search_groups(admin_id):
     """Admin izlovchi guruhlarini olish"""
-    with _lock:
-        conn = get_db()
-        c = conn.cursor()
-        c.execute("SELECT id, group_name FROM search_groups WHERE admin_id = ? ORDER BY id DESC", (admin_id,))
-        rows = c.fetchall()
-        conn.close()
-        return [(row['id'], row['group_name']) for row in rows]
+    return _storage.get_search_groups(admin_id)
 
 def get_all_search_group_ids():
     """Barcha izlovchi guruhlarni olish"""
-    with _lock:
-        conn = get_db()
-        c = conn.cursor()
-        c.execute("SELECT id, admin_id, group_id, group_name FROM search_groups")
-        rows = c.fetchall()
-        conn.close()
-        return [{
-            'row_id': row['id'],
-            'admin_id': row['admin_id'],
-            'group_id': row['group_id'],
-            'group_name': row['group_name']
-        } for row in rows]
+    return _storage.get_all_search_groups()
 
 def remove_search_group(row_id):
     """Izlovchi guruhni o'chirish"""
-    with _lock:
-        conn = get_db()
-        c = conn.cursor()
-        c.execute("DELETE FROM search_groups WHERE id = ?", (row_id,))
-        conn.commit()
-        conn.close()
+    _storage.remove_search_group(row_id)
+    _invalidate_index()
+
+# ==================== LINKLARNI ANIQLASH ====================
+
+def apply_cached_link_resolutions():
+    """Keshda aniqlangan linklarni guruhlarga qo'llash"""
+    if _storage.apply_cached_link_resolutions():
+        # Shaxsiy guruhlar linklari ham aniqlangan bo'lishi mumkin
+        _private_groups_cache.invalidate()
+        _invalidate_index()
+
+def get_pending_links(limit=20):
+    """ID si hali aniqlanmagan va qayta urinish vaqti kelgan linklarni olish"""
+    return _storage.get_pending_links(limit)
+
+def save_link_resolution(link, chat_id, title):
+    """Aniqlangan linkni keshlash va unga bog'liq guruhlarni yangilash"""
+    _storage.save_link_resolution(link, chat_id, title)
+    _private_groups_cache.invalidate()
+    _invalidate_index()
+
+def mark_link_failed(link, error, retry_after):
+    """Linkni aniqlash muvaffaqiyatsiz bo'lsa, keyingi urinish vaqtini belgilash"""
+    _storage.mark_link_failed(link, error, retry_after)
+
+# ==================== STATISTIKA ====================
+
+def add_stats(rows):
+    """Rollup hisoblagichlarini qo'shish (stats.StatsRecorder partiyalari)"""
+    _storage.add_stats(rows)
+
+def query_stats(period, since, metric, admin_id=None, group_by='dim', limit=None):
+    """Rollup hisoblagichlari yig'indisi: [(key, count)]"""
+    return _storage.query_stats(period, since, metric, admin_id, group_by, limit)
+
+def prune_stats(period, before):
+    """Eski rollup bucket'larini o'chirish"""
+    _storage.prune_stats(period, before)
+
+# ==================== XABARLARNI BAND QILISH ====================
+
+# Ikki jarayonli rejimda band qilingan xabarlar qancha saqlanadi (soniya)
+MESSAGE_CLAIM_RETENTION = float(os.getenv('MESSAGE_CLAIM_RETENTION', 86400))
+_claims_pruned_at = 0.0
+
+def claim_message(chat_id, message_id):
+    """
+    Xabarni bot va userbot jarayonlari orasida band qilish (eski yozuvlar soatiga bir marta tozalanadi)
+    Returns: True - xabarni shu jarayon band qilgan bo'lsa
+    """
+    global _claims_pruned_at
+    now = time.time()
+    if now - _claims_pruned_at >= 3600:
+        _claims_pruned_at = now
+        _storage.prune_message_claims(now - MESSAGE_CLAIM_RETENTION)
+    return _storage.claim_message(chat_id, message_id, now)
+
+# ==================== KALIT SO'Z INDEKSI ====================
+
+def set_index_refresh(seconds):
+    """Indeksni boshqa jarayon o'zgarishlari uchun tekshirish oralig'ini sozlash (None - tekshirmaslik)"""
+    global _index_refresh
+    _index_refresh = seconds
+
+def set_index_snapshot(path):
+    """Indeks snapshoti faylini sozlash (None - snapshot ishlatilmaydi)"""
+    global _index_snapshot
+    _index_snapshot = path
+
+def get_data_id():
+    """Ombor identifikatori: snapshot boshqa (yoki qayta yaratilgan) DB ga tegishli emasligini tekshirish uchun"""
+    data_id = get_setting('data_id')
+    if data_id is None:
+        data_id = uuid.uuid4().hex
+        set_setting('data_id', data_id)
+    return data_id
+
+def save_index_snapshot(data=None):
+    """Indeks ma'lumotlarini snapshotga yozish. Returns: fayl hajmi yoki snapshot o'chirilgan bo'lsa None"""
+    if not _index_snapshot:
+        return None
+    if data is None:
+        data = _storage.load_index_data()
+    return snapshot.write(_index_snapshot, data, get_data_id())
+
+def _load_index_data(first):
+    """Indeks ma'lumotlari: jarayondagi birinchi qurishda snapshot yangi bo'lsa undan, aks holda ombordan"""
+    if not (first and _index_snapshot):
+        _index['source'] = 'db'
+        return _storage.load_index_data()
+    try:
+        data = snapshot.load(_index_snapshot, _storage.get_generation(), get_data_id())
+    except (snapshot.SnapshotError, ValueError, EOFError, OSError) as e:
+        logger.warning(f"⚠️ Indeks snapshotini o'qib bo'lmadi, DB dan quriladi: {e}")
+        data = None
+    if data is not None:
+        _index['source'] = 'snapshot'
+        return data
+    _index['source'] = 'db'
+    data = _storage.load_index_data()
+    try:
+        save_index_snapshot(data)
+    except OSError as e:
+        logger.warning(f"⚠️ Indeks snapshotini yozib bo'lmadi: {e}")
+    return data
+
+def get_index_source():
+    """Joriy indeks qayerdan qurilgan: 'snapshot', 'db' yoki hali qurilmagan bo'lsa None"""
+    return _index['source']
+
+def compile_keywords(items):
+    """
+    Kalit so'zlarni matching uchun tayyorlash
+    items: [(keyword, rule)] - rule: JSON matn, tahlil qilingan daraxt yoki oddiy kalit so'z uchun None
+    Returns: (keywords, rules) - [(keyword, keyword_lower)] va qoidalar teskari indeksi
+    """
+    keywords = [(kw, kw.lower()) for kw, rule in items if not rule]
+    rules = [(kw, keyword_rules.loads(rule) if isinstance(rule, str) else rule) for kw, rule in items if rule]
+    return keywords, keyword_rules.build_rule_index(rules)
+
+def build_keyword_index(data):
+    """
+    Ombor ma'lumotlaridan indeks qurish: har bir guruh uchun faqat unga tegishli kalit so'zlar
+    (guruhga bog'lanmagan kalit so'zlar adminning barcha guruhlariga tegishli; faqat hali
+    aniqlanmagan havola guruhlariga bog'langan kalit so'z hech qayerda izlanmaydi)
+    Returns: group_id -> [{'admin_id', 'keywords': [(keyword, keyword_lower)], 'rules': token -> [qoida],
+                           'private_group_id'}]
+    """
+    row_groups = {row_id: group_id for row_id, _, group_id in data['search_groups']}
+    scopes = {}
+    for keyword_id, row_id in data.get('keyword_groups', ()):
+        scope = scopes.setdefault(keyword_id, set())
+        if row_id in row_groups:
+            scope.add(row_groups[row_id])
+
+    # admin_id -> [(keyword_id, keyword, rule, scope group_id lari yoki None)]
+    by_admin = {}
+    for keyword_id, admin_id, keyword, rule in data['keywords']:
+        if keyword:
+            by_admin.setdefault(admin_id, []).append((keyword_id, keyword, rule, scopes.get(keyword_id)))
+
+    # Bir xil kalit so'z to'plamiga ega guruhlar bitta matcherdan foydalanadi
+    matchers = {}
+
+    def matcher(admin_id, group_id):
+        items = [item for item in by_admin.get(admin_id, ()) if item[3] is None or group_id in item[3]]
+        key = tuple(item[0] for item in items)
+        if key not in matchers:
+            matchers[key] = compile_keywords([(kw, rule) for _, kw, rule, _ in items])
+        return matchers[key]
+
+    groups = {}
+    seen = set()
+    for _, admin_id, group_id in data['search_groups']:
+        if (group_id, admin_id) in seen:
+            continue
+        seen.add((group_id, admin_id))
+        keywords, rules = matcher(admin_id, group_id)
+        groups.setdefault(group_id, []).append({
+            'admin_id': admin_id,
+            'keywords': keywords,
+            'rules': rules,
+            'private_group_id': data['private_groups'].get(admin_id)
+        })
+    return groups
+
+def get_keyword_index():
+    """Xotiradagi kalit so'z indeksini olish (eskirgan bo'lsa qayta qurish)"""
+    with _index_lock:
+        now = time.monotonic()
+        groups = _index['groups']
+        if _index['built_version'] != _index['version']:
+            groups = None
+        elif _index_refresh is not None and now - _index['checked_at'] >= _index_refresh:
+            _index['checked_at'] = now
+            if _storage.get_generation() != _index['generation']:
+                groups = None
+        if groups is None:
+            # Versiya o'qishdan oldin olinadi: qurish paytidagi o'zgarish keyingi chaqiruvda qayta quradi
+            version = _index['version']
+            data = _load_index_data(_index['groups'] is None)
+            groups = build_keyword_index(data)
+            _index.update(groups=groups, generation=data['generation'], checked_at=now, built_version=version)
+        return groups
+
+def is_watched_group(group_id, refresh=True):
+    """
+    Guruh biror admin tomonidan kuzatilayotganini tekshirish
+    refresh=False - DB ga murojaat qilmasdan, xotiradagi oxirgi indeks bo'yicha
+    (indeks hali qurilmagan bo'lsa guruh kuzatiladi deb hisoblanadi)
+    """
+    groups = get_keyword_index() if refresh else _index['groups']
+    return groups is None or group_id in groups
 
 # ==================== KALIT SO'Z TEKSHIRISH ====================
 
+class MessageText:
+    """Xabar matni: kichik harfli ko'rinish va (kerak bo'lsa) bir marta ajratilgan so'zlar"""
+
+    __slots__ = ('text', 'lower', '_tokens')
+
+    def __init__(self, text):
+        self.text = text
+        self.lower = text.lower()
+        self._tokens = None
+
+    @property
+    def tokens(self):
+        if self._tokens is None:
+            self._tokens = keyword_rules.MessageTokens(self.text)
+        return self._tokens
+
+def match_compiled(keywords, rules, message):
+    """compile_keywords natijasini xabarga qo'llash. Returns: mos kelgan kalit so'zlar"""
+    matched = [kw for kw, kw_lower in keywords if kw_lower in message.lower]
+    if rules:
+        # Xabar bir marta so'zlarga ajratiladi, qoidalar teskari indeks orqali tanlanadi
+        matched.extend(keyword_rules.match_rules(rules, message.tokens))
+    return matched
+
 def check_keywords_in_message(group_id, msg_text):
     """
     Xabardagi kalit so'zlarni tekshirish
@@ -332,41 +523,25 @@ def check_keywords_in_message(group_id, msg_text):
     [
         {
             'keyword': str,
+            'admin_id': int,
             'private_group_id': int or None
         }
     ]
     """
     if not msg_text:
         return []
-    
-    msg_lower = msg_text.lower()
-
-    with _lock:
-        conn = get_db()
-        c = conn.cursor()
-        
-        # Bu guruhni kuzatayotgan adminlarni topish
-        c.execute("SELECT admin_id FROM search_groups WHERE group_id = ?", (group_id,))
-        owners = [row['admin_id'] for row in c.fetchall()]
-
-        results = []
-        for admin_id in owners:
-            # Admin kalit so'zlarini olish
-            c.execute("SELECT keyword FROM keywords WHERE admin_id = ?", (admin_id,))
-            kws = [row['keyword'] for row in c.fetchall()]
-            
-            # Admin shaxsiy guruhini olish
-            c.execute("SELECT group_id FROM private_groups WHERE admin_id = ?", (admin_id,))
-            pr = c.fetchone()
-            private_gid = pr['group_id'] if pr else None
-
-            # Kalit so'zlarni tekshirish
-            for kw in kws:
-                if kw and kw.lower() in msg_lower:
-                    results.append({
-                        'keyword': kw,
-                        'private_group_id': private_gid
-                    })
-
-        conn.close()
-        return results
+
+    owners = get_keyword_index().get(group_id)
+    if not owners:
+        return []
+
+    message = MessageText(msg_text)
+    results = []
+    for owner in owners:
+        for kw in match_compiled(owner['keywords'], owner['rules'], message):
+            results.append({
+                'keyword': kw,
+                'admin_id': owner['admin_id'],
+                'private_group_id': owner['private_group_id']
+            })
+    return results
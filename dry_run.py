@@ -0,0 +1,179 @@
+# ============================================
+# dry_run.py - Kalit so'zlarni xabarlar arxivida sinab ko'rish
+# ============================================
+#
+# Arxiv - JSONL fayl, har bir qatorda bitta xabar:
+#   {"text": "...", "date": "2026-10-19T14:00:00", "group_id": -100123}
+# `text` Telegram eksportidagidek qismlar ro'yxati bo'lishi ham mumkin;
+# sana `date` yoki `created_at` (ISO matn yoki unix vaqt) maydonidan olinadi.
+#
+# Fayl qism-qism (chunk) o'qiladi - xotira arxiv hajmiga emas, kalit so'zlar
+# va kunlar soniga bog'liq. Matching database.check_keywords_in_message bilan
+# bir xil (compile_keywords / match_compiled).
+#
+# Ishlatish:
+#   python dry_run.py archive.jsonl -k kvartira -k "uy AND sotiladi NOT garaj"
+#   python dry_run.py archive.jsonl --keywords-file candidates.txt --group -100123
+
+import argparse
+import itertools
+import json
+import sys
+from collections import Counter
+from datetime import datetime, timezone
+import database as db
+import keyword_rules
+
+CHUNK_SIZE = 5000
+
+def parse_candidates(lines):
+    """
+    Nomzod kalit so'zlarni tayyorlash (bot.handle_text dagi kabi: qoida bo'lsa tahlil qilinadi)
+    Returns: (items, errors) - [(keyword, rule yoki None)] va [(keyword, xato matni)]
+    """
+    items = []
+    errors = []
+    seen = set()
+    for line in lines:
+        keyword = line.strip()
+        if not keyword or keyword in seen:
+            continue
+        seen.add(keyword)
+        if keyword_rules.is_rule(keyword):
+            try:
+                items.append((keyword, keyword_rules.parse_rule(keyword)))
+            except keyword_rules.RuleError as e:
+                errors.append((keyword, str(e)))
+        else:
+            items.append((keyword, None))
+    return items, errors
+
+def message_text(record):
+    """Arxiv yozuvidan matnni olish (oddiy matn yoki Telegram eksportidagi qismlar ro'yxati)"""
+    text = record.get('text') or ''
+    if isinstance(text, list):
+        text = ''.join(part if isinstance(part, str) else part.get('text', '') for part in text)
+    return text
+
+def message_day(record):
+    """Xabar kunini YYYY-MM-DD ko'rinishida olish"""
+    value = record.get('date') or record.get('created_at')
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value, timezone.utc).strftime('%Y-%m-%d')
+    if isinstance(value, str) and len(value) >= 10:
+        return value[:10]
+    return 'noma\'lum'
+
+def run(path, items, chunk_size=CHUNK_SIZE, group_id=None, progress=None):
+    """
+    Arxivni nomzod kalit so'zlar bilan o'tkazish
+    Returns: {'messages', 'skipped', 'matched_messages', 'notifications', 'per_keyword', 'per_day', 'per_day_keyword'}
+    """
+    keywords, rules = db.compile_keywords(items)
+    result = {
+        'messages': 0,
+        'skipped': 0,
+        'matched_messages': 0,
+        'notifications': 0,
+        'per_keyword': Counter(),
+        'per_day': Counter(),
+        'per_day_keyword': Counter()
+    }
+    with open(path, encoding='utf-8') as f:
+        while True:
+            chunk = list(itertools.islice(f, chunk_size))
+            if not chunk:
+                break
+            for line in chunk:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    result['skipped'] += 1
+                    continue
+                if not isinstance(record, dict):
+                    result['skipped'] += 1
+                    continue
+                if group_id is not None and record.get('group_id', record.get('chat_id')) != group_id:
+                    continue
+                text = message_text(record)
+                if not text:
+                    continue
+                result['messages'] += 1
+                matched = db.match_compiled(keywords, rules, db.MessageText(text))
+                if not matched:
+                    continue
+                day = message_day(record)
+                result['matched_messages'] += 1
+                # Har bir mos kelgan kalit so'z uchun alohida bildirishnoma yuboriladi
+                result['notifications'] += len(matched)
+                result['per_day'][day] += len(matched)
+                for kw in matched:
+                    result['per_keyword'][kw] += 1
+                    result['per_day_keyword'][(day, kw)] += 1
+            if progress:
+                progress(result)
+    return result
+
+def format_report(result, items, errors=(), top_days=14):
+    """Natijani matn ko'rinishida chiqarish"""
+    lines = [
+        "🧪 Dry-run natijasi",
+        f"📨 Xabarlar: {result['messages']} ta (o'qilmagan qatorlar: {result['skipped']})",
+        f"🔍 Mos kelgan xabarlar: {result['matched_messages']} ta",
+        f"🔔 Taxminiy bildirishnomalar: {result['notifications']} ta"
+    ]
+    days = sorted(result['per_day'])
+    if days:
+        lines.append(f"📅 O'rtacha kuniga: {result['notifications'] / len(days):.1f} ({len(days)} kun)")
+    lines.append("")
+    lines.append("🔑 Kalit so'zlar bo'yicha:")
+    for kw, _ in items:
+        count = result['per_keyword'].get(kw, 0)
+        peak = max((result['per_day_keyword'][(day, kw)] for day in days), default=0)
+        lines.append(f"• {kw} - {count} ta (kunlik maksimum {peak})")
+    for kw, error in errors:
+        lines.append(f"❌ {kw} - {error}")
+    if days:
+        lines.append("")
+        lines.append(f"📈 Kunlar bo'yicha (oxirgi {min(top_days, len(days))} kun):")
+        for day in days[-top_days:]:
+            lines.append(f"{day}: {result['per_day'][day]}")
+    return lines
+
+def main():
+    parser = argparse.ArgumentParser(description="Nomzod kalit so'zlarni xabarlar arxivida sinab ko'rish")
+    parser.add_argument('archive', help="JSONL arxiv fayli")
+    parser.add_argument('-k', '--keyword', action='append', default=[], help="nomzod kalit so'z yoki qoida (bir necha marta)")
+    parser.add_argument('--keywords-file', help="har bir qatorda bitta kalit so'z")
+    parser.add_argument('--group', type=int, help="faqat shu guruh xabarlari")
+    parser.add_argument('--chunk', type=int, default=CHUNK_SIZE, help="bir martada o'qiladigan qatorlar")
+    parser.add_argument('--days', type=int, default=14, help="hisobotdagi kunlar soni")
+    parser.add_argument('--json', action='store_true', help="natijani JSON ko'rinishida chiqarish")
+    args = parser.parse_args()
+
+    lines = list(args.keyword)
+    if args.keywords_file:
+        with open(args.keywords_file, encoding='utf-8') as f:
+            lines.extend(f)
+    items, errors = parse_candidates(lines)
+    for kw, error in errors:
+        print(f"❌ {kw}: {error}", file=sys.stderr)
+    if not items:
+        print("❌ Kalit so'zlar berilmadi", file=sys.stderr)
+        sys.exit(2)
+
+    result = run(args.archive, items, args.chunk, args.group)
+    if args.json:
+        print(json.dumps({
+            'messages': result['messages'],
+            'skipped': result['skipped'],
+            'matched_messages': result['matched_messages'],
+            'notifications': result['notifications'],
+            'per_keyword': dict(result['per_keyword']),
+            'per_day': dict(sorted(result['per_day'].items()))
+        }, ensure_ascii=False, indent=2))
+    else:
+        print("\n".join(format_report(result, items, errors, args.days)))
+
+if __name__ == '__main__':
+    main()
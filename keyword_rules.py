@@ -0,0 +1,209 @@
+# ============================================
+# keyword_rules.py - Mantiqiy (AND/OR/NOT) va ibora qoidalari
+# ============================================
+#
+# Qoida sintaksisi:
+#   kvartira AND (sotiladi OR ijaraga) NOT garaj
+#   "uy sotiladi" OR "hovli sotiladi"
+#
+# - So'zlar butun so'z sifatida solishtiriladi ("uy" -> "uylar" ga mos kelmaydi)
+# - Qo'shtirnoq ichidagi ibora ketma-ket kelgan so'zlarga mos keladi
+# - Operatorlar katta harflarda yoziladi; yonma-yon so'zlar orasida AND nazarda tutiladi
+# - Katta harfli operator bo'lmagan kalit so'z oddiy kalit so'z bo'lib qoladi
+#   (avvalgidek matn ichidan qidiriladi) - `Samsung (A52)` yoki `"Chevrolet"` ham
+
+import json
+import re
+
+OPERATORS = ('AND', 'OR', 'NOT')
+APOSTROPHES = str.maketrans({c: "'" for c in "ʻʼ‘’`´"})
+TOKEN_RE = re.compile(r"\w+(?:'\w+)*")
+LEXEME_RE = re.compile(r'\s*(?:(\()|(\))|"([^"]*)"|([^\s()"]+))')
+
+class RuleError(ValueError):
+    """Qoidani tahlil qilib bo'lmadi"""
+
+def normalize(text):
+    """Matnni kichik harflarga o'tkazish va apostroflarni bir xil ko'rinishga keltirish"""
+    return text.translate(APOSTROPHES).lower()
+
+def tokenize(text):
+    """Matnni so'zlarga ajratish"""
+    return TOKEN_RE.findall(normalize(text))
+
+def is_rule(text):
+    """Kalit so'z qoida sintaksisida yozilganini tekshirish (faqat katta harfli operator bo'yicha)"""
+    return any(word in OPERATORS for word in re.split(r'[\s()"]+', text))
+
+# ==================== TAHLIL ====================
+
+def _lex(text):
+    lexemes = []
+    pos = 0
+    text = text.strip()
+    while pos < len(text):
+        m = LEXEME_RE.match(text, pos)
+        if not m or m.end() == pos:
+            raise RuleError("Yopilmagan qo'shtirnoq")
+        pos = m.end()
+        lparen, rparen, phrase, word = m.groups()
+        if lparen:
+            lexemes.append(('(', None))
+        elif rparen:
+            lexemes.append((')', None))
+        elif phrase is not None:
+            words = tokenize(phrase)
+            if not words:
+                raise RuleError("Bo'sh ibora")
+            lexemes.append(('atom', words))
+        elif word in OPERATORS:
+            lexemes.append((word, None))
+        else:
+            words = tokenize(word)
+            if words:
+                lexemes.append(('atom', words))
+    return lexemes
+
+class _Parser:
+    """expr := and (OR and)* ; and := unary ((AND)? unary)* ; unary := NOT unary | atom"""
+
+    def __init__(self, lexemes):
+        self.lexemes = lexemes
+        self.pos = 0
+
+    def peek(self):
+        return self.lexemes[self.pos][0] if self.pos < len(self.lexemes) else None
+
+    def take(self):
+        lexeme = self.lexemes[self.pos]
+        self.pos += 1
+        return lexeme
+
+    def parse(self):
+        if not self.lexemes:
+            raise RuleError("Qoida bo'sh")
+        node = self.parse_or()
+        if self.peek() is not None:
+            raise RuleError("Ortiqcha ')' yoki operator")
+        return node
+
+    def parse_or(self):
+        items = [self.parse_and()]
+        while self.peek() == 'OR':
+            self.take()
+            items.append(self.parse_and())
+        return items[0] if len(items) == 1 else ['or', items]
+
+    def parse_and(self):
+        items = [self.parse_unary()]
+        while self.peek() in ('AND', 'NOT', 'atom', '('):
+            if self.peek() == 'AND':
+                self.take()
+            items.append(self.parse_unary())
+        return items[0] if len(items) == 1 else ['and', items]
+
+    def parse_unary(self):
+        kind = self.peek()
+        if kind == 'NOT':
+            self.take()
+            return ['not', self.parse_unary()]
+        if kind == 'atom':
+            words = self.take()[1]
+            return ['term', words[0]] if len(words) == 1 else ['phrase', words]
+        if kind == '(':
+            self.take()
+            node = self.parse_or()
+            if self.peek() != ')':
+                raise RuleError("Yopilmagan qavs")
+            self.take()
+            return node
+        raise RuleError("Operatordan keyin so'z kutilgan edi")
+
+def parse_rule(text):
+    """
+    Qoidani daraxtga aylantirish (JSON sifatida saqlanadi)
+    Returns: ['and'|'or', [...]] | ['not', node] | ['term', word] | ['phrase', [words]]
+    """
+    tree = _Parser(_lex(text)).parse()
+    # Hech qanday so'z talab qilmaydigan qoida (masalan "NOT garaj") har bir xabarga mos keladi
+    if evaluate(tree, MessageTokens('')):
+        raise RuleError("Qoidada kamida bitta majburiy so'z bo'lishi kerak")
+    return tree
+
+def dumps(tree):
+    return json.dumps(tree, ensure_ascii=False)
+
+def loads(data):
+    return json.loads(data)
+
+# ==================== BAHOLASH ====================
+
+class MessageTokens:
+    """Xabar bir marta so'zlarga ajratiladi va barcha qoidalar shu natijadan foydalanadi"""
+
+    __slots__ = ('tokens', 'set', '_positions')
+
+    def __init__(self, text):
+        self.tokens = tokenize(text)
+        self.set = set(self.tokens)
+        self._positions = None
+
+    def has_phrase(self, words):
+        if not self.set.issuperset(words):
+            return False
+        if self._positions is None:
+            self._positions = {}
+            for i, token in enumerate(self.tokens):
+                self._positions.setdefault(token, []).append(i)
+        size = len(words)
+        return any(self.tokens[i:i + size] == words for i in self._positions[words[0]])
+
+def evaluate(tree, message):
+    """Qoidani xabar so'zlariga nisbatan baholash"""
+    op = tree[0]
+    if op == 'term':
+        return tree[1] in message.set
+    if op == 'phrase':
+        return message.has_phrase(tree[1])
+    if op == 'not':
+        return not evaluate(tree[1], message)
+    if op == 'and':
+        return all(evaluate(item, message) for item in tree[1])
+    return any(evaluate(item, message) for item in tree[1])
+
+def trigger_tokens(tree, positive=True):
+    """
+    Qoida mos kelishi uchun xabarda bo'lishi mumkin bo'lgan so'zlar (NOT ostida bo'lmaganlar).
+    Bo'sh xabarga mos kelmaydigan qoida faqat shu so'zlardan biri bo'lganda mos kelishi mumkin.
+    """
+    op = tree[0]
+    if op == 'term':
+        return {tree[1]} if positive else set()
+    if op == 'phrase':
+        return {tree[1][0]} if positive else set()
+    if op == 'not':
+        return trigger_tokens(tree[1], not positive)
+    tokens = set()
+    for item in tree[1]:
+        tokens |= trigger_tokens(item, positive)
+    return tokens
+
+def build_rule_index(rules):
+    """
+    Teskari indeks qurish
+    rules: [(keyword, tree)]
+    Returns: token -> [(tartib raqami, keyword, tree)]
+    """
+    index = {}
+    for order, (keyword, tree) in enumerate(rules):
+        for token in trigger_tokens(tree):
+            index.setdefault(token, []).append((order, keyword, tree))
+    return index
+
+def match_rules(index, message):
+    """Xabarga mos kelgan qoidalar (faqat xabar so'zlari orqali topilgan nomzodlar baholanadi)"""
+    candidates = {}
+    for token in message.set:
+        for order, keyword, tree in index.get(token, ()):
+            candidates[order] = (keyword, tree)
+    return [keyword for _, (keyword, tree) in sorted(candidates.items()) if evaluate(tree, message)]
@@ -0,0 +1,512 @@
+# ============================================
+# loadtest.py - Offline yuklama testi (soxta Telethon eventlari va soxta Bot API)
+# ============================================
+#
+# Misollar:
+#   python loadtest.py --target userbot --rate 500 --messages 5000
+#   python loadtest.py --target bot --groups 200 --match-ratio 0.3
+#   python loadtest.py --target webhook --retry-after-ratio 0.05
+#   python loadtest.py --target admin-ui --requests 5000
+#   python loadtest.py --target cold-start --keywords 2000 --rule-ratio 0.5
+#
+# Telegram ga hech qanday so'rov yuborilmaydi: bildirishnomalar lokal soxta
+# Bot API serverga boradi, ma'lumotlar esa xotiradagi omborda saqlanadi.
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+import urllib.request
+from types import SimpleNamespace
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+os.environ.setdefault('BOT_TOKEN', '123456:LOADTEST')
+os.environ.setdefault('SUPER_ADMIN_ID', '1')
+os.environ.setdefault('PHONE_NUMBER', '+10000000000')
+os.environ.setdefault('API_ID', '1')
+os.environ.setdefault('API_HASH', 'loadtest')
+os.environ.setdefault('SESSION_STRING', 'loadtest')
+
+from telegram import Bot, Update
+from telegram.utils.request import Request
+
+import database as db
+import keyword_rules
+import snapshot
+from notifier import match_state
+from storage import MemoryStorage, SQLiteStorage
+import bot as bot_module
+import userbot
+
+MARKER_RE = re.compile(r'#lt(\d+)')
+
+# ==================== SOXTA BOT API ====================
+
+class FakeBotApiHandler(BaseHTTPRequestHandler):
+    """Bot API so'rovlarini yozib olish va kerak bo'lsa 429 qaytarish"""
+
+    def do_POST(self):
+        server = self.server
+        method = self.path.rsplit('/', 1)[-1]
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length)
+        try:
+            params = json.loads(body) if body else {}
+        except ValueError:
+            params = {}
+
+        if method == 'getMe':
+            self._reply({'ok': True, 'result': {'id': 1, 'is_bot': True, 'first_name': 'LoadTest', 'username': 'loadtest_bot'}})
+            return
+
+        if method == 'sendMessage':
+            if server.retry_after_ratio and random.random() < server.retry_after_ratio:
+                with server.lock:
+                    server.rejected += 1
+                self._reply({
+                    'ok': False,
+                    'error_code': 429,
+                    'description': f"Too Many Requests: retry after {server.retry_after}",
+                    'parameters': {'retry_after': server.retry_after}
+                }, status=429)
+                return
+            received_at = time.perf_counter()
+            match = MARKER_RE.search(params.get('text', ''))
+            with server.lock:
+                server.received.append((received_at, int(match.group(1)) if match else None))
+            self._reply({'ok': True, 'result': {
+                'message_id': len(server.received),
+                'date': int(time.time()),
+                'chat': {'id': params.get('chat_id'), 'type': 'supergroup', 'title': 'Private'},
+                'text': params.get('text', '')
+            }})
+            return
+
+        self._reply({'ok': True, 'result': True})
+
+    def _reply(self, data, status=200):
+        payload = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+class FakeBotApi(ThreadingHTTPServer):
+    """Lokal soxta Bot API server"""
+    daemon_threads = True
+
+    def __init__(self, retry_after_ratio=0.0, retry_after=1):
+        super().__init__(('127.0.0.1', 0), FakeBotApiHandler)
+        self.retry_after_ratio = retry_after_ratio
+        self.retry_after = retry_after
+        self.received = []
+        self.rejected = 0
+        self.lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/bot"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, name='fake-bot-api', daemon=True).start()
+        return self
+
+# ==================== MA'LUMOTLAR ====================
+
+def seed_storage(admins, groups, keywords_per_admin, rule_ratio=0.0, storage=None):
+    """
+    Omborni (standart - xotiradagi) sintetik ma'lumotlar bilan to'ldirish
+    Har bir guruhni bitta admin kuzatadi, kalit so'zlar bir-birining qismi emas.
+    rule_ratio - kalit so'zlarning qaysi ulushi "<so'z> NOT reklama" qoidasi sifatida saqlansin
+    Returns: {group_id: [keyword, ...]}
+    """
+    if storage is None:
+        storage = MemoryStorage()
+    group_keywords = {}
+    for a in range(admins):
+        admin_id = 1000 + a
+        storage.add_admin(admin_id, f"admin{a}")
+        storage.add_private_group(admin_id, group_id=-2000000000 - a, group_name=f"Private {a}")
+        kws = [f"kalit{a:04d}x{k:04d}z" for k in range(keywords_per_admin)]
+        for k, kw in enumerate(kws):
+            if k < keywords_per_admin * rule_ratio:
+                text = f"{kw} NOT reklama"
+                storage.add_keyword(admin_id, text, keyword_rules.dumps(keyword_rules.parse_rule(text)))
+            else:
+                storage.add_keyword(admin_id, kw)
+        for g in range(a, groups, admins):
+            group_id = -1000000000 - g
+            storage.add_search_group(admin_id, group_id=group_id, group_name=f"Group {g}")
+            group_keywords[group_id] = kws
+    db.configure(storage)
+    return group_keywords
+
+def make_messages(count, group_keywords, match_ratio, skew, seed, unwatched_ratio=0.0):
+    """
+    Sintetik xabarlar: (seq, group_id, text, matches)
+    skew - guruhlar bo'yicha Zipf taqsimoti darajasi (0 - tekis)
+    unwatched_ratio - hech kim kuzatmaydigan chatlardan keladigan xabarlar ulushi
+    """
+    rng = random.Random(seed)
+    group_ids = sorted(group_keywords)
+    weights = [1.0 / (rank + 1) ** skew for rank in range(len(group_ids))]
+    messages = []
+    for seq in range(count):
+        words = [rng.choice(['sotiladi', 'uy', 'mashina', 'narxi', 'kelishamiz', 'tel', 'yangi']) for _ in range(8)]
+        if rng.random() < unwatched_ratio:
+            messages.append((seq, -3000000000 - rng.randrange(1000), f"{' '.join(words)} #lt{seq}", False))
+            continue
+        group_id = rng.choices(group_ids, weights)[0]
+        matches = rng.random() < match_ratio
+        if matches:
+            words.insert(rng.randrange(len(words)), rng.choice(group_keywords[group_id]))
+        messages.append((seq, group_id, f"{' '.join(words)} #lt{seq}", matches))
+    return messages
+
+# ==================== SOXTA EVENTLAR ====================
+
+class FakeChat:
+    def __init__(self, group_id):
+        self.id = group_id
+        self.megagroup = True
+        self.title = f"Group {group_id}"
+
+class FakeSender:
+    def __init__(self, user_id):
+        self.id = user_id
+        self.username = f"user{user_id}"
+        self.first_name = "Load"
+
+class FakeMessage:
+    def __init__(self, message_id, text):
+        self.id = message_id
+        self.text = text
+
+class FakeNewMessageEvent:
+    """Telethon events.NewMessage.Event o'rnini bosuvchi obyekt"""
+
+    def __init__(self, seq, group_id, text):
+        self.chat_id = group_id
+        self.message = FakeMessage(seq + 1, text)
+        self._chat = FakeChat(group_id)
+        self._sender = FakeSender(500000 + seq % 1000)
+
+    async def get_chat(self):
+        return self._chat
+
+    async def get_sender(self):
+        return self._sender
+
+def make_update_payload(seq, group_id, text):
+    """PTB Update uchun JSON (Bot API formatida)"""
+    return {
+        'update_id': seq + 1,
+        'message': {
+            'message_id': seq + 1,
+            'date': int(time.time()),
+            'chat': {'id': group_id, 'type': 'supergroup', 'title': f"Group {group_id}"},
+            'from': {'id': 500000 + seq % 1000, 'is_bot': False, 'first_name': 'Load', 'username': f"user{seq % 1000}"},
+            'text': text
+        }
+    }
+
+# ==================== YUKLAMA ====================
+
+async def drive_userbot(messages, rate, sent_at, workers, queue_size, overflow):
+    """Xabarlarni userbot ingest navbati va message_handler orqali berilgan tezlikda o'tkazish"""
+    # userbot.main kabi indeks oldindan quriladi - navbat kuzatilishni xotiradagi indeksdan oladi
+    db.get_keyword_index()
+    ingest = userbot.IngestQueue(userbot.message_handler, workers, queue_size, overflow)
+    ingest.start()
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    for i, (seq, group_id, text, _) in enumerate(messages):
+        delay = start + i / rate - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        sent_at[seq] = time.perf_counter()
+        await ingest.put(FakeNewMessageEvent(seq, group_id, text))
+    await ingest.join()
+    stats = ingest.stats()
+    await ingest.stop()
+    return stats
+
+def drive_bot(messages, rate, sent_at, api_bot):
+    """Xabarlarni bot.check_group_message orqali berilgan tezlikda o'tkazish"""
+    start = time.perf_counter()
+    for i, (seq, group_id, text, _) in enumerate(messages):
+        delay = start + i / rate - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        sent_at[seq] = time.perf_counter()
+        bot_module.check_group_message(Update.de_json(make_update_payload(seq, group_id, text), api_bot), None)
+
+def drive_webhook(messages, rate, sent_at, url, secret):
+    """Xabarlarni lokal webhook server orqali berilgan tezlikda o'tkazish"""
+    start = time.perf_counter()
+    for i, (seq, group_id, text, _) in enumerate(messages):
+        delay = start + i / rate - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        sent_at[seq] = time.perf_counter()
+        request = urllib.request.Request(url, data=json.dumps(make_update_payload(seq, group_id, text)).encode(), headers={
+            'Content-Type': 'application/json',
+            'X-Telegram-Bot-Api-Secret-Token': secret
+        })
+        urllib.request.urlopen(request).read()
+
+def wait_for_drain(api, expected, timeout):
+    """Barcha kutilgan bildirishnomalar kelguncha yoki timeout gacha kutish"""
+    deadline = time.perf_counter() + timeout
+    last, stable_since = -1, time.perf_counter()
+    while time.perf_counter() < deadline:
+        count = len(api.received)
+        if count >= expected:
+            return
+        if count != last:
+            last, stable_since = count, time.perf_counter()
+        elif time.perf_counter() - stable_since > 2:
+            return
+        time.sleep(0.05)
+
+def percentile(values, pct):
+    """Nearest-rank persentil"""
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, int(round(pct / 100 * len(values))) - 1))]
+
+def report(target, messages, sent_at, api, started, finished, ingest_stats=None):
+    """Natijalarni chiqarish"""
+    expected = sum(1 for m in messages if m[3])
+    latencies = [(received - sent_at[seq]) * 1000 for received, seq in api.received if seq in sent_at]
+    duration = finished - started
+    print("=" * 60)
+    print(f"🎯 Target: {target}")
+    print(f"📨 Xabarlar: {len(messages)} ta, {duration:.2f}s ({len(messages) / duration:.0f} msg/s)")
+    print(f"🔔 Kutilgan bildirishnomalar: {expected}")
+    print(f"✅ Yetkazildi: {len(api.received)}")
+    print(f"❌ Yo'qotildi: {max(0, expected - len(api.received))}")
+    print(f"⏳ 429 (RetryAfter) javoblar: {api.rejected}")
+    print(f"⏱ Latency (ms): p50={percentile(latencies, 50):.1f} p90={percentile(latencies, 90):.1f} "
+          f"p99={percentile(latencies, 99):.1f} max={max(latencies, default=0):.1f}")
+    if ingest_stats:
+        print(f"📥 Ingest: max navbat={ingest_stats['max_depth']}, tashlandi={ingest_stats['dropped']}, "
+              f"kutish o'rtacha={ingest_stats['wait_avg_ms']:.1f}ms max={ingest_stats['wait_max_ms']:.1f}ms")
+    cache = match_state.stats()
+    per_entry = cache['bytes'] / cache['entries'] if cache['entries'] else 0
+    print(f"🧠 Moslik keshi: {cache['entries']} ta yozuv, {cache['bytes'] / 1024:.0f} KB "
+          f"(~{per_entry:.0f} B/yozuv), chiqarildi={cache['evictions']}")
+    print("=" * 60)
+
+# ==================== ADMIN UI ====================
+
+class StubMessage:
+    def __init__(self, text):
+        self.text = text
+
+    def reply_text(self, *args, **kwargs):
+        pass
+
+class StubQuery:
+    def __init__(self, data, user_id):
+        self.data = data
+        self.from_user = SimpleNamespace(id=user_id)
+
+    def answer(self, *args, **kwargs):
+        pass
+
+    def edit_message_text(self, *args, **kwargs):
+        pass
+
+# Admin menyusidagi odatiy so'rovlar: (tur, callback data yoki matn, super admin so'rovimi)
+ADMIN_UI_REQUESTS = [
+    ('start', '/start', False),
+    ('callback', 'back_to_main', False),
+    ('callback', 'view_private_group', False),
+    ('text', 'salom', False),
+    ('callback', 'userbot_settings', True),
+    ('callback', 'list_admins', True)
+]
+
+def admin_ui_request(kind, payload, user_id):
+    """Handlerni soxta Update bilan chaqirish (javoblar Telegram ga yuborilmaydi)"""
+    user = SimpleNamespace(id=user_id, username=f"user{user_id}", first_name='User')
+    context = SimpleNamespace(user_data={}, bot=None)
+    if kind == 'callback':
+        bot_module.button_callback(SimpleNamespace(callback_query=StubQuery(payload, user_id), effective_user=user), context)
+    elif kind == 'start':
+        bot_module.start(SimpleNamespace(message=StubMessage(payload), effective_user=user), context)
+    else:
+        update = SimpleNamespace(message=StubMessage(payload), effective_user=user, effective_chat=SimpleNamespace(id=user_id))
+        bot_module.handle_text(update, context)
+
+def bench_admin_ui(args):
+    """
+    Admin UI so'rovlari latency si: SQLite ombori bilan kesh o'chirilgan va yoqilgan holatda.
+    Handlerlar to'g'ridan-to'g'ri chaqiriladi - faqat ma'lumotlar qatlami va handler vaqti o'lchanadi.
+    """
+    rng = random.Random(args.seed)
+    ttl = db.CACHE_TTL_SECONDS if db.CACHE_TTL_SECONDS > 0 else 30
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = SQLiteStorage(os.path.join(tmp, 'loadtest.db'))
+        storage.init()
+        seed_storage(args.admins, args.groups, args.keywords, args.rule_ratio, storage)
+        admin_ids = [1000 + a for a in range(args.admins)]
+        requests = [(rng.choice(ADMIN_UI_REQUESTS), rng.choice(admin_ids)) for _ in range(args.requests)]
+        print("=" * 60)
+        print(f"🎯 Target: admin-ui ({args.requests} ta so'rov, {args.admins} ta admin, SQLite)")
+        for label, cache_ttl in (("Keshsiz", 0), (f"Kesh (TTL {ttl:g}s)", ttl)):
+            db.set_cache_ttl(cache_ttl)
+            db.clear_caches()
+            before = db.cache_stats()
+            latencies = []
+            started = time.perf_counter()
+            for (kind, payload, as_super), admin_id in requests:
+                t0 = time.perf_counter()
+                admin_ui_request(kind, payload, bot_module.SUPER_ADMIN_ID if as_super else admin_id)
+                latencies.append((time.perf_counter() - t0) * 1000)
+            duration = time.perf_counter() - started
+            after = db.cache_stats()
+            hits = sum(after[name]['hits'] - before[name]['hits'] for name in after)
+            misses = sum(after[name]['misses'] - before[name]['misses'] for name in after)
+            print(f"⏱ {label}: p50={percentile(latencies, 50):.3f}ms p90={percentile(latencies, 90):.3f}ms "
+                  f"p99={percentile(latencies, 99):.3f}ms, {len(latencies) / duration:.0f} req/s, hit={hits} miss={misses}")
+        print("=" * 60)
+
+# ==================== COLD START ====================
+
+def time_to_first_match(storage, group_id, text, snapshot_path):
+    """Yangi jarayondagidek (indeks va keshlar bo'sh) birinchi moslikkacha ketgan vaqt (ms)"""
+    db.configure(storage)
+    db.set_index_snapshot(snapshot_path)
+    started = time.perf_counter()
+    matches = db.check_keywords_in_message(group_id, text)
+    elapsed = (time.perf_counter() - started) * 1000
+    if not matches:
+        raise RuntimeError("Kutilgan moslik topilmadi")
+    return elapsed, db.get_index_source()
+
+def bench_cold_start(args):
+    """
+    Indeks snapshoti bilan va snapshotsiz time-to-first-match (SQLite ombori).
+    Interpretator va kutubxonalarni import qilish vaqti kirmaydi - faqat indeksni tayyorlash va birinchi tekshiruv.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = SQLiteStorage(os.path.join(tmp, 'loadtest.db'))
+        storage.init()
+        group_keywords = seed_storage(args.admins, args.groups, args.keywords, args.rule_ratio, storage)
+        group_id, kws = next(iter(group_keywords.items()))
+        text = f"Sotiladi {kws[-1]} arzon"
+        path = os.path.join(tmp, 'index.snapshot')
+        db.set_index_snapshot(path)
+        size = db.save_index_snapshot()
+        data = storage.load_index_data()
+
+        def stale():
+            # Boshqa generatsiya uchun yozilgan snapshot - DB dan qayta qurish va snapshotni yangilash
+            snapshot.write(path, dict(data, generation=data['generation'] - 1), db.get_data_id())
+
+        scenarios = [
+            ("Snapshotsiz", None, None),
+            ("Snapshot", path, None),
+            ("Eskirgan snapshot", path, stale)
+        ]
+        print("=" * 60)
+        print(f"🎯 Target: cold-start ({args.admins} ta admin, {args.groups} ta guruh, "
+              f"{args.admins * args.keywords} ta kalit so'z, snapshot {size / 1024:.0f} KB)")
+        for label, snapshot_path, prepare in scenarios:
+            times = []
+            sources = set()
+            for _ in range(args.runs):
+                if prepare:
+                    prepare()
+                elapsed, source = time_to_first_match(storage, group_id, text, snapshot_path)
+                times.append(elapsed)
+                sources.add(source)
+            print(f"⏱ {label}: p50={percentile(times, 50):.1f}ms min={min(times):.1f}ms "
+                  f"max={max(times):.1f}ms (manba: {', '.join(sorted(sources))})")
+        print("=" * 60)
+        db.set_index_snapshot(None)
+
+def main():
+    parser = argparse.ArgumentParser(description="Userbot/bot matching yo'li uchun offline yuklama testi")
+    parser.add_argument('--target', choices=['userbot', 'bot', 'webhook', 'admin-ui', 'cold-start'], default='userbot')
+    parser.add_argument('--messages', type=int, default=2000)
+    parser.add_argument('--requests', type=int, default=2000, help="admin-ui: handler so'rovlari soni")
+    parser.add_argument('--runs', type=int, default=5, help="cold-start: har bir holat necha marta o'lchansin")
+    parser.add_argument('--rate', type=float, default=200, help="sekundiga xabarlar")
+    parser.add_argument('--admins', type=int, default=10)
+    parser.add_argument('--groups', type=int, default=100)
+    parser.add_argument('--keywords', type=int, default=50, help="har bir admin uchun kalit so'zlar")
+    parser.add_argument('--rule-ratio', type=float, default=0.0, help="qoida sifatida saqlanadigan kalit so'zlar ulushi")
+    parser.add_argument('--match-ratio', type=float, default=0.2)
+    parser.add_argument('--group-skew', type=float, default=1.0, help="guruhlar Zipf darajasi (0 - tekis)")
+    parser.add_argument('--unwatched-ratio', type=float, default=0.0, help="kuzatilmaydigan chatlardan xabarlar ulushi")
+    parser.add_argument('--ingest-workers', type=int, default=userbot.INGEST_WORKERS)
+    parser.add_argument('--ingest-queue', type=int, default=userbot.INGEST_QUEUE_SIZE)
+    parser.add_argument('--ingest-overflow', choices=userbot.IngestQueue.POLICIES, default=userbot.INGEST_OVERFLOW)
+    parser.add_argument('--retry-after-ratio', type=float, default=0.0, help="sendMessage ning qaysi ulushiga 429 qaytarilsin")
+    parser.add_argument('--retry-after', type=int, default=1)
+    parser.add_argument('--drain', type=float, default=15, help="yetkazilishni kutish (soniya)")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+
+    if args.target == 'admin-ui':
+        bench_admin_ui(args)
+        return
+    if args.target == 'cold-start':
+        bench_cold_start(args)
+        return
+
+    api = FakeBotApi(args.retry_after_ratio, args.retry_after).start()
+    api_bot = Bot(os.environ['BOT_TOKEN'], base_url=api.base_url, request=Request(con_pool_size=bot_module.GROUP_WORKERS + 8))
+    userbot.bot_instance = api_bot
+
+    group_keywords = seed_storage(args.admins, args.groups, args.keywords, args.rule_ratio)
+    messages = make_messages(args.messages, group_keywords, args.match_ratio, args.group_skew, args.seed, args.unwatched_ratio)
+    sent_at = {}
+    ingest_stats = None
+
+    started = time.perf_counter()
+    if args.target == 'userbot':
+        ingest_stats = asyncio.run(drive_userbot(
+            messages, args.rate, sent_at, args.ingest_workers, args.ingest_queue, args.ingest_overflow
+        ))
+    elif args.target == 'bot':
+        bot_module.group_workers.start(api_bot)
+        drive_bot(messages, args.rate, sent_at, api_bot)
+    else:
+        bot_module.group_workers.start(api_bot)
+        secret = 'loadtest'
+        bot_module.WEBHOOK_LISTEN, bot_module.WEBHOOK_PORT, bot_module.WEBHOOK_SECRET, bot_module.WEBHOOK_URL = '127.0.0.1', 0, secret, ''
+        updater = bot_module.build_updater(api_bot)
+        server = bot_module.start_webhook(updater)
+        url = f"http://127.0.0.1:{server.server_address[1]}{bot_module.WEBHOOK_PATH}"
+        drive_webhook(messages, args.rate, sent_at, url, secret)
+
+    sent_done = time.perf_counter()
+    wait_for_drain(api, sum(1 for m in messages if m[3]), args.drain)
+    finished = max([sent_done] + [received for received, _ in api.received])
+    report(args.target, messages, sent_at, api, started, finished, ingest_stats)
+
+    if args.target == 'webhook':
+        bot_module.stop_webhook(updater, server)
+    if args.target in ('bot', 'webhook'):
+        bot_module.group_workers.stop()
+    api.shutdown()
+
+if __name__ == '__main__':
+    main()
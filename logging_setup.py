@@ -0,0 +1,153 @@
+# ============================================
+# logging_setup.py - Asinxron (navbatli) logging
+# ============================================
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+import time
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+def _parse_event_map(value, cast):
+    """'message=0.1,match=1' ko'rinishidagi sozlamani dict ga aylantirish"""
+    result = {}
+    for item in (value or '').split(','):
+        if '=' not in item:
+            continue
+        event, raw = item.split('=', 1)
+        try:
+            result[event.strip()] = cast(raw.strip())
+        except ValueError:
+            continue
+    return result
+
+class JsonFormatter(logging.Formatter):
+    """Log yozuvini bitta JSON qatoriga aylantirish"""
+
+    def format(self, record):
+        data = {
+            'time': self.formatTime(record),
+            'name': record.name,
+            'level': record.levelname,
+            'message': record.getMessage()
+        }
+        event = getattr(record, 'event', None)
+        if event:
+            data['event'] = event
+        if record.exc_info:
+            data['exc'] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False)
+
+class EventSampler:
+    """
+    Ko'p takrorlanadigan yozuvlarni kamaytirish.
+    Chaqiruv joyida, LogRecord yaratilishidan oldin tekshiriladi:
+        if sampler.allow('message'):
+            logger.info(..., extra={'event': 'message'})
+    - sample_rates: {event: 0..1} - yozuvning qaysi ulushi qoldiriladi
+    - rate_limits: {event: N} - sekundiga ko'pi bilan N ta yozuv
+    """
+
+    def __init__(self, sample_rates=None, rate_limits=None):
+        self.sample_rates = sample_rates or {}
+        self.rate_limits = rate_limits or {}
+        self.dropped = 0
+        self._windows = {}
+        self._lock = threading.Lock()
+
+    def allow(self, event):
+        """Shu event uchun yozuv yozilishi kerakligini aniqlash"""
+        rate = self.sample_rates.get(event)
+        if rate is not None and random.random() >= rate:
+            self.dropped += 1
+            return False
+
+        limit = self.rate_limits.get(event)
+        if limit is not None:
+            now = int(time.monotonic())
+            with self._lock:
+                window, count = self._windows.get(event, (now, 0))
+                if window != now:
+                    window, count = now, 0
+                if count >= limit:
+                    self.dropped += 1
+                    return False
+                self._windows[event] = (window, count + 1)
+        return True
+
+# setup_logging LOG_SAMPLE va LOG_RATE_LIMIT bo'yicha sozlaydi; sozlanmagan bo'lsa hamma yozuv o'tadi
+sampler = EventSampler()
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """Yozuvni formatlamasdan navbatga qo'yish (formatlash fon oqimida bajariladi)"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Navbat shu jarayon ichida, shuning uchun yozuvni pickle qilish shart emas
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+def setup_logging(log_file=None, level=logging.INFO, stream=sys.stderr):
+    """
+    Logging ni navbat orqali sozlash: formatlash va diskka yozish fon oqimida.
+    Faqat ishga tushirish nuqtasida (__main__) chaqiriladi - root handlerlari almashtiriladi.
+    .env sozlamalari:
+    LOG_FORMAT=text|json, LOG_ROTATE=size|time, LOG_MAX_BYTES, LOG_BACKUP_COUNT,
+    LOG_ROTATE_WHEN, LOG_QUEUE_SIZE, LOG_SAMPLE (message=0.1), LOG_RATE_LIMIT (message=50)
+    Returns: QueueListener
+    """
+    if os.getenv('LOG_FORMAT', 'text').lower() == 'json':
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter(LOG_FORMAT)
+
+    handlers = [logging.StreamHandler(stream)]
+    if log_file:
+        backup_count = int(os.getenv('LOG_BACKUP_COUNT', 5))
+        if os.getenv('LOG_ROTATE', 'size').lower() == 'time':
+            handlers.append(logging.handlers.TimedRotatingFileHandler(
+                log_file,
+                when=os.getenv('LOG_ROTATE_WHEN', 'midnight'),
+                backupCount=backup_count,
+                encoding='utf-8'
+            ))
+        else:
+            handlers.append(logging.handlers.RotatingFileHandler(
+                log_file,
+                maxBytes=int(os.getenv('LOG_MAX_BYTES', 10 * 1024 * 1024)),
+                backupCount=backup_count,
+                encoding='utf-8'
+            ))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.Queue(maxsize=int(os.getenv('LOG_QUEUE_SIZE', 10000)))
+    queue_handler = DeferredQueueHandler(log_queue)
+    sampler.sample_rates = _parse_event_map(os.getenv('LOG_SAMPLE'), float)
+    sampler.rate_limits = _parse_event_map(os.getenv('LOG_RATE_LIMIT'), int)
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
@@ -0,0 +1,158 @@
+# ============================================
+# notifier.py - Bildirishnoma matni va takrorlarni oldini olish
+# ============================================
+
+import logging
+import os
+import sys
+import threading
+from collections import OrderedDict
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+import database as db
+
+logger = logging.getLogger(__name__)
+
+MAX_MESSAGE_LENGTH = 500
+
+def build_notification(source, group_name, username, user_id, keyword, msg_text):
+    """
+    Shaxsiy guruhga yuboriladigan bildirishnomani tayyorlash
+    Returns: (text, reply_markup)
+    """
+    keyboard = InlineKeyboardMarkup([
+        [InlineKeyboardButton("👤 Profil", url=f"tg://user?id={user_id}")]
+    ])
+
+    # Xabarni qisqartirish (500 belgidan ko'p bo'lsa)
+    if len(msg_text) > MAX_MESSAGE_LENGTH:
+        msg_text = msg_text[:MAX_MESSAGE_LENGTH] + "..."
+
+    text = (
+        f"🔍 Kalit so'z topildi! ({source})\n\n"
+        f"📢 Guruh: {group_name}\n"
+        f"👤 Foydalanuvchi: {username}\n"
+        f"🆔 User ID: {user_id}\n"
+        f"🔑 Kalit so'z: {keyword}\n\n"
+        f"💬 Xabar:\n{msg_text}"
+    )
+    return text, keyboard
+
+class MessageClaims:
+    """
+    Bir xabar faqat bir marta qayta ishlanishini ta'minlash (bildirishnoma va statistika).
+    Bot va userbot bitta jarayonda ishlaganda ikkalasi ham bir xil xabarni ko'radi:
+    (chat_id, message_id) ni birinchi bo'lib band qilgan tomon uni qayta ishlaydi.
+    Ikki jarayonli rejimda (shared=True) band qilish qo'shimcha ravishda DB orqali tekshiriladi.
+    """
+
+    def __init__(self, capacity=10000, shared=False):
+        self.capacity = capacity
+        self.shared = shared
+        # True - shu jarayon band qilgan, False - boshqa jarayon band qilgan
+        self._seen = OrderedDict()
+        self._lock = threading.Lock()
+
+    def claim(self, chat_id, message_id):
+        if message_id is None:
+            return True
+        key = (chat_id, message_id)
+        with self._lock:
+            if key in self._seen:
+                return False
+            self._seen[key] = True
+            if len(self._seen) > self.capacity:
+                self._seen.popitem(last=False)
+        if not self.shared:
+            return True
+        try:
+            claimed = db.claim_message(chat_id, message_id)
+        except Exception as e:
+            # DB ishlamasa xabar yo'qolmasin - ehtimoliy takror bildirishnoma afzal
+            logger.error(f"❌ Xabarni band qilishda xato: {e}")
+            return True
+        if not claimed:
+            with self._lock:
+                if key in self._seen:
+                    self._seen[key] = False
+        return claimed
+
+    def claim_edit(self, chat_id, message_id):
+        """
+        Tahrirlangan xabar uchun: asl xabarni shu jarayon band qilgan bo'lsa True,
+        boshqa jarayon band qilgan bo'lsa False, hech kim band qilmagan bo'lsa hozir band qilinadi
+        """
+        if message_id is None:
+            return True
+        with self._lock:
+            state = self._seen.get((chat_id, message_id))
+        if state is not None:
+            return state
+        return self.claim(chat_id, message_id)
+
+
+class MatchState:
+    """
+    Yaqinda ko'rilgan xabarlar uchun allaqachon bildirishnoma yuborilgan (admin_id, keyword) to'plami.
+    Xabar tahrirlanganda faqat yangi mos kelgan kalit so'zlar yuboriladi.
+    LRU: yozuvlar soni (capacity) va taxminiy xotira (max_bytes) bilan cheklangan.
+    """
+
+    # OrderedDict ichidagi bitta yozuvning taxminiy qo'shimcha xarajati (hash jadvali va bog'lamalar)
+    ENTRY_OVERHEAD = 100
+
+    def __init__(self, capacity=20000, max_bytes=8 * 1024 * 1024):
+        self.capacity = capacity
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._evictions = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def _size(cls, key, notified):
+        size = cls.ENTRY_OVERHEAD + sys.getsizeof(key) + sum(sys.getsizeof(part) for part in key)
+        size += sys.getsizeof(notified)
+        for item in notified:
+            size += sys.getsizeof(item) + sys.getsizeof(item[1])
+        return size
+
+    def new_matches(self, chat_id, message_id, matches):
+        """
+        Hali yuborilmagan mosliklarni qaytarish va ularni yuborilgan deb belgilash
+        matches: check_keywords_in_message natijasi
+        """
+        if message_id is None:
+            return matches
+        key = (chat_id, message_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                if not matches:
+                    return matches
+                notified, size = set(), 0
+            else:
+                notified, size = entry
+                self._entries.move_to_end(key)
+            fresh = [m for m in matches if (m['admin_id'], m['keyword']) not in notified]
+            if not fresh:
+                return fresh
+            notified.update((m['admin_id'], m['keyword']) for m in fresh)
+            new_size = self._size(key, notified)
+            self._entries[key] = (notified, new_size)
+            self._bytes += new_size - size
+            while self._entries and (len(self._entries) > self.capacity or self._bytes > self.max_bytes):
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self._evictions += 1
+            return fresh
+
+    def stats(self):
+        """Kesh hajmi: yozuvlar soni, taxminiy baytlar va chiqarib yuborilganlar"""
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self._bytes, 'evictions': self._evictions}
+
+claims = MessageClaims()
+match_state = MatchState(
+    capacity=int(os.getenv('MATCH_STATE_CAPACITY', 20000)),
+    max_bytes=int(os.getenv('MATCH_STATE_MAX_BYTES', 8 * 1024 * 1024))
+)
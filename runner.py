@@ -0,0 +1,100 @@
+# ============================================
+# runner.py - Bot va Userbotni bitta jarayonda ishga tushirish
+# ============================================
+#
+# Bitta jarayon, lekin bitta event loop emas: PTB o'z oqimlarida, Telethon esa
+# asyncio loop da ishlaydi. Umumiy qismlar - xotiradagi kalit so'z indeksi,
+# muddatsiz konfiguratsiya keshi, bildirishnomalarni band qilish va bitta Bot.
+# Admin yozuvlari SQLite ga sinxron yoziladi (asinxron persistensiya yo'q).
+
+import asyncio
+import logging
+import os
+import resource
+import sys
+import time
+
+import database as db
+import bot
+import userbot
+import sinks
+import stats
+from logging_setup import setup_logging
+
+logger = logging.getLogger(__name__)
+
+USAGE_REPORT_SECONDS = int(os.getenv('USAGE_REPORT_SECONDS', 3600))
+
+def resource_usage():
+    """Jarayonning xotira (eng yuqori RSS - ru_maxrss) va CPU vaqtini olish"""
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return {
+        'max_rss_mb': usage.ru_maxrss / 1024,
+        'cpu_seconds': usage.ru_utime + usage.ru_stime
+    }
+
+def log_resource_usage(started_at):
+    """Resurs sarfini logga yozish"""
+    usage = resource_usage()
+    logger.info(
+        f"📈 Resurslar: eng yuqori RSS={usage['max_rss_mb']:.1f} MB, "
+        f"CPU={usage['cpu_seconds']:.1f}s, ishlash vaqti={time.monotonic() - started_at:.0f}s"
+    )
+
+async def report_usage(started_at):
+    """Resurs sarfini vaqti-vaqti bilan logga yozish"""
+    while True:
+        await asyncio.sleep(USAGE_REPORT_SECONDS)
+        log_resource_usage(started_at)
+
+async def main():
+    """Bot (PTB oqimlari) va Userbot (asyncio) ni bitta jarayonda ishga tushirish"""
+    started_at = time.monotonic()
+    logger.info("=" * 60)
+    logger.info("🤖 BOT + USERBOT BITTA JARAYONDA ISHGA TUSHMOQDA")
+    logger.info("=" * 60)
+
+    bot.init_settings()
+    # Barcha yozuvlar shu jarayondan o'tadi: indeks mahalliy o'zgarishlarda darhol yangilanadi,
+    # boshqa jarayon yozuvlarini DB dan so'rab turish shart emas
+    db.set_index_refresh(None)
+    # Xuddi shu sababli adminlar, sozlamalar va shaxsiy guruhlar keshi muddatsiz: ikkala runtime
+    # bitta xotiradagi konfiguratsiyani o'qiydi, yozuvlar keshni darhol yangilaydi
+    db.set_cache_ttl(None)
+
+    updater = bot.build_updater()
+    # Userbot bildirishnomalari bot bilan bir xil Bot obyekti (ulanishlar puli) orqali yuboriladi
+    userbot.bot_instance = updater.bot
+    bot.group_workers.start(updater.bot)
+    stats.recorder.start()
+    sinks.manager.start()
+
+    server = None
+    if bot.WEBHOOK_ENABLED:
+        server = bot.start_webhook(updater)
+        logger.info(f"✅ Bot webhook rejimida: http://{bot.WEBHOOK_LISTEN}:{bot.WEBHOOK_PORT}{bot.WEBHOOK_PATH}")
+    else:
+        updater.start_polling(drop_pending_updates=True)
+        logger.info("✅ Bot polling rejimida ishga tushdi")
+
+    usage_task = asyncio.create_task(report_usage(started_at))
+    try:
+        await userbot.main()
+    finally:
+        usage_task.cancel()
+        if server:
+            bot.stop_webhook(updater, server)
+        else:
+            updater.stop()
+        bot.group_workers.stop()
+        stats.recorder.stop()
+        sinks.manager.stop()
+        log_resource_usage(started_at)
+
+if __name__ == '__main__':
+    # bot.py ning stdout handleri o'rniga: xuddi shu stdout + userbot.log, ikkalasi ham fon oqimida
+    setup_logging('userbot.log', stream=sys.stdout)
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        logger.info("⛔ Bot va Userbot to'xtatildi (Ctrl+C)")
@@ -0,0 +1,309 @@
+# ============================================
+# sinks.py - Mosliklarni Telegramdan tashqari manzillarga yetkazish
+# ============================================
+#
+# Har bir admin shaxsiy guruhdan tashqari bir nechta "sink" ulashi mumkin:
+#   webhook - lokal HTTP endpoint ga JSON massiv POST qilinadi
+#   jsonl   - SINKS_DIR ichidagi faylga har bir moslik bitta qator bo'lib yoziladi
+#   sqlite  - SINKS_DIR ichidagi SQLite fayldagi `matches` jadvaliga yoziladi
+#
+# Har bir sink o'z oqimi va cheklangan navbatiga ega: yozuvlar hajm yoki vaqt
+# bo'yicha partiyalanadi, xatoda qayta uriniladi, navbat to'lsa yangi yozuvlar
+# tashlanadi - ishlamayotgan sink matching yo'lini va boshqa sinklarni sekinlashtirmaydi.
+
+import json
+import logging
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+import urllib.error
+import urllib.request
+from urllib.parse import urlparse
+import database as db
+
+logger = logging.getLogger(__name__)
+
+SINKS_DIR = os.getenv('SINKS_DIR', 'sinks')
+SINK_BATCH_SIZE = int(os.getenv('SINK_BATCH_SIZE', 50))
+SINK_BATCH_SECONDS = float(os.getenv('SINK_BATCH_SECONDS', 2))
+SINK_QUEUE_SIZE = int(os.getenv('SINK_QUEUE_SIZE', 1000))
+SINK_RETRIES = int(os.getenv('SINK_RETRIES', 3))
+SINK_RETRY_DELAY = float(os.getenv('SINK_RETRY_DELAY', 1))
+SINK_WEBHOOK_TIMEOUT = float(os.getenv('SINK_WEBHOOK_TIMEOUT', 5))
+SINK_WEBHOOK_HOSTS = {h.strip() for h in os.getenv('SINK_WEBHOOK_HOSTS', '127.0.0.1,localhost').split(',') if h.strip()}
+SINK_CONFIG_REFRESH = float(os.getenv('SINK_CONFIG_REFRESH', 30))
+MAX_SINKS = 5
+
+KINDS = ('webhook', 'jsonl', 'sqlite')
+FILE_NAME_RE = re.compile(r'^[\w-][\w.-]*$')
+
+# ==================== TEKSHIRISH ====================
+
+def sink_path(name):
+    """Fayl nomini SINKS_DIR ichidagi yo'lga aylantirish (katalogdan tashqariga chiqib bo'lmaydi)"""
+    if not FILE_NAME_RE.match(name) or '..' in name:
+        raise ValueError("Fayl nomida faqat harf, raqam, '-', '_' va '.' bo'lishi mumkin")
+    base = os.path.realpath(SINKS_DIR)
+    path = os.path.realpath(os.path.join(base, name))
+    if os.path.dirname(path) != base:
+        raise ValueError("Fayl SINKS_DIR katalogida bo'lishi kerak")
+    return path
+
+def validate_target(kind, target):
+    """Sink manzilini tekshirish. Returns: saqlanadigan manzil, xato bo'lsa ValueError"""
+    if kind == 'webhook':
+        url = urlparse(target)
+        if url.scheme not in ('http', 'https') or not url.hostname:
+            raise ValueError("URL http:// yoki https:// bilan boshlanishi kerak")
+        if url.hostname not in SINK_WEBHOOK_HOSTS:
+            raise ValueError(f"Ruxsat etilgan hostlar: {', '.join(sorted(SINK_WEBHOOK_HOSTS))}")
+        return target
+    if kind in ('jsonl', 'sqlite'):
+        sink_path(target)
+        return target
+    raise ValueError(f"Noma'lum sink turi: {kind}")
+
+# ==================== SINKLAR ====================
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    """Redirect'ga ergashilmaydi - aks holda SINK_WEBHOOK_HOSTS cheklovini chetlab o'tish mumkin"""
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        raise urllib.error.HTTPError(req.full_url, code, f"Redirect rad etildi: {newurl}", headers, fp)
+
+_opener = urllib.request.build_opener(_NoRedirect)
+
+class WebhookSink:
+    def __init__(self, url):
+        self.url = url
+
+    def write(self, records):
+        body = json.dumps(records, ensure_ascii=False).encode('utf-8')
+        request = urllib.request.Request(self.url, data=body, headers={'Content-Type': 'application/json'})
+        with _opener.open(request, timeout=SINK_WEBHOOK_TIMEOUT) as response:
+            response.read()
+
+    def close(self):
+        pass
+
+class JsonlSink:
+    def __init__(self, name):
+        self.path = sink_path(name)
+
+    def write(self, records):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(''.join(json.dumps(r, ensure_ascii=False) + '\n' for r in records))
+
+    def close(self):
+        pass
+
+class SQLiteSink:
+    def __init__(self, name):
+        self.path = sink_path(name)
+        self.conn = None
+
+    def write(self, records):
+        if self.conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self.conn = sqlite3.connect(self.path, check_same_thread=False)
+            self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS matches (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                created_at TEXT NOT NULL,
+                source TEXT,
+                admin_id INTEGER,
+                group_id INTEGER,
+                group_name TEXT,
+                message_id INTEGER,
+                user_id INTEGER,
+                username TEXT,
+                keyword TEXT,
+                text TEXT
+            )
+            """)
+        columns = ('created_at', 'source', 'admin_id', 'group_id', 'group_name', 'message_id', 'user_id', 'username', 'keyword', 'text')
+        with self.conn:
+            self.conn.executemany(
+                f"INSERT INTO matches({', '.join(columns)}) VALUES({', '.join('?' * len(columns))})",
+                [tuple(r.get(c) for c in columns) for r in records]
+            )
+
+    def close(self):
+        if self.conn:
+            self.conn.close()
+            self.conn = None
+
+def create_sink(kind, target):
+    return {'webhook': WebhookSink, 'jsonl': JsonlSink, 'sqlite': SQLiteSink}[kind](target)
+
+# ==================== ISHCHILAR ====================
+
+class SinkWorker:
+    """Bitta sink uchun navbat, partiyalash va qayta urinishlar"""
+
+    def __init__(self, sink_id, sink):
+        self.sink_id = sink_id
+        self.sink = sink
+        self.queue = queue.Queue(maxsize=SINK_QUEUE_SIZE)
+        self.metrics = {'written': 0, 'failed': 0, 'dropped': 0}
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f'sink-{sink_id}', daemon=True)
+        self._thread.start()
+
+    def submit(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.metrics['dropped'] += 1
+
+    def _next_batch(self):
+        """Birinchi yozuvni kutib, SINK_BATCH_SIZE gacha yoki SINK_BATCH_SECONDS tugaguncha yig'ish"""
+        try:
+            batch = [self.queue.get(timeout=SINK_BATCH_SECONDS)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + SINK_BATCH_SECONDS
+        while len(batch) < SINK_BATCH_SIZE:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch):
+        for attempt in range(SINK_RETRIES + 1):
+            try:
+                self.sink.write(batch)
+                self.metrics['written'] += len(batch)
+                return
+            except Exception as e:
+                if attempt == SINK_RETRIES or self._stopping.is_set():
+                    self.metrics['failed'] += len(batch)
+                    logger.error(f"❌ Sink #{self.sink_id} ga {len(batch)} ta yozuv yozilmadi: {e}")
+                    return
+                time.sleep(SINK_RETRY_DELAY * 2 ** attempt)
+
+    def _run(self):
+        while not (self._stopping.is_set() and self.queue.empty()):
+            batch = self._next_batch()
+            if batch:
+                self._write(batch)
+        self.sink.close()
+
+    def stop(self, timeout=5):
+        """Navbatdagi yozuvlarni yozib, oqimni to'xtatish"""
+        self._stopping.set()
+        self._thread.join(timeout)
+
+class SinkManager:
+    """Adminlarning sink sozlamalari va ularning ishchilari"""
+
+    def __init__(self, refresh_interval=SINK_CONFIG_REFRESH):
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._workers = {}
+        self._by_admin = {}
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread = None
+
+    def _reload(self):
+        """Sozlamalarni DB dan o'qib ishchilarni moslash (fon oqimida - dispatch yo'lida emas)"""
+        configs = db.get_all_sinks()
+        with self._lock:
+            existing = dict(self._workers)
+        workers = {}
+        by_admin = {}
+        for sink_id, admin_id, kind, target in configs:
+            worker = existing.get(sink_id)
+            if worker is None:
+                try:
+                    worker = SinkWorker(sink_id, create_sink(kind, target))
+                except Exception as e:
+                    logger.error(f"❌ Sink #{sink_id} ({kind}) yaratilmadi: {e}")
+                    continue
+            workers[sink_id] = worker
+            by_admin.setdefault(admin_id, []).append(sink_id)
+        with self._lock:
+            if self._stopping:
+                removed = [w for sink_id, w in workers.items() if sink_id not in existing]
+            else:
+                removed = [w for sink_id, w in self._workers.items() if sink_id not in workers]
+                self._workers, self._by_admin = workers, by_admin
+        for worker in removed:
+            worker.stop(timeout=0)
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.refresh_interval)
+            self._wake.clear()
+            if self._stopping:
+                break
+            try:
+                self._reload()
+            except Exception as e:
+                logger.error(f"❌ Sink sozlamalarini yuklashda xato: {e}")
+
+    def start(self):
+        """Sozlamalarni yuklab, fon yangilash oqimini ishga tushirish (ikkinchi chaqiruv e'tiborsiz)"""
+        if self._thread:
+            return
+        self._stopping = False
+        try:
+            self._reload()
+        except Exception as e:
+            logger.error(f"❌ Sink sozlamalarini yuklashda xato: {e}")
+        self._thread = threading.Thread(target=self._run, name='sink-config', daemon=True)
+        self._thread.start()
+
+    def invalidate(self):
+        """Sozlamalar o'zgarganda fon oqimida darhol qayta yuklash"""
+        self._wake.set()
+
+    def dispatch(self, admin_id, record):
+        """Moslikni adminning barcha sinklari navbatiga qo'yish (bloklamaydi, DB ga murojaat qilmaydi)"""
+        with self._lock:
+            workers = [self._workers[sink_id] for sink_id in self._by_admin.get(admin_id, ())]
+        for worker in workers:
+            worker.submit(record)
+
+    def stats(self):
+        with self._lock:
+            return {sink_id: dict(worker.metrics) for sink_id, worker in self._workers.items()}
+
+    def stop(self):
+        """Yangilash oqimini to'xtatib, ishchilardagi yozuvlarni yozish"""
+        thread, self._thread = self._thread, None
+        with self._lock:
+            self._stopping = True
+            workers, self._workers = list(self._workers.values()), {}
+            self._by_admin = {}
+        if thread:
+            self._wake.set()
+            thread.join(timeout=5)
+        for worker in workers:
+            worker.stop()
+
+manager = SinkManager()
+
+def make_record(source, admin_id, group_id, group_name, message_id, user_id, username, keyword, msg_text):
+    """Sinklarga yuboriladigan moslik yozuvi"""
+    return {
+        'created_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'source': source,
+        'admin_id': admin_id,
+        'group_id': group_id,
+        'group_name': group_name,
+        'message_id': message_id,
+        'user_id': user_id,
+        'username': username,
+        'keyword': keyword,
+        'text': msg_text
+    }
@@ -0,0 +1,94 @@
+# ============================================
+# snapshot.py - Kalit so'z indeksi ma'lumotlarining binar snapshoti
+# ============================================
+#
+# Userbot jarayoni qayta ishga tushganda indeks ma'lumotlarini DB dan o'qish
+# o'rniga oxirgi snapshot o'qiladi (avval sarlavha, mos kelsa butun payload
+# bitta marshal.loads bilan - qismlab yuklash yo'q). Snapshot faqat ombordagi
+# generatsiya va ombor identifikatori (data_id) mos kelsa ishlatiladi -
+# aks holda database.py DB dan qayta quradi va snapshotni yangilaydi.
+#
+# Format (little-endian):
+#   sarlavha: magic b'KWIX', format versiyasi, marshal versiyasi, generatsiya,
+#             payload uzunligi, CRC32, data_id
+#   payload:  marshal - load_index_data() natijasi (qoidalar tahlil qilingan daraxt ko'rinishida)
+# CRC32 data_id, generatsiya va payload ustidan hisoblanadi.
+
+import marshal
+import os
+import struct
+import zlib
+import keyword_rules
+
+MAGIC = b'KWIX'
+VERSION = 1
+HEADER = struct.Struct('<4sHHqII32s')
+GENERATION = struct.Struct('<q')
+
+class SnapshotError(ValueError):
+    """Snapshot fayli buzilgan yoki boshqa formatda"""
+
+def _checksum(data_id, generation, payload):
+    crc = zlib.crc32(data_id)
+    crc = zlib.crc32(GENERATION.pack(generation), crc)
+    return zlib.crc32(payload, crc)
+
+def _encode(data):
+    """Qoidalar JSON matnidan daraxtga o'tkaziladi - yuklashda qayta tahlil qilinmaydi"""
+    keywords = [
+        (keyword_id, admin_id, keyword, keyword_rules.loads(rule) if isinstance(rule, str) else rule)
+        for keyword_id, admin_id, keyword, rule in data['keywords']
+    ]
+    return (keywords, data['private_groups'], data['search_groups'], data.get('keyword_groups', []))
+
+def write(path, data, data_id):
+    """
+    load_index_data() natijasini snapshotga yozish (vaqtinchalik fayl + os.replace - atomar)
+    Returns: fayl hajmi (bayt)
+    """
+    payload = marshal.dumps(_encode(data))
+    data_id = data_id.encode()
+    generation = data['generation']
+    header = HEADER.pack(MAGIC, VERSION, marshal.version, generation, len(payload),
+                         _checksum(data_id, generation, payload), data_id)
+    tmp = f"{path}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(header)
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return len(header) + len(payload)
+
+def load(path, generation, data_id):
+    """
+    Snapshotni o'qish: eskirganligi sarlavha bo'yicha aniqlanadi, payload faqat mos kelsa o'qiladi
+    Returns: load_index_data() ko'rinishidagi ma'lumotlar; fayl yo'q yoki eskirgan bo'lsa None,
+    buzilgan bo'lsa SnapshotError
+    """
+    try:
+        f = open(path, 'rb')
+    except FileNotFoundError:
+        return None
+    with f:
+        header = f.read(HEADER.size)
+        if len(header) < HEADER.size:
+            raise SnapshotError("Fayl sarlavhadan qisqa")
+        magic, version, marshal_version, snap_generation, size, checksum, snap_id = HEADER.unpack(header)
+        if magic != MAGIC:
+            raise SnapshotError("Snapshot fayli emas")
+        if version != VERSION or marshal_version != marshal.version:
+            return None
+        if snap_generation != generation or snap_id.rstrip(b'\0') != data_id.encode():
+            return None
+        payload = f.read(size)
+    if len(payload) != size or _checksum(snap_id.rstrip(b'\0'), snap_generation, payload) != checksum:
+        raise SnapshotError("Checksum mos kelmadi")
+    keywords, private_groups, search_groups, keyword_groups = marshal.loads(payload)
+    return {
+        'generation': snap_generation,
+        'keywords': keywords,
+        'private_groups': private_groups,
+        'search_groups': search_groups,
+        'keyword_groups': keyword_groups
+    }
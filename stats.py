@@ -0,0 +1,190 @@
+# ============================================
+# stats.py - Statistika rollup'lari (soatlik va kunlik hisoblagichlar)
+# ============================================
+#
+# Matching yo'li hisoblagichlarni faqat xotirada oshiradi; fon oqimi ularni
+# STATS_FLUSH_SECONDS da bir marta (yoki STATS_MAX_PENDING kalitdan keyin) bitta
+# tranzaksiyada rollup jadvaliga qo'shadi. Ekranlar faqat tanlangan oraliq
+# bucket'larini o'qiydi - tarix hajmiga bog'liq emas.
+#
+# Metrikalar: scanned (tekshirilgan xabarlar), match (admin bo'yicha mosliklar),
+# keyword (kalit so'z bo'yicha), group (izlovchi guruh bo'yicha), delivered, failed
+
+import logging
+import os
+import threading
+from collections import Counter
+from datetime import datetime, timedelta
+import database as db
+
+logger = logging.getLogger(__name__)
+
+STATS_FLUSH_SECONDS = float(os.getenv('STATS_FLUSH_SECONDS', 10))
+STATS_MAX_PENDING = int(os.getenv('STATS_MAX_PENDING', 5000))
+STATS_HOURLY_RETENTION_DAYS = int(os.getenv('STATS_HOURLY_RETENTION_DAYS', 7))
+STATS_DAILY_RETENTION_DAYS = int(os.getenv('STATS_DAILY_RETENTION_DAYS', 180))
+PRUNE_INTERVAL = 3600
+
+HOUR_FORMAT = "%Y-%m-%d %H"
+DAY_FORMAT = "%Y-%m-%d"
+
+def hour_bucket(moment):
+    return moment.strftime(HOUR_FORMAT)
+
+def day_bucket(moment):
+    return moment.strftime(DAY_FORMAT)
+
+class StatsRecorder:
+    """Hisoblagichlarni xotirada yig'ib, omborga partiyalab yozish"""
+
+    def __init__(self, flush_interval=STATS_FLUSH_SECONDS, max_pending=STATS_MAX_PENDING):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending = Counter()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread = None
+        self._pruned_at = None
+
+    def _add(self, metric, dim='', admin_id=0, count=1):
+        now = datetime.now()
+        with self._lock:
+            self._pending[('hour', hour_bucket(now), metric, dim, admin_id)] += count
+            self._pending[('day', day_bucket(now), metric, dim, admin_id)] += count
+            full = len(self._pending) >= self.max_pending
+        if full:
+            self._wake.set()
+
+    def record_scan(self, group_id, matches, scanned=True):
+        """
+        Tekshirilgan xabar va undagi yangi mosliklarni hisobga olish
+        (matches - match_state.new_matches dan keyin; tahrirda scanned=False)
+        """
+        if scanned:
+            self._add('scanned')
+        for match in matches:
+            admin_id = match['admin_id']
+            self._add('match', admin_id=admin_id)
+            self._add('keyword', match['keyword'], admin_id)
+            self._add('group', str(group_id), admin_id)
+
+    def record_delivery(self, admin_id, ok):
+        """Bildirishnoma yetkazildi yoki xato bilan tugadi"""
+        self._add('delivered' if ok else 'failed', admin_id=admin_id)
+
+    def flush(self):
+        """Yig'ilgan hisoblagichlarni bitta tranzaksiyada yozish"""
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+        if not pending:
+            return
+        try:
+            db.add_stats([key + (count,) for key, count in pending.items()])
+        except Exception as e:
+            logger.error(f"❌ Statistikani yozishda xato: {e}")
+            # Keyingi urinishda qayta yoziladi
+            with self._lock:
+                self._pending.update(pending)
+
+    def prune(self, now=None):
+        """Saqlash muddati o'tgan bucket'larni o'chirish"""
+        now = now or datetime.now()
+        db.prune_stats('hour', hour_bucket(now - timedelta(days=STATS_HOURLY_RETENTION_DAYS)))
+        db.prune_stats('day', day_bucket(now - timedelta(days=STATS_DAILY_RETENTION_DAYS)))
+        self._pruned_at = now
+
+    def _run(self):
+        while not self._stopping:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+            if self._pruned_at is None or (datetime.now() - self._pruned_at).total_seconds() >= PRUNE_INTERVAL:
+                try:
+                    self.prune()
+                except Exception as e:
+                    logger.error(f"❌ Statistikani tozalashda xato: {e}")
+
+    def start(self):
+        """Fon oqimini ishga tushirish (bot va userbot bitta jarayonda bo'lsa ikkinchi chaqiruv e'tiborsiz)"""
+        if self._thread:
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name='stats-flush', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Oqimni to'xtatish va qolgan hisoblagichlarni yozish"""
+        if self._thread:
+            self._stopping = True
+            self._wake.set()
+            self._thread.join(timeout=5)
+            self._thread = None
+        self.flush()
+
+recorder = StatsRecorder()
+
+# ==================== HISOBOTLAR ====================
+
+def _since(days, now=None):
+    """Oxirgi `days` kunni qamrab oluvchi kunlik bucket chegarasi"""
+    return day_bucket((now or datetime.now()) - timedelta(days=days - 1))
+
+def summary(admin_id=None, days=7, top=5, now=None):
+    """
+    Ekran uchun hisobot (faqat oraliqdagi kunlik bucket'lar o'qiladi)
+    admin_id=None - barcha adminlar bo'yicha
+    """
+    now = now or datetime.now()
+    since = _since(days, now)
+    today = day_bucket(now)
+
+    def total(metric, start):
+        rows = db.query_stats('day', start, metric, admin_id=admin_id, group_by='bucket')
+        return sum(count for _, count in rows)
+
+    daily = dict(db.query_stats('day', since, 'match', admin_id=admin_id, group_by='bucket'))
+    trend = []
+    for i in range(days - 1, -1, -1):
+        bucket = day_bucket(now - timedelta(days=i))
+        trend.append((bucket, daily.get(bucket, 0)))
+
+    result = {
+        'days': days,
+        'matches_today': total('match', today),
+        'matches': total('match', since),
+        'delivered': total('delivered', since),
+        'failed': total('failed', since),
+        'top_keywords': db.query_stats('day', since, 'keyword', admin_id=admin_id, group_by='dim', limit=top),
+        'top_groups': db.query_stats('day', since, 'group', admin_id=admin_id, group_by='dim', limit=top),
+        'trend': trend
+    }
+    if admin_id is None:
+        result['scanned_today'] = total('scanned', today)
+        result['scanned'] = total('scanned', since)
+        result['top_admins'] = db.query_stats('day', since, 'match', group_by='admin', limit=top)
+    return result
+
+def hourly_trend(admin_id=None, hours=24, now=None):
+    """Oxirgi `hours` soatdagi mosliklar (soatlik bucket'lardan). Returns: [(bucket, count)]"""
+    now = now or datetime.now()
+    since = hour_bucket(now - timedelta(hours=hours - 1))
+    counts = dict(db.query_stats('hour', since, 'match', admin_id=admin_id, group_by='bucket'))
+    trend = []
+    for i in range(hours - 1, -1, -1):
+        bucket = hour_bucket(now - timedelta(hours=i))
+        trend.append((bucket, counts.get(bucket, 0)))
+    return trend
+
+def render_trend(trend, width=10, label=lambda bucket: bucket[5:]):
+    """Moslik soni uchun matnli grafik (label - bucket yorlig'i, standart: oy-kun)"""
+    peak = max((count for _, count in trend), default=0)
+    lines = []
+    for bucket, count in trend:
+        bar = "▇" * (round(count / peak * width) if peak else 0)
+        lines.append(f"{label(bucket)}: {bar} {count}")
+    return "\n".join(lines)
+
+def hour_label(bucket):
+    """'2026-10-19 14' -> '14:00'"""
+    return f"{bucket[-2:]}:00"
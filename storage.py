@@ -0,0 +1,1141 @@
+# ============================================
+# storage.py - Ma'lumotlar ombori (SQLite va xotira)
+# ============================================
+
+import itertools
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+
+MAX_SEARCH_GROUPS = 100
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+def _now():
+    return datetime.utcnow().strftime(TIME_FORMAT)
+
+def plan_bulk_insert(existing, groups, limit=MAX_SEARCH_GROUPS):
+    """
+    Ommaviy importda qaysi guruhlar qo'shilishini aniqlash (takrorlar va limit)
+    existing: [(group_id, group_link)] - adminning mavjud guruhlari
+    Returns: (results, to_insert) - har bir qator uchun (ok, message) va qo'shiladigan guruhlar
+    """
+    seen_ids = {gid for gid, _ in existing if gid is not None}
+    seen_links = {link for _, link in existing if link}
+    count = len(existing)
+
+    results = []
+    to_insert = []
+    for g in groups:
+        gid = g.get('group_id')
+        link = g.get('group_link')
+        if (gid is not None and gid in seen_ids) or (link and link in seen_links):
+            results.append((False, "Bu guruh allaqachon qo'shilgan"))
+            continue
+        if count >= limit:
+            results.append((False, f"Maksimal {limit} ta izlovchi guruh qo'shish mumkin"))
+            continue
+        if gid is not None:
+            seen_ids.add(gid)
+        if link:
+            seen_links.add(link)
+        count += 1
+        to_insert.append(g)
+        results.append((True, "Izlovchi guruh qo'shildi"))
+    return results, to_insert
+
+class Storage(ABC):
+    """
+    Ma'lumotlar ombori interfeysi: adminlar, kalit so'zlar, shaxsiy va izlovchi guruhlar,
+    sozlamalar, rate limit va link aniqlash keshi.
+    Kalit so'z/guruh ma'lumotlarini o'zgartiruvchi har bir metod generatsiyani oshiradi.
+    """
+
+    def init(self):
+        """Omborni tayyorlash"""
+
+    # ---------- Sozlamalar ----------
+    @abstractmethod
+    def get_setting(self, key, default=None):
+        ...
+
+    @abstractmethod
+    def set_setting(self, key, value):
+        ...
+
+    @abstractmethod
+    def get_generation(self):
+        ...
+
+    # ---------- Adminlar ----------
+    @abstractmethod
+    def is_admin(self, user_id):
+        ...
+
+    @abstractmethod
+    def add_admin(self, user_id, username):
+        ...
+
+    @abstractmethod
+    def remove_admin(self, user_id):
+        ...
+
+    @abstractmethod
+    def get_all_admins(self):
+        ...
+
+    # ---------- Kalit so'zlar ----------
+    @abstractmethod
+    def add_keyword(self, admin_id, keyword, rule=None):
+        """rule - tahlil qilingan qoida (JSON matn) yoki oddiy kalit so'z uchun None"""
+
+    @abstractmethod
+    def get_keywords(self, admin_id):
+        ...
+
+    @abstractmethod
+    def remove_keyword(self, keyword_id):
+        ...
+
+    @abstractmethod
+    def get_keyword_scope(self, keyword_id):
+        """Kalit so'z bog'langan izlovchi guruh qatorlari (bo'sh - adminning barcha guruhlari)"""
+
+    @abstractmethod
+    def set_keyword_scope(self, keyword_id, search_group_row_ids):
+        ...
+
+    # ---------- Shaxsiy guruhlar ----------
+    @abstractmethod
+    def add_private_group(self, admin_id, group_id=None, group_link=None, group_name=None):
+        ...
+
+    @abstractmethod
+    def get_private_group(self, admin_id):
+        ...
+
+    @abstractmethod
+    def remove_private_group(self, admin_id):
+        ...
+
+    # ---------- Sinklar ----------
+    @abstractmethod
+    def add_sink(self, admin_id, kind, target):
+        ...
+
+    @abstractmethod
+    def get_sinks(self, admin_id):
+        ...
+
+    @abstractmethod
+    def get_all_sinks(self):
+        ...
+
+    @abstractmethod
+    def remove_sink(self, sink_id):
+        ...
+
+    # ---------- Izlovchi guruhlar ----------
+    @abstractmethod
+    def add_search_group(self, admin_id, group_id=None, group_link=None, group_name=None, limit=MAX_SEARCH_GROUPS):
+        ...
+
+    @abstractmethod
+    def add_search_groups_bulk(self, admin_id, groups, limit=MAX_SEARCH_GROUPS):
+        ...
+
+    @abstractmethod
+    def get_search_groups(self, admin_id):
+        ...
+
+    @abstractmethod
+    def get_all_search_groups(self):
+        ...
+
+    @abstractmethod
+    def remove_search_group(self, row_id):
+        ...
+
+    # ---------- Rate limit ----------
+    @abstractmethod
+    def touch_rate_limit(self, admin_id, period):
+        ...
+
+    # ---------- Link aniqlash ----------
+    @abstractmethod
+    def apply_cached_link_resolutions(self):
+        ...
+
+    @abstractmethod
+    def get_pending_links(self, limit):
+        ...
+
+    @abstractmethod
+    def save_link_resolution(self, link, chat_id, title):
+        ...
+
+    @abstractmethod
+    def mark_link_failed(self, link, error, retry_after):
+        ...
+
+    # ---------- Indeks va statistika ----------
+    @abstractmethod
+    def load_index_data(self):
+        ...
+
+    @abstractmethod
+    def get_counts(self):
+        ...
+
+    # ---------- Statistika ----------
+    @abstractmethod
+    def add_stats(self, rows):
+        """rows: [(period, bucket, metric, dim, admin_id, count)] - mavjud hisoblagichlarga qo'shiladi"""
+
+    @abstractmethod
+    def query_stats(self, period, since, metric, admin_id=None, group_by='dim', limit=None):
+        """
+        since dan boshlab bucket'lar bo'yicha yig'indi
+        group_by: 'dim' | 'admin' | 'bucket' (bucket - vaqt bo'yicha tartiblangan, qolganlari kamayish tartibida)
+        Returns: [(key, count)]
+        """
+
+    @abstractmethod
+    def prune_stats(self, period, before):
+        ...
+
+    # ---------- Xabarlarni band qilish ----------
+    @abstractmethod
+    def claim_message(self, chat_id, message_id, claimed_at):
+        """Xabarni jarayonlararo band qilish. Returns: True - xabarni shu chaqiruv band qilgan bo'lsa"""
+
+    @abstractmethod
+    def prune_message_claims(self, before):
+        """claimed_at (unix vaqt) before dan oldingi yozuvlarni o'chirish"""
+
+# ==================== SQLITE ====================
+
+class SQLiteStorage(Storage):
+    """SQLite ombori (standart)"""
+
+    def __init__(self, path='data.db'):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        """Database connection yaratish"""
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _bump_generation(self, c):
+        """Kalit so'z/guruh ma'lumotlari o'zgarganini belgilash (tranzaksiya ichida)"""
+        c.execute("""
+        INSERT INTO settings(key, value) VALUES('data_generation', '1')
+        ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1
+        """)
+
+    def init(self):
+        """Database jadvalarini yaratish"""
+        with self._lock:
+            conn = self._connect()
+            c = conn.cursor()
+
+            # Adminlar jadvali
+            c.execute("""
+            CREATE TABLE IF NOT EXISTS admins (
+                user_id INTEGER PRIMARY KEY,
+                username TEXT
+            )
+            """)
+
+            # Kalit so'zlar jadvali
+            c.execute("""
+            CREATE TABLE IF NOT EXISTS keywords (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                admin_id INTEGER NOT NULL,
+                keyword TEXT NOT NULL,
+                rule TEXT,
+                FOREIGN KEY(admin_id) REFERENCES admins(user_id)
+            )
+            """)
+
+            # Eski bazalarda qoida ustuni bo'lmasligi mumkin
+            c.execute("PRAGMA table_info(keywords)")
+            if 'rule' not in [row['name'] for row in c.fetchall()]:
+                c.execute("ALTER TABLE keywords ADD COLUMN rule TEXT")
+
+            # Kalit so'z -> izlovchi guruh bog'lanishi (qatori yo'q kalit so'z barcha guruhlarga tegishli)
+            c.execute("""
+            CREATE TABLE IF NOT EXISTS keyword_groups (
+                keyword_id INTEGER NOT NULL,
+                search_group_id INTEGER NOT NULL,
+                PRIMARY KEY(keyword_id, search_group_id),
+                FOREIGN KEY(keyword_id) REFERENCES keywords(id),
+                FOREIGN KEY(search_group_id) REFERENCES search_groups(id)
+            )
+            """)
+
+            # Shaxsiy guruhlar jadvali
+            c.execute("""
+            CREATE TABLE IF NOT EXISTS private_groups (
+                admin_id INTEGER PRIMARY KEY,
+                group_id INTEGER,
+                group_link TEXT,
+                group_name TEXT,
+                FOREIGN KEY(admin_id) REFERENCES admins(user_id)
+            )
+            """)
+
+            # Moslik yetkaziladigan qo'shimcha manzillar (webhook, JSONL, SQLite)
+            c.execute("""
+            CREATE TABLE IF NOT EXISTS sinks (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                admin_id INTEGER NOT NULL,
+                kind TEXT NOT NULL,
+                target TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                FOREIGN KEY(admin_id) REFERENCES admins(user_id)
+            )
+            """)
+
+            # Izlovchi guruhlar jadvali
+            c.execute("""
+            CREATE TABLE IF NOT EXISTS search_groups (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                admin_id INTEGER NOT NULL,
+                group_id INTEGER,
+                group_link TEXT,
+                group_name TEXT,
+                created_at TEXT NOT NULL,
+                FOREIGN KEY(admin_id) REFERENCES admins(user_id)
+            )
+            """)
+
+            # Sozlamalar jadvali
+            c.execute("""
+            CREATE TABLE IF NOT EXISTS settings (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            )
+            """)
+
+            # Statistika rollup'lari (soatlik va kunlik hisoblagichlar)
+            c.execute("""
+            CREATE TABLE IF NOT EXISTS stats_rollups (
+                period TEXT NOT NULL,
+                bucket TEXT NOT NULL,
+                metric TEXT NOT NULL,
+                dim TEXT NOT NULL DEFAULT '',
+                admin_id INTEGER NOT NULL DEFAULT 0,
+                count INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY(period, metric, bucket, admin_id, dim)
+            )
+            """)
+
+            # Bot va userbot ikki jarayonda ishlaganda xabarni qaysi tomon qayta ishlashi
+            c.execute("""
+            CREATE TABLE IF NOT EXISTS message_claims (
+                chat_id INTEGER NOT NULL,
+                message_id INTEGER NOT NULL,
+                claimed_at REAL NOT NULL,
+                PRIMARY KEY(chat_id, message_id)
+            )
+            """)
+
+            # Rate limit jadvali
+            c.execute("""
+            CREATE TABLE IF NOT EXISTS rate_limits (
+                admin_id INTEGER PRIMARY KEY,
+                last_added_at TEXT
+            )
+            """)
+
+            # Link -> chat ID aniqlash keshi (userbot resolver)
+            c.execute("""
+            CREATE TABLE IF NOT EXISTS link_resolutions (
+                link TEXT PRIMARY KEY,
+                chat_id INTEGER,
+                title TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at TEXT,
+                last_error TEXT,
+                resolved_at TEXT
+            )
+            """)
+
+            conn.commit()
+            conn.close()
+
+    # ---------- Sozlamalar ----------
+    def get_setting(self, key, default=None):
+        with self._lock:
+            conn = self._connect()
+            c = conn.cursor()
+            c.execute("SELECT value FROM settings WHERE key = ?", (key,))
+            row = c.fetchone()
+            conn.close()
+            return row['value'] if row else default
+
+    def set_setting(self, key, value):
+        with self._lock:
+            conn = self._connect()
+            c = conn.cursor()
+            c.execute("""
+            INSERT INTO settings(key, value) VALUES(?, ?)
+            ON CONFLICT(key) DO UPDATE SET value=excluded.value
+            """, (key, value))
+            conn.commit()
+            conn.close()
+
+    def get_generation(self):
+        return int(self.get_setting('data_generation', '0'))
+
+    # ---------- Adminlar ----------
+    def is_admin(self, user_id):
+        with self._lock:
+            conn = self._connect()
+            c = conn.cursor()
+            c.execute("SELECT 1 FROM admins WHERE user_id = ?", (user_id,))
+            exists = c.fetchone() is not None
+            conn.close()
+            return exists
+
+    def add_admin(self, user_id, username):
+        with self._lock:
+            conn = self._connect()
+            c = conn.cursor()
+            try:
+                c.execute("INSERT INTO admins(user_id, username) VALUES(?, ?)", (user_id, username))
+                conn.commit()
+                return True
+            except sqlite3.IntegrityError:
+                return False
+            finally:
+                conn.close()
+
+    def remove_admin(self, user_id):
+        with self._lock:
+            conn = self._connect()
+            c = conn.cursor()
+            c.execute("DELETE FROM admins WHERE user_id = ?", (user_id,))
+            c.execute("DELETE FROM keyword_groups WHERE keyword_id IN (SELECT id FROM keywords WHERE admin_id = ?)", (user_id,))
+            c.execute("DELETE FROM keywords WHERE admin_id = ?", (user_id,))
+            c.execute("DELETE FROM private_groups WHERE admin_id = ?", (user_id,))
+            c.execute("DELETE FROM sinks WHERE admin_id = ?", (user_id,))
+            c.execute("DELETE FROM search_groups WHERE admin_id = ?", (user_id,))
+            c.execute("DELETE FROM rate_limits WHERE admin_id = ?", (user_id,))
+            self._bump_generation(c)
+            conn.commit()
+            conn.close()
+
+    def get_all_admins(self):
+        with self._lock:
+            conn = self._connect()
+            c = conn.cursor()
+            c.execute("SELECT user_id, username FROM admins ORDER BY username COLLATE NOCASE")
+            rows = c.fetchall()
+            conn.close()
+            return [(row['user_id'], row['username']) for row in rows]
+
+    # ---------- Kalit so'zlar ----------
+    def add_keyword(self, admin_id, keyword, rule=None):
+        with self._lock:
+            conn = self._connect()
+            c = conn.cursor()
+            c.execute("INSERT INTO keywords(admin_id, keyword, rule) VALUES(?, ?, ?)", (admin_id, keyword, rule))
+            self._bump_generation(c)
+            conn.commit()
+            conn.close()
+
+    def get_keywords(self, admin_id):
+        with self._lock:
+            conn = self._connect()
+            c = conn.cursor()
+            c.execute("SELECT id, keyword FROM keywords WHERE admin_id = ? ORDER BY id DESC", (admin_id,))
+            rows = c.fetchall()
+            conn.close()
+            return [(row['id'], row['keyword']) for row in rows]
+
+    def remove_keyword(self, keyword_id):
+        with self._lock:
+            conn = self._connect()
+            c = conn.cursor()
+            c.execute("DELETE FROM keywords WHERE id = ?", (keyword_id,))
+            c.execute("DELETE FROM keyword_groups WHERE keyword_id = ?", (keyword_id,))
+            self._bump_generation(c)
+            conn.commit()
+            conn.close()
+
+    def get_keyword_scope(self, keyword_id):
+        with self._lock:
+            conn = self._connect()
+            c = conn.cursor()
+            c.execute("SELECT search_group_id FROM keyword_groups WHERE keyword_id = ?", (keyword_id,))
+            rows = c.fetchall()
+            conn.close()
+            return {row['search_group_id'] for row in rows}
+
+    def set_keyword_scope(self, keyword_id, search_group_row_ids):
+        with self._lock:
+            conn = self._connect()
+            c = conn.cursor()
+            c.execute("DELETE FROM keyword_groups WHERE keyword_id = ?", (keyword_id,))
+            c.executemany(
+                "INSERT INTO keyword_groups(keyword_id, search_group_id) VALUES(?, ?)",
+                [(keyword_id, row_id) for row_id in search_group_row_ids]
+            )
+            self._bump_generation(c)
+            conn.commit()
+            conn.close()
+
+    # ---------- Shaxsiy guruhlar ----------
+    def add_private_group(self, admin_id, group_id=None, group_link=None, group_name=None):
+        with self._lock:
+            conn = self._connect()
+            c = conn.cursor()
+            c.execute("""
+            INSERT INTO private_groups(admin_id, group_id, group_link, group_name)
+            VALUES(?, ?, ?, ?)
+            ON CONFLICT(admin_id) DO UPDATE SET
+                group_id=excluded.group_id,
+                group_link=excluded.group_link,
+                group_name=excluded.group_name
+            """, (admin_id, group_id, group_link, group_name))
+            self._bump_generation(c)
+            conn.commit()
+            conn.close()
+
+    def get_private_group(self, admin_id):
+        with self._lock:
+            conn = self._connect()
+            c = conn.cursor()
+            c.execute("SELECT group_id, group_link, group_name FROM private_groups WHERE admin_id = ?", (admin_id,))
+            row = c.fetchone()
+            conn.close()
+            return dict(row) if row else None
+
+    def remove_private_group(self, admin_id):
+        with self._lock:
+            conn = self._connect()
+            c = conn.cursor()
+            c.execute("DELETE FROM private_groups WHERE admin_id = ?", (admin_id,))
+            self._bump_generation(c)
+            conn.commit()
+            conn.close()
+
+    # ---------- Sinklar ----------
+    def add_sink(self, admin_id, kind, target):
+        with self._lock:
+            conn = self._connect()
+            c = conn.cursor()
+            c.execute(
+                "INSERT INTO sinks(admin_id, kind, target, created_at) VALUES(?, ?, ?, ?)",
+                (admin_id, kind, target, _now())
+            )
+            conn.commit()
+            conn.close()
+
+    def get_sinks(self, admin_id):
+        with self._lock:
+            conn = self._connect()
+            c = conn.cursor()
+            c.execute("SELECT id, kind, target FROM sinks WHERE admin_id = ? ORDER BY id", (admin_id,))
+            rows = c.fetchall()
+            conn.close()
+            return [(row['id'], row['kind'], row['target']) for row in rows]
+
+    def get_all_sinks(self):
+        with self._lock:
+            conn = self._connect()
+            c = conn.cursor()
+            c.execute("SELECT id, admin_id, kind, target FROM sinks ORDER BY id")
+            rows = c.fetchall()
+            conn.close()
+            return [(row['id'], row['admin_id'], row['kind'], row['target']) for row in rows]
+
+    def remove_sink(self, sink_id):
+        with self._lock:
+            conn = self._connect()
+            c = conn.cursor()
+            c.execute("DELETE FROM sinks WHERE id = ?", (sink_id,))
+            conn.commit()
+            conn.close()
+
+    # ---------- Izlovchi guruhlar ----------
+    def add_search_group(self, admin_id, group_id=None, group_link=None, group_name=None, limit=MAX_SEARCH_GROUPS):
+        with self._lock:
+            conn = self._connect()
+            c = conn.cursor()
+
+            # Guruhlar sonini tekshirish
+            c.execute("SELECT COUNT(*) as cnt FROM search_groups WHERE admin_id = ?", (admin_id,))
+            if c.fetchone()['cnt'] >= limit:
+                conn.close()
+                return False
+
+            c.execute("""
+            INSERT INTO search_groups(admin_id, group_id, group_link, group_name, created_at)
+            VALUES(?, ?, ?, ?, ?)
+            """, (admin_id, group_id, group_link, group_name, _now()))
+            self._bump_generation(c)
+            conn.commit()
+            conn.close()
+            return True
+
+    def add_search_groups_bulk(self, admin_id, groups, limit=MAX_SEARCH_GROUPS):
+        now = _now()
+        with self._lock:
+            conn = self._connect()
+            c = conn.cursor()
+            try:
+                c.execute("SELECT group_id, group_link FROM search_groups WHERE admin_id = ?", (admin_id,))
+                existing = [(row['group_id'], row['group_link']) for row in c.fetchall()]
+                results, to_insert = plan_bulk_insert(existing, groups, limit)
+
+                c.executemany("""
+                INSERT INTO search_groups(admin_id, group_id, group_link, group_name, created_at)
+                VALUES(?, ?, ?, ?, ?)
+                """, [(admin_id, g.get('group_id'), g.get('group_link'), g.get('group_name'), now) for g in to_insert])
+                if to_insert:
+                    self._bump_generation(c)
+                conn.commit()
+                return results
+            except sqlite3.Error:
+                conn.rollback()
+                raise
+            finally:
+                conn.close()
+
+    def get_search_groups(self, admin_id):
+        with self._lock:
+            conn = self._connect()
+            c = conn.cursor()
+            c.execute("SELECT id, group_name FROM search_groups WHERE admin_id = ? ORDER BY id DESC", (admin_id,))
+            rows = c.fetchall()
+            conn.close()
+            return [(row['id'], row['group_name']) for row in rows]
+
+    def get_all_search_groups(self):
+        with self._lock:
+            conn = self._connect()
+            c = conn.cursor()
+            c.execute("SELECT id, admin_id, group_id, group_name FROM search_groups")
+            rows = c.fetchall()
+            conn.close()
+            return [{
+                'row_id': row['id'],
+                'admin_id': row['admin_id'],
+                'group_id': row['group_id'],
+                'group_name': row['group_name']
+            } for row in rows]
+
+    def remove_search_group(self, row_id):
+        with self._lock:
+            conn = self._connect()
+            c = conn.cursor()
+            c.execute("DELETE FROM search_groups WHERE id = ?", (row_id,))
+            c.execute("DELETE FROM keyword_groups WHERE search_group_id = ?", (row_id,))
+            self._bump_generation(c)
+            conn.commit()
+            conn.close()
+
+    # ---------- Rate limit ----------
+    def touch_rate_limit(self, admin_id, period):
+        """Oxirgi qo'shishdan beri period o'tgan bo'lsa, vaqtni yangilab True qaytarish"""
+        with self._lock:
+            conn = self._connect()
+            c = conn.cursor()
+            c.execute("SELECT last_added_at FROM rate_limits WHERE admin_id = ?", (admin_id,))
+            row = c.fetchone()
+            now = datetime.utcnow()
+
+            if row and row['last_added_at']:
+                last = datetime.strptime(row['last_added_at'], TIME_FORMAT)
+                if now - last < period:
+                    conn.close()
+                    return False
+
+            c.execute("""
+            INSERT INTO rate_limits(admin_id, last_added_at) VALUES(?, ?)
+            ON CONFLICT(admin_id) DO UPDATE SET last_added_at=excluded.last_added_at
+            """, (admin_id, now.strftime(TIME_FORMAT)))
+            conn.commit()
+            conn.close()
+            return True
+
+    # ---------- Link aniqlash ----------
+    def apply_cached_link_resolutions(self):
+        with self._lock:
+            conn = self._connect()
+            c = conn.cursor()
+            updated = 0
+            for table in ('search_groups', 'private_groups'):
+                c.execute(f"""
+                UPDATE {table} SET
+                    group_id = (SELECT chat_id FROM link_resolutions r WHERE r.link = {table}.group_link),
+                    group_name = COALESCE((SELECT title FROM link_resolutions r WHERE r.link = {table}.group_link), group_name)
+                WHERE group_id IS NULL AND group_link IN (
+                    SELECT link FROM link_resolutions WHERE chat_id IS NOT NULL
+                )
+                """)
+                updated += c.rowcount
+            if updated:
+                self._bump_generation(c)
+            conn.commit()
+            conn.close()
+            return updated
+
+    def get_pending_links(self, limit):
+        with self._lock:
+            conn = self._connect()
+            c = conn.cursor()
+            c.execute("""
+            SELECT l.link, COALESCE(r.attempts, 0) AS attempts FROM (
+                SELECT group_link AS link FROM search_groups WHERE group_id IS NULL AND group_link IS NOT NULL
+                UNION
+                SELECT group_link AS link FROM private_groups WHERE group_id IS NULL AND group_link IS NOT NULL
+            ) l
+            LEFT JOIN link_resolutions r ON r.link = l.link
+            WHERE r.link IS NULL OR r.next_attempt_at IS NULL OR r.next_attempt_at <= ?
+            ORDER BY attempts
+            LIMIT ?
+            """, (_now(), limit))
+            rows = c.fetchall()
+            conn.close()
+            return [(row['link'], row['attempts']) for row in rows]
+
+    def save_link_resolution(self, link, chat_id, title):
+        now = _now()
+        with self._lock:
+            conn = self._connect()
+            c = conn.cursor()
+            c.execute("""
+            INSERT INTO link_resolutions(link, chat_id, title, attempts, next_attempt_at, last_error, resolved_at)
+            VALUES(?, ?, ?, 0, NULL, NULL, ?)
+            ON CONFLICT(link) DO UPDATE SET
+                chat_id=excluded.chat_id,
+                title=excluded.title,
+                next_attempt_at=NULL,
+                last_error=NULL,
+                resolved_at=excluded.resolved_at
+            """, (link, chat_id, title, now))
+            c.execute("UPDATE search_groups SET group_id = ?, group_name = ? WHERE group_link = ? AND group_id IS NULL", (chat_id, title, link))
+            c.execute("UPDATE private_groups SET group_id = ?, group_name = ? WHERE group_link = ? AND group_id IS NULL", (chat_id, title, link))
+            self._bump_generation(c)
+            conn.commit()
+            conn.close()
+
+    def mark_link_failed(self, link, error, retry_after):
+        next_at = (datetime.utcnow() + timedelta(seconds=retry_after)).strftime(TIME_FORMAT)
+        with self._lock:
+            conn = self._connect()
+            c = conn.cursor()
+            c.execute("""
+            INSERT INTO link_resolutions(link, attempts, next_attempt_at, last_error)
+            VALUES(?, 1, ?, ?)
+            ON CONFLICT(link) DO UPDATE SET
+                attempts=attempts + 1,
+                next_attempt_at=excluded.next_attempt_at,
+                last_error=excluded.last_error
+            """, (link, next_at, str(error)[:500]))
+            conn.commit()
+            conn.close()
+
+    # ---------- Indeks va statistika ----------
+    def load_index_data(self):
+        """Kalit so'z indeksi uchun ma'lumotlarni bitta o'qishda olish"""
+        with self._lock:
+            conn = self._connect()
+            c = conn.cursor()
+            c.execute("SELECT value FROM settings WHERE key = 'data_generation'")
+            row = c.fetchone()
+            generation = int(row['value']) if row else 0
+            c.execute("SELECT id, admin_id, keyword, rule FROM keywords ORDER BY id")
+            keywords = [(row['id'], row['admin_id'], row['keyword'], row['rule']) for row in c.fetchall()]
+            c.execute("SELECT admin_id, group_id FROM private_groups")
+            private_groups = {row['admin_id']: row['group_id'] for row in c.fetchall()}
+            c.execute("SELECT id, admin_id, group_id FROM search_groups WHERE group_id IS NOT NULL ORDER BY id")
+            search_groups = [(row['id'], row['admin_id'], row['group_id']) for row in c.fetchall()]
+            c.execute("SELECT keyword_id, search_group_id FROM keyword_groups")
+            keyword_groups = [(row['keyword_id'], row['search_group_id']) for row in c.fetchall()]
+            conn.close()
+            return {
+                'generation': generation,
+                'keywords': keywords,
+                'private_groups': private_groups,
+                'search_groups': search_groups,
+                'keyword_groups': keyword_groups
+            }
+
+    def get_counts(self):
+        with self._lock:
+            conn = self._connect()
+            c = conn.cursor()
+            counts = {}
+            for table in ('admins', 'keywords', 'search_groups', 'private_groups'):
+                c.execute(f"SELECT COUNT(*) as cnt FROM {table}")
+                counts[table] = c.fetchone()['cnt']
+            conn.close()
+            return counts
+
+    # ---------- Statistika ----------
+    def add_stats(self, rows):
+        with self._lock:
+            conn = self._connect()
+            c = conn.cursor()
+            c.executemany("""
+            INSERT INTO stats_rollups(period, bucket, metric, dim, admin_id, count) VALUES(?, ?, ?, ?, ?, ?)
+            ON CONFLICT(period, metric, bucket, admin_id, dim) DO UPDATE SET count = count + excluded.count
+            """, rows)
+            conn.commit()
+            conn.close()
+
+    def query_stats(self, period, since, metric, admin_id=None, group_by='dim', limit=None):
+        column = {'dim': 'dim', 'admin': 'admin_id', 'bucket': 'bucket'}[group_by]
+        query = f"SELECT {column} AS key, SUM(count) AS total FROM stats_rollups WHERE period = ? AND metric = ? AND bucket >= ?"
+        params = [period, metric, since]
+        if admin_id is not None:
+            query += " AND admin_id = ?"
+            params.append(admin_id)
+        query += f" GROUP BY {column} ORDER BY " + ("key" if group_by == 'bucket' else "total DESC, key")
+        if limit:
+            query += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            conn = self._connect()
+            c = conn.cursor()
+            c.execute(query, params)
+            rows = c.fetchall()
+            conn.close()
+            return [(row['key'], row['total']) for row in rows]
+
+    def prune_stats(self, period, before):
+        with self._lock:
+            conn = self._connect()
+            c = conn.cursor()
+            c.execute("DELETE FROM stats_rollups WHERE period = ? AND bucket < ?", (period, before))
+            conn.commit()
+            conn.close()
+
+    # ---------- Xabarlarni band qilish ----------
+    def claim_message(self, chat_id, message_id, claimed_at):
+        with self._lock:
+            conn = self._connect()
+            c = conn.cursor()
+            c.execute("INSERT OR IGNORE INTO message_claims(chat_id, message_id, claimed_at) VALUES(?, ?, ?)",
+                      (chat_id, message_id, claimed_at))
+            claimed = c.rowcount == 1
+            conn.commit()
+            conn.close()
+            return claimed
+
+    def prune_message_claims(self, before):
+        with self._lock:
+            conn = self._connect()
+            c = conn.cursor()
+            c.execute("DELETE FROM message_claims WHERE claimed_at < ?", (before,))
+            conn.commit()
+            conn.close()
+
+# ==================== XOTIRA ====================
+
+class MemoryStorage(Storage):
+    """Xotiradagi ombor (testlar, benchmarklar va tezkor yo'l uchun)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._settings = {}
+        self._admins = {}
+        self._keywords = {}
+        self._private_groups = {}
+        self._search_groups = {}
+        self._keyword_groups = {}
+        self._rate_limits = {}
+        self._links = {}
+        self._stats = {}
+        self._sinks = {}
+        self._claims = {}
+
+    def _bump_generation(self):
+        self._settings['data_generation'] = str(int(self._settings.get('data_generation', '0')) + 1)
+
+    # ---------- Sozlamalar ----------
+    def get_setting(self, key, default=None):
+        with self._lock:
+            return self._settings.get(key, default)
+
+    def set_setting(self, key, value):
+        with self._lock:
+            self._settings[key] = value
+
+    def get_generation(self):
+        return int(self.get_setting('data_generation', '0'))
+
+    # ---------- Adminlar ----------
+    def is_admin(self, user_id):
+        with self._lock:
+            return user_id in self._admins
+
+    def add_admin(self, user_id, username):
+        with self._lock:
+            if user_id in self._admins:
+                return False
+            self._admins[user_id] = username
+            return True
+
+    def remove_admin(self, user_id):
+        with self._lock:
+            self._admins.pop(user_id, None)
+            self._keywords = {k: v for k, v in self._keywords.items() if v['admin_id'] != user_id}
+            self._keyword_groups = {k: v for k, v in self._keyword_groups.items() if k in self._keywords}
+            self._private_groups.pop(user_id, None)
+            self._sinks = {k: v for k, v in self._sinks.items() if v['admin_id'] != user_id}
+            self._search_groups = {k: v for k, v in self._search_groups.items() if v['admin_id'] != user_id}
+            self._rate_limits.pop(user_id, None)
+            self._bump_generation()
+
+    def get_all_admins(self):
+        with self._lock:
+            admins = sorted(self._admins.items(), key=lambda item: (item[1] is not None, (item[1] or '').lower()))
+            return list(admins)
+
+    # ---------- Kalit so'zlar ----------
+    def add_keyword(self, admin_id, keyword, rule=None):
+        with self._lock:
+            self._keywords[next(self._ids)] = {'admin_id': admin_id, 'keyword': keyword, 'rule': rule}
+            self._bump_generation()
+
+    def get_keywords(self, admin_id):
+        with self._lock:
+            return [(kid, kw['keyword']) for kid, kw in sorted(self._keywords.items(), reverse=True) if kw['admin_id'] == admin_id]
+
+    def remove_keyword(self, keyword_id):
+        with self._lock:
+            self._keywords.pop(keyword_id, None)
+            self._keyword_groups.pop(keyword_id, None)
+            self._bump_generation()
+
+    def get_keyword_scope(self, keyword_id):
+        with self._lock:
+            return set(self._keyword_groups.get(keyword_id, ()))
+
+    def set_keyword_scope(self, keyword_id, search_group_row_ids):
+        with self._lock:
+            if search_group_row_ids:
+                self._keyword_groups[keyword_id] = set(search_group_row_ids)
+            else:
+                self._keyword_groups.pop(keyword_id, None)
+            self._bump_generation()
+
+    # ---------- Shaxsiy guruhlar ----------
+    def add_private_group(self, admin_id, group_id=None, group_link=None, group_name=None):
+        with self._lock:
+            self._private_groups[admin_id] = {'group_id': group_id, 'group_link': group_link, 'group_name': group_name}
+            self._bump_generation()
+
+    def get_private_group(self, admin_id):
+        with self._lock:
+            group = self._private_groups.get(admin_id)
+            return dict(group) if group else None
+
+    def remove_private_group(self, admin_id):
+        with self._lock:
+            self._private_groups.pop(admin_id, None)
+            self._bump_generation()
+
+    # ---------- Sinklar ----------
+    def add_sink(self, admin_id, kind, target):
+        with self._lock:
+            self._sinks[next(self._ids)] = {'admin_id': admin_id, 'kind': kind, 'target': target, 'created_at': _now()}
+
+    def get_sinks(self, admin_id):
+        with self._lock:
+            return [(sid, s['kind'], s['target']) for sid, s in sorted(self._sinks.items()) if s['admin_id'] == admin_id]
+
+    def get_all_sinks(self):
+        with self._lock:
+            return [(sid, s['admin_id'], s['kind'], s['target']) for sid, s in sorted(self._sinks.items())]
+
+    def remove_sink(self, sink_id):
+        with self._lock:
+            self._sinks.pop(sink_id, None)
+
+    # ---------- Izlovchi guruhlar ----------
+    def add_search_group(self, admin_id, group_id=None, group_link=None, group_name=None, limit=MAX_SEARCH_GROUPS):
+        with self._lock:
+            if sum(1 for g in self._search_groups.values() if g['admin_id'] == admin_id) >= limit:
+                return False
+            self._search_groups[next(self._ids)] = {
+                'admin_id': admin_id,
+                'group_id': group_id,
+                'group_link': group_link,
+                'group_name': group_name,
+                'created_at': _now()
+            }
+            self._bump_generation()
+            return True
+
+    def add_search_groups_bulk(self, admin_id, groups, limit=MAX_SEARCH_GROUPS):
+        now = _now()
+        with self._lock:
+            existing = [(g['group_id'], g['group_link']) for g in self._search_groups.values() if g['admin_id'] == admin_id]
+            results, to_insert = plan_bulk_insert(existing, groups, limit)
+            for g in to_insert:
+                self._search_groups[next(self._ids)] = {
+                    'admin_id': admin_id,
+                    'group_id': g.get('group_id'),
+                    'group_link': g.get('group_link'),
+                    'group_name': g.get('group_name'),
+                    'created_at': now
+                }
+            if to_insert:
+                self._bump_generation()
+            return results
+
+    def get_search_groups(self, admin_id):
+        with self._lock:
+            return [(rid, g['group_name']) for rid, g in sorted(self._search_groups.items(), reverse=True) if g['admin_id'] == admin_id]
+
+    def get_all_search_groups(self):
+        with self._lock:
+            return [{
+                'row_id': rid,
+                'admin_id': g['admin_id'],
+                'group_id': g['group_id'],
+                'group_name': g['group_name']
+            } for rid, g in sorted(self._search_groups.items())]
+
+    def remove_search_group(self, row_id):
+        with self._lock:
+            self._search_groups.pop(row_id, None)
+            for scope in self._keyword_groups.values():
+                scope.discard(row_id)
+            self._keyword_groups = {k: v for k, v in self._keyword_groups.items() if v}
+            self._bump_generation()
+
+    # ---------- Rate limit ----------
+    def touch_rate_limit(self, admin_id, period):
+        with self._lock:
+            now = datetime.utcnow()
+            last = self._rate_limits.get(admin_id)
+            if last and now - last < period:
+                return False
+            self._rate_limits[admin_id] = now
+            return True
+
+    # ---------- Link aniqlash ----------
+    def _apply_link(self, link, chat_id, title):
+        updated = 0
+        for group in list(self._search_groups.values()) + list(self._private_groups.values()):
+            if group['group_id'] is None and group['group_link'] == link:
+                group['group_id'] = chat_id
+                group['group_name'] = title or group['group_name']
+                updated += 1
+        return updated
+
+    def apply_cached_link_resolutions(self):
+        with self._lock:
+            updated = 0
+            for link, res in self._links.items():
+                if res['chat_id'] is not None:
+                    updated += self._apply_link(link, res['chat_id'], res['title'])
+            if updated:
+                self._bump_generation()
+            return updated
+
+    def get_pending_links(self, limit):
+        now = datetime.utcnow()
+        with self._lock:
+            links = {g['group_link'] for g in list(self._search_groups.values()) + list(self._private_groups.values())
+                     if g['group_id'] is None and g['group_link']}
+            pending = []
+            for link in links:
+                res = self._links.get(link)
+                if res is None or res['next_attempt_at'] is None or res['next_attempt_at'] <= now:
+                    pending.append((link, res['attempts'] if res else 0))
+            pending.sort(key=lambda item: item[1])
+            return pending[:limit]
+
+    def save_link_resolution(self, link, chat_id, title):
+        with self._lock:
+            res = self._links.setdefault(link, {'attempts': 0})
+            res.update(chat_id=chat_id, title=title, next_attempt_at=None, last_error=None, resolved_at=datetime.utcnow())
+            self._apply_link(link, chat_id, title)
+            self._bump_generation()
+
+    def mark_link_failed(self, link, error, retry_after):
+        with self._lock:
+            res = self._links.setdefault(link, {'chat_id': None, 'title': None, 'attempts': 0, 'resolved_at': None})
+            res['attempts'] += 1
+            res['next_attempt_at'] = datetime.utcnow() + timedelta(seconds=retry_after)
+            res['last_error'] = str(error)[:500]
+
+    # ---------- Indeks va statistika ----------
+    def load_index_data(self):
+        with self._lock:
+            return {
+                'generation': int(self._settings.get('data_generation', '0')),
+                'keywords': [(kid, kw['admin_id'], kw['keyword'], kw['rule']) for kid, kw in sorted(self._keywords.items())],
+                'private_groups': {aid: g['group_id'] for aid, g in self._private_groups.items()},
+                'search_groups': [(rid, g['admin_id'], g['group_id']) for rid, g in sorted(self._search_groups.items())
+                                  if g['group_id'] is not None],
+                'keyword_groups': [(kid, rid) for kid, scope in sorted(self._keyword_groups.items()) for rid in sorted(scope)]
+            }
+
+    def get_counts(self):
+        with self._lock:
+            return {
+                'admins': len(self._admins),
+                'keywords': len(self._keywords),
+                'search_groups': len(self._search_groups),
+                'private_groups': len(self._private_groups)
+            }
+
+    # ---------- Statistika ----------
+    def add_stats(self, rows):
+        with self._lock:
+            for period, bucket, metric, dim, admin_id, count in rows:
+                key = (period, metric, bucket, admin_id, dim)
+                self._stats[key] = self._stats.get(key, 0) + count
+
+    def query_stats(self, period, since, metric, admin_id=None, group_by='dim', limit=None):
+        position = {'dim': 4, 'admin': 3, 'bucket': 2}[group_by]
+        totals = {}
+        with self._lock:
+            for key, count in self._stats.items():
+                if key[0] != period or key[1] != metric or key[2] < since:
+                    continue
+                if admin_id is not None and key[3] != admin_id:
+                    continue
+                totals[key[position]] = totals.get(key[position], 0) + count
+        if group_by == 'bucket':
+            rows = sorted(totals.items())
+        else:
+            rows = sorted(totals.items(), key=lambda item: (-item[1], item[0]))
+        return rows[:limit] if limit else rows
+
+    def prune_stats(self, period, before):
+        with self._lock:
+            self._stats = {k: v for k, v in self._stats.items() if not (k[0] == period and k[2] < before)}
+
+    # ---------- Xabarlarni band qilish ----------
+    def claim_message(self, chat_id, message_id, claimed_at):
+        with self._lock:
+            if (chat_id, message_id) in self._claims:
+                return False
+            self._claims[(chat_id, message_id)] = claimed_at
+            return True
+
+    def prune_message_claims(self, before):
+        with self._lock:
+            self._claims = {k: v for k, v in self._claims.items() if v >= before}
+
+def create_storage(backend='sqlite', path='data.db'):
+    """Konfiguratsiya bo'yicha ombor yaratish"""
+    if backend == 'memory':
+        return MemoryStorage()
+    if backend == 'sqlite':
+        return SQLiteStorage(path)
+    raise ValueError(f"Noma'lum storage backend: {backend}")
@@ -0,0 +1,9 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# bot.py va userbot.py import paytida .env qiymatlarini talab qiladi
+os.environ.setdefault('BOT_TOKEN', '123456:TEST')
+os.environ.setdefault('SUPER_ADMIN_ID', '1')
+os.environ.setdefault('STORAGE_BACKEND', 'memory')
@@ -0,0 +1,113 @@
+import random
+
+import pytest
+
+from keyword_rules import (
+    MessageTokens, RuleError, build_rule_index, dumps, evaluate, is_rule, loads, match_rules, parse_rule, tokenize
+)
+
+def matches(rule, text):
+    return evaluate(parse_rule(rule), MessageTokens(text))
+
+# ==================== TAHLIL ====================
+
+def test_tokenize_normalizes_apostrophes():
+    assert tokenize("Oʻzbekiston O‘ZBEKISTON o'zbekiston!") == ["o'zbekiston"] * 3
+
+def test_is_rule():
+    assert not is_rule("kvartira sotiladi")
+    assert is_rule("kvartira AND sotiladi")
+    assert is_rule('"uy sotiladi" OR "hovli sotiladi"')
+    assert is_rule("(uy OR hovli)")
+    assert is_rule("uy NOT(garaj)")
+    assert not is_rule("and or not")
+    # Operatorsiz qavs va qo'shtirnoq oddiy kalit so'z bo'lib qoladi
+    assert not is_rule("Samsung (A52)")
+    assert not is_rule('"Chevrolet"')
+    assert not is_rule('"uy sotiladi"')
+
+def test_precedence():
+    # NOT > AND > OR
+    assert parse_rule("a OR b AND c") == ['or', [['term', 'a'], ['and', [['term', 'b'], ['term', 'c']]]]]
+    assert parse_rule("a AND NOT b OR c") == ['or', [['and', [['term', 'a'], ['not', ['term', 'b']]]], ['term', 'c']]]
+    assert parse_rule("a b NOT c") == ['and', [['term', 'a'], ['term', 'b'], ['not', ['term', 'c']]]]
+
+def test_parentheses():
+    assert parse_rule("(a OR b) AND c") == ['and', [['or', [['term', 'a'], ['term', 'b']]], ['term', 'c']]]
+    assert parse_rule("a AND NOT (b OR c)") == ['and', [['term', 'a'], ['not', ['or', [['term', 'b'], ['term', 'c']]]]]]
+    assert matches("kvartira AND (sotiladi OR ijaraga) NOT garaj", "Kvartira ijaraga beriladi")
+    assert not matches("kvartira AND (sotiladi OR ijaraga) NOT garaj", "Kvartira va garaj sotiladi")
+
+def test_phrases():
+    assert parse_rule('"uy sotiladi"') == ['phrase', ['uy', 'sotiladi']]
+    assert parse_rule('"uy"') == ['term', 'uy']
+    assert matches('"uy sotiladi"', "Shahar markazida uy sotiladi!")
+    assert not matches('"uy sotiladi"', "sotiladi uy")
+    assert not matches('"uy sotiladi"', "uy tez sotiladi")
+    assert matches('"uy sotiladi" OR "hovli sotiladi"', "hovli uy sotiladi")
+
+def test_whole_words():
+    assert matches("uy AND sotiladi", "uy sotiladi")
+    assert not matches("uy AND sotiladi", "uylar sotiladi")
+
+@pytest.mark.parametrize('rule', [
+    '',
+    '()',
+    '"uy',
+    '""',
+    '(uy AND sotiladi',
+    'uy AND sotiladi)',
+    'uy AND',
+    'OR uy',
+    'NOT garaj',
+    'uy OR NOT garaj',
+    'NOT (uy AND garaj)'
+])
+def test_parse_errors(rule):
+    with pytest.raises(RuleError):
+        parse_rule(rule)
+
+def test_json_roundtrip():
+    tree = parse_rule('kvartira AND ("uy sotiladi" OR ijaraga) NOT garaj')
+    assert loads(dumps(tree)) == tree
+
+# ==================== INDEKS ====================
+
+VOCAB = ['a', 'b', 'c', 'd', 'e']
+
+def random_tree(rng, depth=0):
+    roll = rng.random()
+    if depth >= 3 or roll < 0.35:
+        if rng.random() < 0.2:
+            return ['phrase', rng.sample(VOCAB, 2)]
+        return ['term', rng.choice(VOCAB)]
+    if roll < 0.5:
+        return ['not', random_tree(rng, depth + 1)]
+    return [rng.choice(['and', 'or']), [random_tree(rng, depth + 1) for _ in range(rng.randint(2, 3))]]
+
+def test_index_matches_brute_force():
+    rng = random.Random(7)
+    rules = []
+    while len(rules) < 300:
+        tree = random_tree(rng)
+        # parse_rule bo'sh xabarga mos keladigan qoidalarni (masalan "a OR NOT b") qabul qilmaydi
+        if not evaluate(tree, MessageTokens('')):
+            rules.append((f"rule{len(rules)}", tree))
+    index = build_rule_index(rules)
+    for _ in range(500):
+        message = MessageTokens(' '.join(rng.choice(VOCAB + ['x', 'y']) for _ in range(rng.randint(0, 6))))
+        expected = [keyword for keyword, tree in rules if evaluate(tree, message)]
+        assert match_rules(index, message) == expected
+
+def test_index_with_negation_under_and():
+    rules = [('r1', parse_rule('a AND (b OR NOT c)')), ('r2', parse_rule('NOT c AND d'))]
+    index = build_rule_index(rules)
+    assert match_rules(index, MessageTokens('a')) == ['r1']
+    assert match_rules(index, MessageTokens('a c')) == []
+    assert match_rules(index, MessageTokens('a b c d')) == ['r1']
+    assert match_rules(index, MessageTokens('d a')) == ['r1', 'r2']
+
+def test_not_or_rule_rejected_before_indexing():
+    # "a OR NOT b" a ham, b ham bo'lmagan xabarga mos keladi - teskari indeks uni topa olmaydi
+    with pytest.raises(RuleError):
+        parse_rule('a OR NOT b')
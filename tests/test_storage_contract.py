@@ -0,0 +1,201 @@
+from datetime import timedelta
+
+import pytest
+
+import database as db
+from storage import MemoryStorage, SQLiteStorage, plan_bulk_insert
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def storage(request, tmp_path):
+    if request.param == 'memory':
+        store = MemoryStorage()
+    else:
+        store = SQLiteStorage(str(tmp_path / 'test.db'))
+    store.init()
+    return store
+
+# ==================== SOZLAMALAR ====================
+
+def test_settings(storage):
+    assert storage.get_setting('missing') is None
+    assert storage.get_setting('missing', 'default') == 'default'
+    storage.set_setting('userbot_stop_time', '00:00')
+    storage.set_setting('userbot_stop_time', '01:30')
+    assert storage.get_setting('userbot_stop_time') == '01:30'
+
+def test_generation_bumped_by_mutators(storage):
+    generation = storage.get_generation()
+    storage.add_keyword(10, 'kvartira')
+    assert storage.get_generation() > generation
+    generation = storage.get_generation()
+    storage.set_setting('other', '1')
+    assert storage.get_generation() == generation
+
+# ==================== ADMINLAR ====================
+
+def test_admins(storage):
+    assert storage.add_admin(10, 'bob') is True
+    assert storage.add_admin(10, 'bob') is False
+    storage.add_admin(11, 'alice')
+    assert storage.is_admin(10) and not storage.is_admin(12)
+    assert sorted(storage.get_all_admins()) == [(10, 'bob'), (11, 'alice')]
+
+def test_remove_admin_cascades(storage):
+    storage.add_admin(10, 'bob')
+    storage.add_keyword(10, 'kvartira')
+    storage.add_private_group(10, group_id=-200)
+    storage.add_search_group(10, group_id=-100)
+    storage.add_sink(10, 'jsonl', 'bob.jsonl')
+    storage.remove_admin(10)
+    assert not storage.is_admin(10)
+    assert storage.get_keywords(10) == []
+    assert storage.get_private_group(10) is None
+    assert storage.get_search_groups(10) == []
+    assert storage.get_sinks(10) == []
+
+# ==================== KALIT SO'ZLAR ====================
+
+def test_keywords(storage):
+    storage.add_keyword(10, 'kvartira')
+    storage.add_keyword(10, 'uy AND sotiladi', '["and", [["term", "uy"], ["term", "sotiladi"]]]')
+    storage.add_keyword(11, 'mashina')
+    keywords = storage.get_keywords(10)
+    assert [kw for _, kw in keywords] == ['uy AND sotiladi', 'kvartira']
+    data = storage.load_index_data()
+    rules = {kw: rule for _, _, kw, rule in data['keywords']}
+    assert rules['kvartira'] is None
+    assert rules['uy AND sotiladi'].startswith('["and"')
+    storage.remove_keyword(keywords[0][0])
+    assert [kw for _, kw in storage.get_keywords(10)] == ['kvartira']
+
+def test_keyword_scope(storage):
+    storage.add_keyword(10, 'kvartira')
+    kid = storage.get_keywords(10)[0][0]
+    storage.add_search_group(10, group_id=-100)
+    storage.add_search_group(10, group_id=-101)
+    rows = sorted(rid for rid, _ in storage.get_search_groups(10))
+    assert storage.get_keyword_scope(kid) == set()
+
+    storage.set_keyword_scope(kid, set(rows))
+    assert storage.get_keyword_scope(kid) == set(rows)
+    assert sorted(storage.load_index_data()['keyword_groups']) == [(kid, rid) for rid in rows]
+
+    # O'chirilgan guruh bog'lanishdan ham olib tashlanadi
+    storage.remove_search_group(rows[0])
+    assert storage.get_keyword_scope(kid) == {rows[1]}
+
+    storage.set_keyword_scope(kid, set())
+    assert storage.get_keyword_scope(kid) == set()
+
+    storage.set_keyword_scope(kid, {rows[1]})
+    storage.remove_keyword(kid)
+    assert storage.load_index_data()['keyword_groups'] == []
+
+def test_scope_to_pending_link_matches_nowhere(storage):
+    # Faqat hali aniqlanmagan havola guruhiga bog'langan kalit so'z barcha guruhlarga kengaymaydi
+    previous = db.get_storage()
+    db.configure(storage)
+    try:
+        storage.add_keyword(10, 'mashina')
+        storage.add_keyword(10, 'sotiladi')
+        kid = [k for k, kw in storage.get_keywords(10) if kw == 'mashina'][0]
+        storage.add_search_group(10, group_id=-100)
+        storage.add_search_group(10, group_link='https://t.me/+pending', group_name='Pending')
+        pending = [rid for rid, name in storage.get_search_groups(10) if name == 'Pending'][0]
+        storage.set_keyword_scope(kid, {pending})
+        assert [m['keyword'] for m in db.check_keywords_in_message(-100, 'mashina sotiladi')] == ['sotiladi']
+    finally:
+        db.configure(previous)
+
+# ==================== GURUHLAR ====================
+
+def test_private_group(storage):
+    storage.add_private_group(10, group_link='https://t.me/+abc', group_name='Mening guruhim')
+    assert storage.get_private_group(10) == {'group_id': None, 'group_link': 'https://t.me/+abc', 'group_name': 'Mening guruhim'}
+    storage.add_private_group(10, group_id=-200, group_name='Yangi')
+    assert storage.get_private_group(10)['group_id'] == -200
+    storage.remove_private_group(10)
+    assert storage.get_private_group(10) is None
+
+def test_search_group_limit(storage):
+    assert storage.add_search_group(10, group_id=-100, limit=2) is True
+    assert storage.add_search_group(10, group_id=-101, limit=2) is True
+    assert storage.add_search_group(10, group_id=-102, limit=2) is False
+    assert storage.add_search_group(11, group_id=-102, limit=2) is True
+    assert len(storage.get_search_groups(10)) == 2
+    data = storage.load_index_data()
+    assert sorted(gid for _, admin_id, gid in data['search_groups'] if admin_id == 10) == [-101, -100]
+
+def test_rate_limit(storage):
+    assert storage.touch_rate_limit(10, timedelta(minutes=5)) is True
+    assert storage.touch_rate_limit(10, timedelta(minutes=5)) is False
+    assert storage.touch_rate_limit(11, timedelta(minutes=5)) is True
+    assert storage.touch_rate_limit(10, timedelta(0)) is True
+
+def test_bulk_insert_plan():
+    results, to_insert = plan_bulk_insert(
+        [(-100, None), (None, 'https://t.me/a')],
+        [{'group_id': -100}, {'group_link': 'https://t.me/a'}, {'group_id': -101}, {'group_id': -101}, {'group_id': -102}],
+        limit=3
+    )
+    assert [ok for ok, _ in results] == [False, False, True, False, False]
+    assert to_insert == [{'group_id': -101}]
+
+def test_bulk_insert(storage):
+    storage.add_search_group(10, group_id=-100)
+    results = storage.add_search_groups_bulk(10, [
+        {'group_id': -100, 'group_name': 'Takror'},
+        {'group_id': -101, 'group_name': 'Bir'},
+        {'group_link': 'https://t.me/ikki', 'group_name': 'Ikki'},
+        {'group_id': -102, 'group_name': 'Uch'}
+    ], limit=3)
+    assert [ok for ok, _ in results] == [False, True, True, False]
+    assert {name for _, name in storage.get_search_groups(10)} == {'Bir', 'Ikki', None}
+    assert storage.get_pending_links(10) == [('https://t.me/ikki', 0)]
+
+def test_link_resolution(storage):
+    storage.add_search_group(10, group_link='https://t.me/ikki')
+    storage.mark_link_failed('https://t.me/ikki', 'timeout', 3600)
+    assert storage.get_pending_links(10) == []
+    storage.save_link_resolution('https://t.me/ikki', -105, 'Ikki')
+    assert storage.get_search_groups(10)[0][1] == 'Ikki'
+    assert (-105) in [gid for _, _, gid in storage.load_index_data()['search_groups']]
+
+# ==================== STATISTIKA ====================
+
+def test_stats_rollups(storage):
+    storage.add_stats([
+        ('day', '2026-10-18', 'keyword', 'kvartira', 10, 2),
+        ('day', '2026-10-19', 'keyword', 'kvartira', 10, 3),
+        ('day', '2026-10-19', 'keyword', 'uy', 11, 4),
+        ('hour', '2026-10-19 10', 'keyword', 'uy', 11, 4)
+    ])
+    storage.add_stats([('day', '2026-10-19', 'keyword', 'kvartira', 10, 1)])
+    assert storage.query_stats('day', '2026-10-18', 'keyword') == [('kvartira', 6), ('uy', 4)]
+    assert storage.query_stats('day', '2026-10-19', 'keyword', admin_id=10) == [('kvartira', 4)]
+    assert storage.query_stats('day', '2026-10-18', 'keyword', group_by='admin') == [(10, 6), (11, 4)]
+    assert storage.query_stats('day', '2026-10-18', 'keyword', group_by='bucket') == [('2026-10-18', 2), ('2026-10-19', 8)]
+    assert storage.query_stats('day', '2026-10-18', 'keyword', limit=1) == [('kvartira', 6)]
+
+    storage.prune_stats('day', '2026-10-19')
+    assert storage.query_stats('day', '2026-10-01', 'keyword', group_by='bucket') == [('2026-10-19', 8)]
+    assert storage.query_stats('hour', '2026-10-19 00', 'keyword') == [('uy', 4)]
+
+# ==================== SINKLAR ====================
+
+def test_message_claims(storage):
+    assert storage.claim_message(-100, 1, 1000.0) is True
+    assert storage.claim_message(-100, 1, 1001.0) is False
+    assert storage.claim_message(-100, 2, 2000.0) is True
+    storage.prune_message_claims(1500.0)
+    assert storage.claim_message(-100, 1, 3000.0) is True
+    assert storage.claim_message(-100, 2, 3000.0) is False
+
+def test_sinks(storage):
+    storage.add_sink(10, 'jsonl', 'a.jsonl')
+    storage.add_sink(11, 'webhook', 'http://127.0.0.1/hook')
+    sinks = storage.get_sinks(10)
+    assert [(kind, target) for _, kind, target in sinks] == [('jsonl', 'a.jsonl')]
+    assert [(admin_id, kind) for _, admin_id, kind, _ in storage.get_all_sinks()] == [(10, 'jsonl'), (11, 'webhook')]
+    storage.remove_sink(sinks[0][0])
+    assert storage.get_sinks(10) == []
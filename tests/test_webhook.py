@@ -0,0 +1,130 @@
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import pytest
+from telegram import Bot
+
+import bot as bot_module
+import database as db
+from storage import MemoryStorage
+
+SECRET = 'test-secret'
+
+def make_update_payload(seq, group_id, text):
+    """Bot API formatidagi guruh xabari (loadtest.make_update_payload bilan bir xil)"""
+    return {
+        'update_id': seq + 1,
+        'message': {
+            'message_id': seq + 1,
+            'date': int(time.time()),
+            'chat': {'id': group_id, 'type': 'supergroup', 'title': f"Group {group_id}"},
+            'from': {'id': 500000 + seq, 'is_bot': False, 'first_name': 'Test', 'username': f"user{seq}"},
+            'text': text
+        }
+    }
+
+class FakeBotApiHandler(BaseHTTPRequestHandler):
+    """Dispatcher faqat getMe ni so'raydi (CommandHandler bot username ini tekshiradi)"""
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        body = json.dumps({'ok': True, 'result': {'id': 1, 'is_bot': True, 'first_name': 'Test', 'username': 'test_bot'}}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture
+def fake_api():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeBotApiHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/bot"
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture
+def webhook(monkeypatch, fake_api):
+    db.configure(MemoryStorage())
+    submitted = []
+    received = threading.Condition()
+
+    def submit(job):
+        with received:
+            submitted.append(job)
+            received.notify_all()
+
+    monkeypatch.setattr(bot_module.group_workers, 'submit', submit)
+    monkeypatch.setattr(bot_module, 'WEBHOOK_LISTEN', '127.0.0.1')
+    monkeypatch.setattr(bot_module, 'WEBHOOK_PORT', 0)
+    monkeypatch.setattr(bot_module, 'WEBHOOK_SECRET', SECRET)
+    monkeypatch.setattr(bot_module, 'WEBHOOK_URL', '')
+    monkeypatch.setattr(bot_module, 'WEBHOOK_MAX_BODY', 4096)
+    updater = bot_module.build_updater(Bot(bot_module.TOKEN, base_url=fake_api))
+    server = bot_module.start_webhook(updater)
+    url = f"http://127.0.0.1:{server.server_address[1]}{bot_module.WEBHOOK_PATH}"
+
+    def wait_for(count, timeout=5):
+        with received:
+            received.wait_for(lambda: len(submitted) >= count, timeout)
+        return submitted
+
+    yield url, wait_for, submitted
+    bot_module.stop_webhook(updater, server)
+
+def post(url, payload, secret=SECRET, body=None):
+    data = body if body is not None else json.dumps(payload).encode()
+    request = urllib.request.Request(url, data=data, headers={
+        'Content-Type': 'application/json',
+        'X-Telegram-Bot-Api-Secret-Token': secret
+    })
+    try:
+        with urllib.request.urlopen(request, timeout=5) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+def test_each_update_dispatched_once(webhook):
+    url, wait_for, _ = webhook
+    for seq in range(20):
+        assert post(url, make_update_payload(seq, -100500, f"xabar {seq}")) == 200
+    submitted = wait_for(20)
+    time.sleep(0.2)
+    assert sorted(job['message_id'] for job in submitted) == list(range(1, 21))
+    assert {job['group_id'] for job in submitted} == {-100500}
+
+def test_bad_secret_rejected(webhook):
+    url, _, submitted = webhook
+    assert post(url, make_update_payload(0, -100500, "xabar"), secret='wrong') == 403
+    assert post(url, make_update_payload(1, -100500, "xabar"), secret='') == 403
+    time.sleep(0.2)
+    assert submitted == []
+
+def test_wrong_path_and_bad_payload(webhook):
+    url, _, submitted = webhook
+    assert post(url.rsplit('/', 1)[0] + '/other', make_update_payload(0, -100500, "xabar")) == 404
+    assert post(url, None, body=b'{not json') == 400
+    time.sleep(0.2)
+    assert submitted == []
+
+def test_oversized_body_rejected(webhook):
+    url, _, submitted = webhook
+    payload = make_update_payload(0, -100500, "x" * 8192)
+    assert post(url, payload) == 413
+    time.sleep(0.2)
+    assert submitted == []
+
+def test_secret_required(monkeypatch):
+    monkeypatch.setattr(bot_module, 'WEBHOOK_LISTEN', '127.0.0.1')
+    monkeypatch.setattr(bot_module, 'WEBHOOK_PORT', 0)
+    monkeypatch.setattr(bot_module, 'WEBHOOK_SECRET', '')
+    with pytest.raises(ValueError):
+        bot_module.start_webhook(SimpleNamespace(dispatcher=None))
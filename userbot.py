@@ -5,26 +5,28 @@
 import logging
 import asyncio
 import os
-from datetime import datetime, time, timedelta
+import random
+from collections import deque
+from datetime import datetime, time, timedelta, timezone
+from urllib.parse import urlparse, parse_qs
 from dotenv import load_dotenv
-from telethon import TelegramClient, events
+from telethon import TelegramClient, events, utils
+from telethon.errors import FloodWaitError
 from telethon.sessions import StringSession
-from telegram import Bot, InlineKeyboardButton, InlineKeyboardMarkup
+from telethon.tl.functions.channels import JoinChannelRequest
+from telethon.tl.functions.messages import CheckChatInviteRequest, ImportChatInviteRequest
+from telethon.tl.types import Channel, ChatInviteAlready
+from telegram import Bot
 from telegram.error import TelegramError
 import database as db
+from notifier import build_notification, claims, match_state
+from logging_setup import sampler, setup_logging
+import sinks
+import stats
 
 # .env fayldan sozlamalarni yuklash
 load_dotenv()
 
-# Logging sozlash
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO,
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler('userbot.log', encoding='utf-8')
-    ]
-)
 logger = logging.getLogger(__name__)
 
 # ==================== SOZLAMALAR ====================
@@ -34,6 +36,22 @@ PHONE = os.getenv('PHONE_NUMBER')
 API_ID = int(os.getenv('API_ID'))
 API_HASH = os.getenv('API_HASH')
 SESSION_STRING = os.getenv('SESSION_STRING', '')
+RESOLVER_INTERVAL = int(os.getenv('RESOLVER_INTERVAL', 60))
+RESOLVER_CONCURRENCY = int(os.getenv('RESOLVER_CONCURRENCY', 2))
+RESOLVER_BATCH = int(os.getenv('RESOLVER_BATCH', 20))
+RESOLVER_BASE_BACKOFF = int(os.getenv('RESOLVER_BASE_BACKOFF', 300))
+RESOLVER_MAX_BACKOFF = int(os.getenv('RESOLVER_MAX_BACKOFF', 6 * 3600))
+INGEST_WORKERS = int(os.getenv('INGEST_WORKERS', 8))
+INGEST_QUEUE_SIZE = int(os.getenv('INGEST_QUEUE_SIZE', 1000))
+INGEST_OVERFLOW = os.getenv('INGEST_OVERFLOW', 'shed_unwatched')
+INGEST_METRICS_INTERVAL = int(os.getenv('INGEST_METRICS_INTERVAL', 60))
+EDIT_MAX_AGE = int(os.getenv('EDIT_MAX_AGE', 86400))
+STALL_SECONDS = int(os.getenv('STALL_SECONDS', 900))
+STALL_CHECK_INTERVAL = int(os.getenv('STALL_CHECK_INTERVAL', 30))
+RECONNECT_BASE_DELAY = float(os.getenv('RECONNECT_BASE_DELAY', 1))
+RECONNECT_MAX_DELAY = float(os.getenv('RECONNECT_MAX_DELAY', 300))
+# Kalit so'z indeksi snapshoti (bo'sh - o'chirilgan)
+INDEX_SNAPSHOT = os.getenv('INDEX_SNAPSHOT', 'index.snapshot')
 
 if not all([BOT_TOKEN, SUPER_ADMIN_ID, PHONE, API_ID, API_HASH]):
     raise ValueError("❌ .env faylida kerakli ma'lumotlar topilmadi!")
@@ -45,50 +63,54 @@ bot_instance = None
 
 # ==================== XABAR YUBORISH ====================
 async def send_notification(private_group_id, group_name, username, user_id, keyword, msg_text):
-    """Kalit so'z topilganda shaxsiy guruhga xabar yuborish"""
+    """Kalit so'z topilganda shaxsiy guruhga xabar yuborish. Returns: True - yuborilgan bo'lsa"""
     global bot_instance
     
     try:
         if not bot_instance:
             bot_instance = Bot(token=BOT_TOKEN)
         
-        keyboard = InlineKeyboardMarkup([
-            [InlineKeyboardButton("👤 Profil", url=f"tg://user?id={user_id}")]
-        ])
-        
-        # Xabarni qisqartirish (500 belgidan ko'p bo'lsa)
-        if len(msg_text) > 500:
-            msg_text = msg_text[:500] + "..."
-        
-        message_text = (
-            f"🔍 Kalit so'z topildi! (Userbot)\n\n"
-            f"📢 Guruh: {group_name}\n"
-            f"👤 Foydalanuvchi: {username}\n"
-            f"🆔 User ID: {user_id}\n"
-            f"🔑 Kalit so'z: {keyword}\n\n"
-            f"💬 Xabar:\n{msg_text}"
-        )
+        text, keyboard = build_notification("Userbot", group_name, username, user_id, keyword, msg_text)
         
-        await bot_instance.send_message(
+        # PTB 13 Bot sinxron ishlaydi - event loop ni bloklamaslik uchun alohida oqimda
+        await asyncio.to_thread(
+            bot_instance.send_message,
             chat_id=private_group_id,
-            text=message_text,
+            text=text,
             reply_markup=keyboard
         )
         
-        logger.info(f"✅ Xabar yuborildi: Guruh={group_name}, Keyword={keyword}")
+        if sampler.allow('notification'):
+            logger.info("✅ Xabar yuborildi: Guruh=%s, Keyword=%s", group_name, keyword, extra={'event': 'notification'})
+        return True
         
     except TelegramError as e:
         logger.error(f"❌ Telegram xato: {e}")
     except Exception as e:
         logger.error(f"❌ Xabar yuborishda xato: {e}")
+    return False
 
 # ==================== USERBOT HANDLER ====================
+async def claim_message(group_id, message_id, edited=False):
+    """Xabarni band qilish (ikki jarayonli rejimda DB ga yozish event loop dan tashqarida)"""
+    claim = claims.claim_edit if edited else claims.claim
+    if claims.shared:
+        return await asyncio.to_thread(claim, group_id, message_id)
+    return claim(group_id, message_id)
+
 async def message_handler(event):
-    """Barcha xabarlarni handle qilish"""
+    """Barcha xabarlarni (yangi va tahrirlangan) handle qilish"""
     try:
         if not event.message or not event.message.text:
             return
         
+        edited = isinstance(event, events.MessageEdited.Event)
+        if edited and event.message.date:
+            # Eski xabarlar keshdan chiqib ketgan bo'lishi mumkin - qayta yubormaslik uchun e'tiborsiz
+            age = (datetime.now(timezone.utc) - event.message.date).total_seconds()
+            if age > EDIT_MAX_AGE:
+                return
+        
         chat = await event.get_chat()
         
         # Faqat guruh xabarlarini qayta ishlash
@@ -100,27 +122,51 @@ async def message_handler(event):
         
         group_id = event.chat_id
         msg_text = event.message.text
+        # Hech kim kuzatmaydigan guruhlar qayta ishlanmaydi va statistikaga kirmaydi
+        if not db.is_watched_group(group_id):
+            return
+        
         group_name = getattr(chat, 'title', 'Unknown')
         
         sender = await event.get_sender()
         if not sender:
             return
         
+        # Xabar bot bilan birga faqat bir marta qayta ishlanadi. Tahrirlar faqat userbotga keladi:
+        # asl xabarni bot jarayoni band qilgan bo'lsa, tahrir ham o'sha tomonniki (bildirishnoma
+        # va statistika takrorlanmaydi), aks holda match_state faqat yangi mosliklarni qaytaradi.
+        # Xabar yuboruvchi aniqlangandan keyin band qilinadi - aks holda bot yo'li ham uni o'tkazib yuboradi
+        if not await claim_message(group_id, event.message.id, edited):
+            return
+        
         user_id = sender.id
         username = sender.username if sender.username else (sender.first_name if sender.first_name else "Unknown")
         
-        logger.info(f"📨 Xabar: Guruh={group_name} (ID: {group_id}), User={username}")
+        if sampler.allow('message'):
+            logger.info(
+                "📨 %s: Guruh=%s (ID: %s), User=%s", "Tahrir" if edited else "Xabar", group_name, group_id, username,
+                extra={'event': 'message'}
+            )
         
         # Kalit so'zlarni tekshirish
         matches = db.check_keywords_in_message(group_id, msg_text)
+        # Shu xabar uchun avval yuborilgan kalit so'zlar qayta yuborilmaydi
+        matches = match_state.new_matches(group_id, event.message.id, matches)
+        # Tahrir yangi xabar sifatida sanalmaydi, faqat undagi yangi mosliklar qo'shiladi
+        stats.recorder.record_scan(group_id, matches, scanned=not edited)
         
         if matches:
-            logger.info(f"🔍 {len(matches)} ta kalit so'z topildi!")
+            if sampler.allow('match'):
+                logger.info("🔍 %d ta kalit so'z topildi!", len(matches), extra={'event': 'match'})
             
             for match in matches:
                 try:
+                    sinks.manager.dispatch(match['admin_id'], sinks.make_record(
+                        "Userbot", match['admin_id'], group_id, group_name, event.message.id,
+                        user_id, username, match['keyword'], msg_text
+                    ))
                     if match['private_group_id']:
-                        await send_notification(
+                        sent = await send_notification(
                             match['private_group_id'],
                             group_name,
                             username,
@@ -128,13 +174,389 @@ async def message_handler(event):
                             match['keyword'],
                             msg_text
                         )
+                        stats.recorder.record_delivery(match['admin_id'], sent)
                 except Exception as e:
                     logger.error(f"❌ Match handle qilishda xato: {e}")
         
     except Exception as e:
         logger.error(f"❌ Message handler xatosi: {e}")
 
+# ==================== INGEST NAVBATI ====================
+class IngestQueue:
+    """
+    Telethon eventlari uchun cheklangan navbat va belgilangan sondagi ishchilar.
+    Navbat to'lganda overflow siyosati qo'llanadi:
+    - block: joy bo'shaguncha kutish (client sequential_updates=True bilan yaratiladi)
+    - drop_oldest: eng eski eventni tashlab yuborish
+    - shed_unwatched: avval kuzatilmaydigan chatlar eventlarini, keyin eng eskisini tashlash
+    """
+
+    POLICIES = ('block', 'drop_oldest', 'shed_unwatched')
+
+    def __init__(self, handler, workers=INGEST_WORKERS, maxsize=INGEST_QUEUE_SIZE, overflow=INGEST_OVERFLOW):
+        if overflow not in self.POLICIES:
+            raise ValueError(f"Noma'lum overflow siyosati: {overflow}")
+        self.handler = handler
+        self.workers = workers
+        self.maxsize = maxsize
+        self.overflow = overflow
+        self._items = deque()
+        self._unwatched = 0
+        self._cond = asyncio.Condition()
+        self._inflight = 0
+        self._tasks = []
+        self._reset_metrics()
+
+    def _reset_metrics(self):
+        self.metrics = {
+            'enqueued': 0,
+            'processed': 0,
+            'dropped': 0,
+            'max_depth': 0,
+            'wait_total': 0.0,
+            'wait_max': 0.0
+        }
+
+    def _drop_one(self):
+        """Navbatdan bitta eventni siyosatga ko'ra olib tashlash (faqat xotiradagi belgilar bo'yicha)"""
+        if self.overflow == 'shed_unwatched' and self._unwatched:
+            for i, (_, watched, _) in enumerate(self._items):
+                if not watched:
+                    del self._items[i]
+                    self._unwatched -= 1
+                    return
+        if not self._items.popleft()[1]:
+            self._unwatched -= 1
+
+    async def put(self, event):
+        """Eventni navbatga qo'yish. Returns: False - event tashlab yuborilgan bo'lsa"""
+        loop = asyncio.get_running_loop()
+        # Chat kuzatilishi bir marta, navbatga qo'yishda xotiradagi indeks bo'yicha aniqlanadi -
+        # event loop da DB o'qilmaydi va indeks qayta qurilmaydi (uni ishchilar yangilaydi)
+        watched = self.overflow != 'shed_unwatched' or db.is_watched_group(event.chat_id, refresh=False)
+        async with self._cond:
+            if len(self._items) >= self.maxsize:
+                if self.overflow == 'block':
+                    await self._cond.wait_for(lambda: len(self._items) < self.maxsize)
+                elif not watched:
+                    self.metrics['dropped'] += 1
+                    return False
+                else:
+                    self._drop_one()
+                    self.metrics['dropped'] += 1
+            self._items.append((loop.time(), watched, event))
+            if not watched:
+                self._unwatched += 1
+            self.metrics['enqueued'] += 1
+            self.metrics['max_depth'] = max(self.metrics['max_depth'], len(self._items))
+            self._cond.notify_all()
+            return True
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            async with self._cond:
+                await self._cond.wait_for(lambda: self._items)
+                enqueued_at, watched, event = self._items.popleft()
+                if not watched:
+                    self._unwatched -= 1
+                self._inflight += 1
+                self._cond.notify_all()
+            wait = loop.time() - enqueued_at
+            self.metrics['wait_total'] += wait
+            self.metrics['wait_max'] = max(self.metrics['wait_max'], wait)
+            try:
+                await self.handler(event)
+            except Exception as e:
+                logger.error(f"❌ Ingest worker xatosi: {e}")
+            finally:
+                self.metrics['processed'] += 1
+                async with self._cond:
+                    self._inflight -= 1
+                    self._cond.notify_all()
+
+    async def _report(self):
+        while True:
+            await asyncio.sleep(INGEST_METRICS_INTERVAL)
+            stats = self.stats()
+            cache = match_state.stats()
+            logger.info(
+                f"📊 Ingest: navbat={stats['depth']} (max {stats['max_depth']}), "
+                f"qayta ishlandi={stats['processed']}, tashlandi={stats['dropped']}, "
+                f"kutish o'rtacha={stats['wait_avg_ms']:.1f}ms max={stats['wait_max_ms']:.1f}ms, "
+                f"moslik keshi={cache['entries']} ta ({cache['bytes'] / 1024:.0f} KB)"
+            )
+            self._reset_metrics()
+
+    def stats(self):
+        """Joriy metrikalar (navbat chuqurligi, kutish vaqti, tashlangan eventlar)"""
+        processed = self.metrics['processed']
+        return {
+            'depth': len(self._items),
+            'max_depth': self.metrics['max_depth'],
+            'enqueued': self.metrics['enqueued'],
+            'processed': processed,
+            'dropped': self.metrics['dropped'],
+            'wait_avg_ms': self.metrics['wait_total'] / processed * 1000 if processed else 0.0,
+            'wait_max_ms': self.metrics['wait_max'] * 1000
+        }
+
+    def start(self):
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._report()))
+
+    async def join(self):
+        """Navbat bo'shab, barcha eventlar qayta ishlanguncha kutish"""
+        async with self._cond:
+            await self._cond.wait_for(lambda: not self._items and not self._inflight)
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+# ==================== LINKLARNI ANIQLASH ====================
+def parse_group_link(link):
+    """
+    Guruh linkini tahlil qilish
+    Returns: ('invite', hash) yoki ('username', username) yoki None
+    """
+    link = link.strip()
+    if link.startswith('@'):
+        return ('username', link[1:]) if link[1:] else None
+
+    parsed = urlparse(link if '://' in link else f"https://{link}")
+    if parsed.scheme == 'tg':
+        params = parse_qs(parsed.query)
+        if 'invite' in params:
+            return ('invite', params['invite'][0])
+        if 'domain' in params:
+            return ('username', params['domain'][0])
+        return None
+
+    if parsed.netloc.lower().removeprefix('www.') not in ('t.me', 'telegram.me', 'telegram.dog'):
+        return None
+
+    parts = [p for p in parsed.path.split('/') if p]
+    if not parts:
+        return None
+    if parts[0].startswith('+'):
+        return ('invite', parts[0][1:])
+    if parts[0] == 'joinchat' and len(parts) > 1:
+        return ('invite', parts[1])
+    if parts[0] == 's' and len(parts) > 1:
+        return ('username', parts[1])
+    return ('username', parts[0])
+
+async def resolve_group_link(client, link):
+    """Linkni chat ID va nomga aylantirish (kerak bo'lsa guruhga qo'shilish)"""
+    parsed = parse_group_link(link)
+    if not parsed:
+        raise ValueError("Link formati noto'g'ri")
+    kind, value = parsed
+
+    if kind == 'invite':
+        invite = await client(CheckChatInviteRequest(value))
+        if isinstance(invite, ChatInviteAlready):
+            chat = invite.chat
+        else:
+            # ChatInvitePeek - guruhni ko'rish mumkin, lekin a'zo emasmiz: xabarlar kelishi uchun qo'shilamiz
+            updates = await client(ImportChatInviteRequest(value))
+            chat = updates.chats[0]
+    else:
+        chat = await client.get_entity(value)
+        if isinstance(chat, Channel) and chat.left:
+            await client(JoinChannelRequest(chat))
+
+    return utils.get_peer_id(chat), getattr(chat, 'title', None) or value
+
+async def resolve_pending_links(client):
+    """Kutilayotgan linklarni cheklangan parallellik bilan aniqlash"""
+    await asyncio.to_thread(db.apply_cached_link_resolutions)
+    pending = await asyncio.to_thread(db.get_pending_links, RESOLVER_BATCH)
+    if not pending:
+        return 0
+
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(RESOLVER_CONCURRENCY)
+    state = {'flood_until': 0.0}
+
+    async def worker(link, attempts):
+        async with semaphore:
+            # FloodWait paytida qolgan linklar keyingi aylanishga qoldiriladi
+            if loop.time() < state['flood_until']:
+                return
+            backoff = min(RESOLVER_BASE_BACKOFF * 2 ** attempts, RESOLVER_MAX_BACKOFF)
+            try:
+                chat_id, title = await resolve_group_link(client, link)
+                await asyncio.to_thread(db.save_link_resolution, link, chat_id, title)
+                logger.info(f"🔗 Link aniqlandi: {link} -> {title} (ID: {chat_id})")
+            except FloodWaitError as e:
+                state['flood_until'] = loop.time() + e.seconds
+                await asyncio.to_thread(db.mark_link_failed, link, e, max(e.seconds, backoff))
+                logger.warning(f"⏳ FloodWait {e.seconds}s: link aniqlash to'xtatildi")
+            except Exception as e:
+                await asyncio.to_thread(db.mark_link_failed, link, e, backoff)
+                logger.warning(f"⚠️ Linkni aniqlab bo'lmadi: {link} ({e}), {backoff}s dan keyin qayta urinish")
+
+    await asyncio.gather(*(worker(link, attempts) for link, attempts in pending))
+    return max(0.0, state['flood_until'] - loop.time())
+
+async def link_resolver_loop(client):
+    """Link orqali qo'shilgan guruhlarni fon rejimida aniqlash"""
+    while True:
+        try:
+            flood_wait = await resolve_pending_links(client)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"❌ Link resolver xatosi: {e}")
+            flood_wait = 0
+        await asyncio.sleep(max(RESOLVER_INTERVAL, flood_wait))
+
 # ==================== USERBOT ISHGA TUSHIRISH ====================
+def backoff_delay(attempt, base=RECONNECT_BASE_DELAY, maximum=RECONNECT_MAX_DELAY):
+    """Jitterli eksponensial kutish vaqti: [0.5, 1.0] * min(base * 2^attempt, maximum)"""
+    return min(base * 2 ** attempt, maximum) * random.uniform(0.5, 1.0)
+
+class UserbotSupervisor:
+    """
+    TelegramClient ni boshqarish: ulanish uzilsa yoki yangilanishlar oqimi to'xtab qolsa
+    (kuzatilayotgan guruhlar bor, lekin STALL_SECONDS davomida hech qanday update kelmagan)
+    o'sha client qayta ulanadi va o'tkazib yuborilgan updatelar catch_up() bilan olinadi.
+    Kundalik to'xtatishdan keyin esa yangi client ochiladi - to'xtash oralig'idagi
+    xabarlar qayta o'ynalmaydi.
+    """
+
+    def __init__(self):
+        self.client = None
+        self.ingest = None
+        self.me = None
+        self.last_update = 0.0
+        self.recoveries = deque(maxlen=100)
+
+    def _create_client(self):
+        """Client yaratish va handlerlarni bir marta ro'yxatdan o'tkazish"""
+        # block siyosatida navbat kutishi tarmoqdan o'qishni to'xtatishi uchun updatelar ketma-ket
+        # qayta ishlanadi - aks holda har bir update alohida task bo'lib, kutayotgan tasklar cheksiz ko'payadi
+        client = TelegramClient(StringSession(SESSION_STRING), API_ID, API_HASH,
+                                sequential_updates=INGEST_OVERFLOW == 'block')
+
+        @client.on(events.Raw())
+        async def on_update(update):
+            self.last_update = asyncio.get_running_loop().time()
+
+        @client.on(events.NewMessage())
+        @client.on(events.MessageEdited())
+        async def handler(event):
+            if self.ingest:
+                await self.ingest.put(event)
+
+        return client
+
+    def _is_stalled(self):
+        idle = asyncio.get_running_loop().time() - self.last_update
+        return idle >= STALL_SECONDS and bool(db.get_keyword_index())
+
+    async def _wait_for_failure(self):
+        """Uzilish yoki to'xtab qolishni kutish. Returns: sabab matni"""
+        while True:
+            try:
+                await asyncio.wait_for(asyncio.shield(self.client.disconnected), timeout=STALL_CHECK_INTERVAL)
+                return "ulanish uzildi"
+            except asyncio.TimeoutError:
+                if self._is_stalled():
+                    return f"{STALL_SECONDS}s davomida update kelmadi"
+            except Exception as e:
+                return f"ulanish uzildi ({e})"
+
+    async def _reconnect(self, reason):
+        """Mavjud clientni jitterli eksponensial backoff bilan qayta ulash"""
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        logger.warning(f"⚠️ Userbot: {reason}. Qayta ulanmoqda...")
+        if self.client.is_connected():
+            await self.client.disconnect()
+
+        attempt = 0
+        while True:
+            try:
+                await self.client.connect()
+                authorized = await self.client.is_user_authorized()
+                if authorized:
+                    # Uzilish paytida o'tkazib yuborilgan updatelarni olish
+                    await self.client.catch_up()
+                break
+            except Exception as e:
+                delay = backoff_delay(attempt)
+                attempt += 1
+                logger.warning(f"⚠️ Qayta ulanish #{attempt} muvaffaqiyatsiz ({e}), {delay:.1f}s dan keyin")
+                if self.client.is_connected():
+                    await self.client.disconnect()
+                await asyncio.sleep(delay)
+
+        if not authorized:
+            raise RuntimeError("Session avtorizatsiyadan chiqqan, qayta ulanib bo'lmaydi")
+
+        recovered_in = loop.time() - started
+        self.last_update = loop.time()
+        self.recoveries.append(recovered_in)
+        average = sum(self.recoveries) / len(self.recoveries)
+        logger.info(
+            f"✅ Userbot qayta ulandi: {recovered_in:.1f}s ({attempt + 1} urinish), "
+            f"o'rtacha {average:.1f}s ({len(self.recoveries)} marta)"
+        )
+        db.set_setting(
+            'userbot_last_recovery',
+            f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')} ({recovered_in:.1f}s, sabab: {reason})"
+        )
+
+    async def _start_client(self):
+        """Yangi clientni ulash; client faqat ulanish va avtorizatsiya muvaffaqiyatli bo'lsa saqlanadi"""
+        client = self._create_client()
+        try:
+            await client.connect()
+            logger.info("✅ Userbot ulanmoqda...")
+            if not await client.is_user_authorized():
+                raise RuntimeError("Session avtorizatsiyadan chiqqan! session_creator.py bilan yangi session yarating")
+            me = await client.get_me()
+        except BaseException:
+            await client.disconnect()
+            raise
+        self.client, self.me = client, me
+
+    async def run(self):
+        """Clientni ulash va to'xtatilguncha (yoki tiklab bo'lmaydigan xatogacha) kuzatish"""
+        resolver_task = None
+        try:
+            await self._start_client()
+            logger.info(f"✅ Userbot ishga tushdi: {self.me.first_name} (@{self.me.username})")
+
+            self.last_update = asyncio.get_running_loop().time()
+            self.ingest = IngestQueue(message_handler)
+            self.ingest.start()
+            logger.info(f"✅ Message handler qo'shildi ({INGEST_WORKERS} ishchi, navbat {INGEST_QUEUE_SIZE}, {INGEST_OVERFLOW})")
+
+            resolver_task = asyncio.create_task(link_resolver_loop(self.client))
+            logger.info("✅ Link resolver ishga tushdi")
+            logger.info("🎯 Userbot barcha xabarlarni kuzatyapti...")
+
+            while True:
+                reason = await self._wait_for_failure()
+                await self._reconnect(reason)
+        finally:
+            if resolver_task:
+                resolver_task.cancel()
+            if self.ingest:
+                await self.ingest.stop()
+                self.ingest = None
+            if self.client and self.client.is_connected():
+                await self.client.disconnect()
+            self.client = None
+
+supervisor = UserbotSupervisor()
+
 async def start_userbot():
     """Userbot ishga tushirish"""
     try:
@@ -142,25 +564,9 @@ async def start_userbot():
         logger.info("✅ Database initialized")
         
         if not SESSION_STRING:
-            logger.error("❌ SESSION_STRING topilmadi! session_creator.py ishlatib session yarating!")
-            return
-        
-        client = TelegramClient(StringSession(SESSION_STRING), API_ID, API_HASH)
-        
-        await client.start(phone=PHONE)
-        logger.info("✅ Userbot ulanmoqda...")
+            raise RuntimeError("SESSION_STRING topilmadi! session_creator.py ishlatib session yarating!")
         
-        me = await client.get_me()
-        logger.info(f"✅ Userbot ishga tushdi: {me.first_name} (@{me.username})")
-        
-        @client.on(events.NewMessage())
-        async def handler(event):
-            await message_handler(event)
-        
-        logger.info("✅ Message handler qo'shildi")
-        logger.info("🎯 Userbot barcha xabarlarni kuzatyapti...")
-        
-        await client.run_until_disconnected()
+        await supervisor.run()
         
     except Exception as e:
         logger.error(f"❌ Userbot ishga tushirishda xato: {e}")
@@ -170,6 +576,7 @@ async def start_userbot():
 async def start_with_schedule():
     """Userbot kundalik restart bilan ishga tushirish"""
     
+    failures = 0
     while True:
         try:
             logger.info("🚀 Userbot ishga tushmoqda...")
@@ -179,6 +586,7 @@ async def start_with_schedule():
             if schedule_enabled != 'true':
                 logger.info("⏰ Kundalik restart o'chirilgan. 24/7 ishlamoqda...")
                 await start_userbot()
+                failures = 0
                 continue
             
             stop_time_str = db.get_setting('userbot_stop_time', '00:00')
@@ -203,6 +611,7 @@ async def start_with_schedule():
                 await asyncio.wait_for(start_userbot(), timeout=seconds_until_stop)
             except asyncio.TimeoutError:
                 logger.info(f"🌙 Soat {stop_time_str} - Userbot to'xtatilmoqda...")
+            failures = 0
             
             start_tomorrow = datetime.combine(now.date() + timedelta(days=1), time(start_h, start_m))
             sleep_seconds = (start_tomorrow - datetime.now()).total_seconds()
@@ -216,8 +625,10 @@ async def start_with_schedule():
             
         except Exception as e:
             logger.error(f"❌ Xato: {e}")
-            logger.info("⏳ 5 daqiqadan keyin qayta urinish...")
-            await asyncio.sleep(300)
+            delay = backoff_delay(failures)
+            failures += 1
+            logger.info(f"⏳ {delay:.0f}s dan keyin qayta urinish...")
+            await asyncio.sleep(delay)
 
 # ==================== MAIN ====================
 async def main():
@@ -227,17 +638,39 @@ async def main():
     logger.info("=" * 60)
     
     db.init_db()
+    stats.recorder.start()
+    sinks.manager.start()
+    db.set_index_snapshot(INDEX_SNAPSHOT or None)
+    
+    # Indeks birinchi xabardan oldin tayyorlanadi (snapshot yangi bo'lsa DB dan qurilmaydi)
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    db.get_keyword_index()
+    logger.info(f"🔑 Kalit so'z indeksi tayyor ({db.get_index_source()}, {(loop.time() - started) * 1000:.0f} ms)")
     
     schedule_enabled = db.get_setting('userbot_schedule_enabled', 'true')
     
     if schedule_enabled == 'true':
         logger.info("⏰ Kundalik restart rejimi yoqilgan")
-        await start_with_schedule()
     else:
         logger.info("⏰ Kundalik restart o'chirilgan. 24/7 ishlash rejimi")
-        await start_userbot()
+    # Ikkala rejimda ham xatolar supervisor va backoff orqali tiklanadi
+    try:
+        await start_with_schedule()
+    finally:
+        stats.recorder.stop()
+        sinks.manager.stop()
+        # Keyingi ishga tushish uchun snapshotni joriy generatsiya bilan yangilash
+        try:
+            db.save_index_snapshot()
+        except Exception as e:
+            logger.error(f"❌ Indeks snapshotini yozishda xato: {e}")
 
 if __name__ == '__main__':
+    # Logging sozlash (formatlash va faylga yozish fon oqimida, rotatsiya bilan)
+    setup_logging('userbot.log')
+    # Alohida jarayon: bot bilan umumiy xabarlar DB orqali band qilinadi
+    claims.shared = True
     try:
         asyncio.run(main())
     except KeyboardInterrupt: